@@ -0,0 +1,107 @@
+import json
+import os
+import sys
+
+from fixture_server import FIXTURE_DIR, GQLFixtureHandler, start_fixture_server
+
+from twitch import TW_GQL_URL, TW_QUERY, TW_SESSION, twitch_fetch_live, twitch_login_from_url
+from youtube import YT_SESSION, extract_initial_data, youtube_fetch_live
+
+# 從真正的網站錄製測試頁面，加進 HTTP 後端的檢查（bench/youtube_http_check.py、bench/twitch_http_check.py）
+# 手寫的假頁面只能測到解析邏輯，網站改版時要靠錄製的真實頁面才抓得到
+# python bench/capture_fixture.py youtube https://www.youtube.com/@頻道/streams [檔名]
+# python bench/capture_fixture.py twitch https://www.twitch.tv/頻道
+#
+# 錄製後會把目前的解析結果寫進 expected.json，請對照網頁確認人數、標題正確後再 commit
+
+YT_FIXTURES = os.path.join(FIXTURE_DIR, "youtube")
+TW_FIXTURES = os.path.join(FIXTURE_DIR, "twitch")
+
+
+def update_expected(directory, key, value):
+    path = os.path.join(directory, "expected.json")
+    with open(path, encoding="utf-8") as f:
+        expected_map = json.load(f)
+    expected_map[key] = value
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(expected_map, f, ensure_ascii=False, indent=4)
+        f.write("\n")
+
+
+def capture_youtube(url, name=None):
+    try:
+        resp = YT_SESSION.get(url, timeout=10)
+        resp.raise_for_status()
+    except Exception as e:
+        print(f"❌ 抓取失敗：{e}")
+        return 1
+    resp.encoding = "utf-8"
+    if extract_initial_data(resp.text) is None:
+        print("❌ 頁面中找不到 ytInitialData，沒有儲存")
+        return 1
+
+    handle = url.split("youtube.com/")[-1].split("/")[0].lstrip("@") or "channel"
+    name = name or f"captured_{handle}.html"
+    with open(os.path.join(YT_FIXTURES, name), "w", encoding="utf-8") as f:
+        f.write(resp.text)
+
+    # 用本機伺服器讀取錄好的檔案解析一次，與 youtube_http_check.py 的讀法相同
+    server, base_url = start_fixture_server(YT_FIXTURES)
+    try:
+        result = youtube_fetch_live(f"{base_url}/{name}")
+    finally:
+        server.shutdown()
+    if result is None:
+        print("❌ 解析失敗，頁面已儲存但沒有加進 expected.json")
+        return 1
+    expected = {key: result[key] for key in ("live", "viewers", "video_id", "title")}
+    update_expected(YT_FIXTURES, name, expected)
+    print(f"✅ 已錄製 {name}：{expected}")
+    print("⚠️ 人數會隨時間變動，請對照錄製當下的網頁確認後再 commit")
+    return 0
+
+
+def capture_twitch(url):
+    login = twitch_login_from_url(url)
+    payload = {"operationName": "ChannelStatus", "query": TW_QUERY, "variables": {"login": login}}
+    try:
+        resp = TW_SESSION.post(TW_GQL_URL, data=json.dumps(payload), timeout=10)
+        resp.raise_for_status()
+        body = resp.json()
+    except Exception as e:
+        print(f"❌ 查詢失敗：{e}")
+        return 1
+    if not (body.get("data") or {}).get("user"):
+        print(f"❌ 找不到 Twitch 頻道：{login}，沒有儲存")
+        return 1
+
+    # GQL 模擬伺服器依 login 找 <login>.json
+    with open(os.path.join(TW_FIXTURES, f"{login}.json"), "w", encoding="utf-8") as f:
+        json.dump(body, f, ensure_ascii=False)
+
+    server, base_url = start_fixture_server(TW_FIXTURES, GQLFixtureHandler)
+    try:
+        result = twitch_fetch_live(url, gql_url=f"{base_url}/gql")
+    finally:
+        server.shutdown()
+    if result is None:
+        print("❌ 解析失敗，回應已儲存但沒有加進 expected.json")
+        return 1
+    update_expected(TW_FIXTURES, login, result)
+    print(f"✅ 已錄製 {login}.json：{result}")
+    print("⚠️ 人數會隨時間變動，請對照錄製當下的網頁確認後再 commit")
+    return 0
+
+
+def main(argv):
+    if len(argv) >= 2 and argv[0] == "youtube":
+        return capture_youtube(argv[1], argv[2] if len(argv) > 2 else None)
+    if len(argv) >= 2 and argv[0] == "twitch":
+        return capture_twitch(argv[1])
+    print("用法：python bench/capture_fixture.py youtube <頻道 /streams 網址> [檔名]")
+    print("      python bench/capture_fixture.py twitch <頻道網址>")
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,184 @@
+import contextlib
+import datetime
+import importlib.util
+import io
+import os
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+from fixture_server import ROOT
+
+import db
+import sql
+
+# 量測一個抓取週期的資料庫工作：每次重新連線（舊版 sql.py）vs 每個執行緒一條 WAL 連線 vs 整個週期一個交易（CycleWriter）
+# python bench/db_bench.py [頻道數]
+# 每個週期：新增 working 紀錄 → 每個頻道找進行中的直播（舊版 is_straming 查詢、新版 stream_sessions）/ 更新或新增 stream / 寫入 main → 更新 working
+# 舊版 sql.py 從 git 取出（加入 db.py 之前的版本），沒有 git 時只量新版
+
+CHANNELS = 60
+CYCLES = 10
+YT_LIVE = 0.35      # 開台的比例
+TW_LIVE = 0.25
+HISTORY_DAYS = 30   # 預先放進去的歷史資料天數（每 15 分鐘一筆）
+
+
+def seed(path, channels):
+    """建立測試資料庫（一般的 rollback journal，與舊版的檔案相同）"""
+    sql.init_db(path)
+    db.close_all()
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode = DELETE")
+    conn.executemany(
+        "INSERT INTO streamer (channel_id, channel_name, yt_url, tw_url) VALUES (?, ?, ?, ?)",
+        [(f"ch{i}", f"頻道{i}", f"https://www.youtube.com/@ch{i}", f"https://www.twitch.tv/ch{i}")
+         for i in range(channels)],
+    )
+    start = datetime.datetime.now() - datetime.timedelta(days=HISTORY_DAYS)
+    rows = []
+    streams = []
+    for slot in range(HISTORY_DAYS * 96):
+        t = start + datetime.timedelta(minutes=15 * slot)
+        for i in range(channels):
+            rows.append((t.strftime("%Y-%m-%d"), t.strftime("%H:%M:%S"), f"ch{i}",
+                         random.randint(0, 3000) if random.random() < YT_LIVE else 0, 0, 0, 0))
+        if slot % 16 == 0:
+            end = (t + datetime.timedelta(hours=3)).strftime("%Y-%m-%d %H:%M:%S")
+            streams += [(f"ch{i}", "歷史直播", "youtube", None, t.strftime("%Y-%m-%d %H:%M:%S"), end)
+                        for i in range(0, channels, 3)]
+    conn.executemany(
+        "INSERT INTO main (date, time, channel, youtube, twitch, yt_number, tw_number) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        rows,
+    )
+    conn.executemany(
+        "INSERT INTO stream (channel_name, name, type, url, start_time, end_time) VALUES (?, ?, ?, ?, ?, ?)",
+        streams,
+    )
+    conn.commit()
+    with contextlib.redirect_stdout(io.StringIO()):
+        sql.backfill_epochs(conn)   # 新版的查詢用 epoch 欄位
+    conn.close()
+
+
+def load_baseline(folder):
+    """取出加入 db.py 之前的 sql.py，當成另一個模組載入"""
+    try:
+        added = subprocess.run(["git", "log", "--diff-filter=A", "--format=%H", "--", "db.py"],
+                               capture_output=True, text=True, check=True).stdout.split()
+        rev = f"{added[-1]}^" if added else "HEAD"
+        source = subprocess.run(["git", "show", f"{rev}:sql.py"],
+                                capture_output=True, text=True, check=True, encoding="utf-8").stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    path = os.path.join(folder, "sql_before.py")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(source)
+    spec = importlib.util.spec_from_file_location("sql_before", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def cycle(sql, path, channels, cycle_index):
+    sql.DB_PATH = path
+    working_id = sql.insert_working(True, False, 0, None, 1, 0)
+    rng = random.Random(cycle_index)
+    for i in range(channels):
+        cid = f"ch{i}"
+        yt = rng.randint(1, 5000) if rng.random() < YT_LIVE else 0
+        tw = rng.randint(1, 5000) if rng.random() < TW_LIVE else 0
+        yt_number = sql.yt_number_get(cid, {"title": "直播", "video_url": "https://www.youtube.com/watch?v=x"}, path) if yt else 0
+        tw_number = sql.tw_number_get(cid, {"title": "直播"}, path) if tw else 0
+        sql.save_viewer_count(cid, yt, tw, yt_number, tw_number, path)
+    sql.insert_working(False, True, 1.0, working_id, 1, 0)
+
+
+def cycle_writer(sql, path, channels, cycle_index, chunk_size=None):
+    sql.DB_PATH = path
+    working_id = sql.insert_working(True, False, 0, None, 1, 0)
+    writer = sql.CycleWriter(path, chunk_size)
+    rng = random.Random(cycle_index)
+    for i in range(channels):
+        cid = f"ch{i}"
+        yt = rng.randint(1, 5000) if rng.random() < YT_LIVE else 0
+        tw = rng.randint(1, 5000) if rng.random() < TW_LIVE else 0
+        yt_number = writer.stream_number(cid, 0, {"title": "直播", "video_url": "https://www.youtube.com/watch?v=x"}) if yt else 0
+        tw_number = writer.stream_number(cid, 1, {"title": "直播"}) if tw else 0
+        writer.save_viewer_count(cid, yt, tw, yt_number, tw_number)
+    writer.finish(working_id, 1.0, 0)
+
+
+def run(cycle, module, path, channels):
+    """回傳每個週期的 (總耗時, 扣掉找進行中直播的寫入耗時)，單位 ms"""
+    db.close_all()
+    # 舊版每次都查 is_straming，另外計時才看得出寫入本身的差別；新版查記憶體，直接計入寫入
+    lookup = getattr(module, "is_straming", None)
+    spent = [0.0]
+    def timed_lookup(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return lookup(*args, **kwargs)
+        finally:
+            spent[0] += time.perf_counter() - start
+    if lookup is not None:
+        module.is_straming = timed_lookup
+
+    timings = []
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            for index in range(CYCLES):
+                spent[0] = 0.0
+                start = time.perf_counter()
+                cycle(module, path, channels, index)
+                total = time.perf_counter() - start
+                timings.append((total * 1000, (total - spent[0]) * 1000))
+                time.sleep(1.0)   # working.time 以秒為單位
+    finally:
+        if lookup is not None:
+            module.is_straming = lookup
+        db.close_all()
+    return timings
+
+
+def main():
+    os.chdir(ROOT)
+    channels = int(sys.argv[1]) if len(sys.argv) > 1 else CHANNELS
+    random.seed(0)
+    with tempfile.TemporaryDirectory() as folder:
+        base = os.path.join(folder, "base.db")
+        seed(base, channels)
+        print(f"📦 {channels} 個頻道，{HISTORY_DAYS} 天歷史資料，{CYCLES} 個週期")
+        modes = [
+            ("常駐 WAL 連線", cycle, sql),
+            ("整個週期一個交易", cycle_writer, sql),
+        ]
+        baseline = load_baseline(folder)
+        if baseline is None:
+            print("⚠️ 取不到舊版 sql.py，只量新版")
+        else:
+            modes.insert(0, ("每次重新連線", cycle, baseline))
+
+        results = {}
+        for index, (label, cycle_fn, module) in enumerate(modes):
+            path = os.path.join(folder, f"run{index}.db")
+            shutil.copy(base, path)
+            timings = run(cycle_fn, module, path, channels)
+            totals = sorted(t[0] for t in timings)
+            writes = sorted(t[1] for t in timings)
+            median = totals[len(totals) // 2]
+            results[label] = median
+            print(f"  {label:<10} 中位數 {median:8.1f} ms/週期（寫入 {writes[len(writes) // 2]:.1f} ms），"
+                  f"最快 {totals[0]:.1f} ms，最慢 {totals[-1]:.1f} ms")
+        first = next(iter(results.values()))
+        for label, median in list(results.items())[1:]:
+            print(f"⚡ {label}：{first / max(median, 1e-6):.1f} 倍")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+import json
+import os
+import sys
+import threading
+from functools import partial
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+# 讓 bench/ 底下的腳本可以 import 專案根目錄的模組
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+FIXTURE_DIR = os.path.join(ROOT, "bench", "fixtures")
+
+# 合成截圖 / 裁切圖用的中文字型（依序嘗試）
+FONT_CANDIDATES = [
+    "C:/Windows/Fonts/msjh.ttc",
+    "/System/Library/Fonts/PingFang.ttc",
+    "/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/noto-cjk/NotoSansCJK-Regular.ttc",
+]
+
+
+def load_font(size):
+    """載入第一個找得到的中文字型，都沒有時回傳 None"""
+    from PIL import ImageFont
+    for path in FONT_CANDIDATES:
+        if os.path.exists(path):
+            return ImageFont.truetype(path, size)
+    return None
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    """靜態檔案伺服器，不輸出每個請求的日誌"""
+
+    def log_message(self, format, *args):
+        pass
+
+
+class GQLFixtureHandler(QuietHandler):
+    """
+    模擬 Twitch GQL 端點：POST 進來的 variables.login 對應到 <login>.json
+    沒有錄製檔的頻道回傳 {"data": {"user": null}}
+    """
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            login = payload["variables"]["login"]
+        except (ValueError, KeyError, TypeError):
+            self.send_error(400)
+            return
+
+        path = os.path.join(self.directory, f"{os.path.basename(login)}.json")
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                body = f.read()
+        else:
+            body = json.dumps({"data": {"user": None}}).encode("utf-8")
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_fixture_server(directory, handler_class=QuietHandler):
+    """
+    在本機隨機 port 啟動一個背景 HTTP 伺服器，提供錄製好的頁面
+    回傳 (server, base_url)，用完呼叫 server.shutdown()
+    """
+    handler = partial(handler_class, directory=directory)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    host, port = server.server_address
+    return server, f"http://{host}:{port}"
@@ -0,0 +1,135 @@
+import glob
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw
+
+from fixture_server import FIXTURE_DIR, ROOT, load_font
+
+import glyphs
+
+# 字形比對與 EasyOCR 讀取觀看人數的準確度與延遲比較
+# python bench/glyph_bench.py [--build]
+# 標記好的裁切圖放在 bench/fixtures/crops/<youtube|twitch>/<人數>__<任意>.png
+# 語料的一半拿來建模板庫（暫存資料夾），另一半拿來測試；
+# 加上 --build 時改用全部語料預先建立正式模板庫 find/glyphs/<平台>/
+# （不預先建立也可以，main.py 執行時會用 EasyOCR 的讀取結果自己建立、驗證，見 glyphs.observe）
+# 沒有標記語料時使用合成的裁切圖（只能看延遲，準確度要用真的標記語料量）
+# 這裡量的是模板本身（glyphs.classify_count），不經過 read_count 的驗證與抽查
+
+CROP_DIR = os.path.join(FIXTURE_DIR, "crops")
+SYNTHETIC_COUNT = 40
+
+def load_corpus(platform):
+    corpus = []
+    for path in sorted(glob.glob(os.path.join(CROP_DIR, platform, "*.png"))):
+        count = os.path.basename(path).split("__", 1)[0]
+        image = cv2.imread(path)
+        if count.isdigit() and image is not None:
+            corpus.append((image, int(count)))
+    return corpus
+
+
+# 合成語料：YouTube 需要中文字型畫「人」，Twitch 只有數字，沒有中文字型時用 OpenCV 內建字型
+def synthetic_corpus(platform, count=SYNTHETIC_COUNT):
+    rng = random.Random(7)
+    font = load_font(22)
+    if platform == "youtube" and font is None:
+        return []
+    corpus = []
+    for _ in range(count):
+        n = rng.choice([rng.randint(1, 99), rng.randint(100, 9999), rng.randint(10000, 99999)])
+        if platform == "youtube":
+            image = Image.new("RGB", (350, 30), (15, 15, 15))
+            ImageDraw.Draw(image).text((4, 2), f"{n:,} 人正在觀看", font=font, fill=(240, 240, 240))
+            crop = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
+        else:
+            crop = np.full((40, 150, 3), 24, np.uint8)
+            cv2.putText(crop, f"{n:,}", (6, 28), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (230, 230, 230), 2)
+        corpus.append((crop, n))
+    return corpus
+
+
+def easyocr_reader():
+    try:
+        import easyocr
+    except ImportError:
+        return None
+    return easyocr.Reader(['ch_tra', 'en'], gpu=False)
+
+
+def evaluate(platform, test, reader):
+    from youtube import youtube_extract_viewer_count
+    from twitch import twitch_extract_viewer_count
+    extract = youtube_extract_viewer_count if platform == "youtube" else twitch_extract_viewer_count
+
+    results = {"glyph": [0, 0, 0.0], "easyocr": [0, 0, 0.0]}   # [正確, 有結果, 總秒數]
+    for crop, truth in test:
+        start = time.perf_counter()
+        count = glyphs.classify_count(crop, platform)
+        results["glyph"][2] += time.perf_counter() - start
+        if count is not None:
+            results["glyph"][1] += 1
+            results["glyph"][0] += int(count) == truth
+
+        if reader is not None:
+            start = time.perf_counter()
+            count = extract.__wrapped__(crop, reader)   # 不經過 OCR 快取
+            results["easyocr"][2] += time.perf_counter() - start
+            if isinstance(count, str):
+                results["easyocr"][1] += 1
+                results["easyocr"][0] += int(count) == truth
+    return results
+
+
+def main():
+    os.chdir(ROOT)
+    build = "--build" in sys.argv
+    reader = None if build else easyocr_reader()
+    if reader is None and not build:
+        print("⚠️ 沒有安裝 EasyOCR，只量測字形比對")
+
+    for platform in ("youtube", "twitch"):
+        corpus = load_corpus(platform)
+        source = "標記語料"
+        if not corpus:
+            corpus = synthetic_corpus(platform)
+            source = "合成語料"
+        if not corpus:
+            print(f"\n⚠️ {platform}：沒有語料（也找不到中文字型可以合成），略過")
+            continue
+
+        samples = [(crop, glyphs.label_text(platform, n)) for crop, n in corpus]
+        if build:
+            written = glyphs.build_bank(samples, platform)
+            print(f"✅ {platform}：用 {len(samples)} 張{source}寫入 {written} 個字形模板")
+            continue
+
+        half = len(corpus) // 2
+        bank_dir = tempfile.mkdtemp(prefix="glyphs_")
+        glyph_dir = glyphs.GLYPH_DIR
+        try:
+            glyphs.GLYPH_DIR = bank_dir
+            glyphs.build_bank(samples[:half], platform)
+            results = evaluate(platform, corpus[half:], reader)
+        finally:
+            glyphs.GLYPH_DIR = glyph_dir
+            glyphs.clear_banks()
+            shutil.rmtree(bank_dir, ignore_errors=True)
+
+        n = len(corpus) - half
+        print(f"\n🔢 {platform}（{source}，測試 {n} 張）")
+        for name, (correct, answered, seconds) in results.items():
+            if name == "easyocr" and reader is None:
+                continue
+            print(f"  {name:<8} 正確 {correct}/{n}，有結果 {answered}/{n}，平均 {seconds / n * 1000:.2f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+import glob
+import os
+import sys
+import time
+import cv2
+import numpy as np
+
+from fixture_server import ROOT
+
+from frame import Frame
+from templates import TEMPLATE_SCALES, clear_hints, get_template, match_template
+
+# 比較全解析度逐一比對（exhaustive）與先粗後精（coarse）的準確度與延遲
+# python bench/match_compare.py [截圖資料夾 ...]
+# 沒有指定資料夾時使用 pictures/yt_picture、pictures/tw_picture 的截圖，
+# 兩者都沒有截圖（沒開 DEBUG_IMAGE_SINK）時改用合成的畫面
+
+THRESHOLDS = {"yt_find": 0.85, "tw_find_1": 0.8, "tw_find_2": 0.8}
+CORPUS_DIRS = ["pictures/yt_picture", "pictures/tw_picture"]
+SYNTHETIC_COUNT = 12
+POSITION_TOLERANCE = 2
+
+
+def templates_for(path):
+    name = os.path.basename(path)
+    if name.startswith("yt") or "yt_picture" in path:
+        return ["find/yt_find.png"]
+    return ["find/tw_find_2.png", "find/tw_find_1.png"]
+
+
+def load_corpus(dirs):
+    corpus = []
+    for folder in dirs:
+        for path in sorted(glob.glob(os.path.join(folder, "*.png"))):
+            image = cv2.imread(path)
+            if image is not None:
+                for template in templates_for(path):
+                    corpus.append((os.path.basename(path), image, template))
+    return corpus
+
+
+# 平滑的假背景，貼上隨機比例、隨機位置的模板；每三張留一張不貼（沒開台的情況）
+def synthetic_corpus(count=SYNTHETIC_COUNT):
+    rng = np.random.default_rng(42)
+    corpus = []
+    templates = ["find/yt_find.png", "find/tw_find_2.png", "find/tw_find_1.png"]
+    for i in range(count):
+        noise = rng.integers(0, 255, size=(90, 160, 3), dtype=np.uint8)
+        image = cv2.resize(noise, (2560, 1440), interpolation=cv2.INTER_CUBIC)
+        template_path = templates[i % len(templates)]
+        if i % 3 != 2:
+            scale = float(rng.choice(TEMPLATE_SCALES))
+            template = cv2.imread(template_path)
+            template = cv2.resize(template, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+            h, w = template.shape[:2]
+            x = int(rng.integers(0, 2560 - w))
+            y = int(rng.integers(0, 1440 - h))
+            image[y:y + h, x:x + w] = template
+        corpus.append((f"synthetic_{i:02d}", image, template_path))
+    return corpus
+
+
+def run(image, template_path, mode):
+    name = os.path.splitext(os.path.basename(template_path))[0]
+    clear_hints()   # 每次都從頭搜尋，不讓提示影響結果
+    frame = Frame(image)
+    start = time.perf_counter()
+    match = match_template(frame, get_template(template_path), THRESHOLDS[name], mode=mode)
+    return match, (time.perf_counter() - start) * 1000
+
+
+def same(a, b):
+    if a is None or b is None:
+        return a is None and b is None
+    return (abs(a[2][0] - b[2][0]) <= POSITION_TOLERANCE
+            and abs(a[2][1] - b[2][1]) <= POSITION_TOLERANCE)
+
+
+def main():
+    os.chdir(ROOT)
+    dirs = sys.argv[1:] or CORPUS_DIRS
+    corpus = load_corpus(dirs)
+    if not corpus:
+        print("⚠️ 找不到截圖，改用合成畫面")
+        corpus = synthetic_corpus()
+
+    total = {"exhaustive": 0.0, "coarse": 0.0}
+    agree = 0
+    for label, image, template_path in corpus:
+        exact, exact_ms = run(image, template_path, "exhaustive")
+        coarse, coarse_ms = run(image, template_path, "coarse")
+        total["exhaustive"] += exact_ms
+        total["coarse"] += coarse_ms
+        ok = same(exact, coarse)
+        agree += ok
+        where = lambda m: f"{m[2]}@{m[0]:.2f}" if m else "—"
+        print(f"{'✅' if ok else '❌'} {label:<22} {os.path.basename(template_path):<14} "
+              f"exhaustive {exact_ms:7.1f} ms {where(exact):<20} coarse {coarse_ms:7.1f} ms {where(coarse)}")
+
+    n = len(corpus)
+    print(f"\n一致：{agree}/{n}")
+    print(f"平均延遲：exhaustive {total['exhaustive'] / n:.1f} ms，coarse {total['coarse'] / n:.1f} ms")
+    return 0 if agree == n else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
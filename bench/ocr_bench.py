@@ -0,0 +1,100 @@
+import glob
+import os
+import sys
+import time
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from fixture_server import ROOT, load_font
+
+import easyocr
+
+import ocr
+from youtube import youtube_extract_viewer_count
+from twitch import twitch_extract_viewer_count
+
+# 比較完整 readtext（CRAFT 偵測 + 辨識）與只跑辨識器的每張裁切圖延遲
+# python bench/ocr_bench.py
+# 有 pictures/yt_crop、pictures/tw_crop 的裁切圖時一併測試（沒有正確答案，只比較兩種模式是否一致）
+
+ROUNDS = 3
+CROP_DIRS = {"youtube": "pictures/yt_crop", "twitch": "pictures/tw_crop"}
+
+YT_SAMPLES = [12, 348, 1205, 25873]
+TW_SAMPLES = [7, 96, 3598, 12044]
+
+
+# 與 find_and_crop 裁出來的大小相同：YouTube 350x30、Twitch 150x40
+def render(text, size, font):
+    image = Image.new("RGB", size, (15, 15, 15))
+    ImageDraw.Draw(image).text((4, 2), text, font=font, fill=(240, 240, 240))
+    return cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
+
+
+def synthetic_crops():
+    font = load_font(22)
+    if font is None:
+        print("⚠️ 找不到中文字型，略過 YouTube 合成圖")
+        yt = []
+    else:
+        yt = [(f"yt_{n}", render(f"{n:,} 人正在觀看", (350, 30), font), str(n)) for n in YT_SAMPLES]
+    tw_font = font or ImageFont.load_default()
+    tw = [(f"tw_{n}", render(f"{n:,}", (150, 40), tw_font), str(n)) for n in TW_SAMPLES]
+    return yt, tw
+
+
+def saved_crops(folder):
+    crops = []
+    for path in sorted(glob.glob(os.path.join(folder, "*.png"))):
+        image = cv2.imread(path)
+        if image is not None:
+            crops.append((os.path.basename(path), image, None))
+    return crops
+
+
+def measure(extract, image, reader, fast):
+    ocr.RECOGNIZER_ONLY = fast
+    result = None
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        result = extract(image, reader)
+    return str(result), (time.perf_counter() - start) / ROUNDS * 1000
+
+
+def run(platform, extract, crops, reader):
+    totals = [0.0, 0.0]
+    correct = [0, 0]
+    for label, image, truth in crops:
+        full, full_ms = measure(extract, image, reader, False)
+        fast, fast_ms = measure(extract, image, reader, True)
+        totals[0] += full_ms
+        totals[1] += fast_ms
+        if truth is not None:
+            correct[0] += full == truth
+            correct[1] += fast == truth
+        print(f"  {label:<24} readtext {full_ms:7.1f} ms → {full:<8} 辨識器 {fast_ms:7.1f} ms → {fast}")
+    n = len(crops)
+    if n:
+        print(f"  {platform} 平均：readtext {totals[0] / n:.1f} ms，辨識器 {totals[1] / n:.1f} ms")
+        labelled = sum(1 for crop in crops if crop[2] is not None)
+        if labelled:
+            print(f"  {platform} 正確：readtext {correct[0]}/{labelled}，辨識器 {correct[1]}/{labelled}")
+
+
+def main():
+    os.chdir(ROOT)
+    reader = easyocr.Reader(['ch_tra', 'en'], gpu=False)
+    yt, tw = synthetic_crops()
+    yt += saved_crops(CROP_DIRS["youtube"])
+    tw += saved_crops(CROP_DIRS["twitch"])
+
+    print("📺 YouTube")
+    run("YouTube", youtube_extract_viewer_count, yt, reader)
+    print("🎮 Twitch")
+    run("Twitch", twitch_extract_viewer_count, tw, reader)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
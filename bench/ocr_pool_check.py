@@ -0,0 +1,73 @@
+import glob
+import os
+import signal
+import sys
+import time
+
+import numpy as np
+
+from fixture_server import ROOT
+
+from ocr_pool import OcrPool
+
+# 檢查 OCR 進程池在有進程中止（記憶體不足、EasyOCR 崩潰）後能自己重建：
+# 殺掉一個 OCR 進程，下一次送出的裁切圖仍然要能辨識、預熱仍然要能完成，共享記憶體也不能殘留
+# python bench/ocr_pool_check.py
+
+POOL_SIZE = 2
+TIMEOUT = 300
+
+
+def shm_segments():
+    return set(glob.glob("/dev/shm/psm_*"))
+
+
+def run_once(pool, crop):
+    """送出一張裁切圖，進程池出錯時 future.result() 會直接丟出例外"""
+    value, elapsed = pool.submit("yt_count", crop).result(TIMEOUT)
+    return value
+
+
+def main():
+    os.chdir(ROOT)
+    crop = np.full((30, 350, 3), 255, dtype=np.uint8)
+    before = shm_segments()
+    pool = OcrPool(POOL_SIZE, 1)
+    failed = 0
+
+    try:
+        print(f"⏳ 預熱：{pool.warm_up().result(TIMEOUT)} 個進程就緒")
+        print(f"✅ 第一次辨識：{run_once(pool, crop)}")
+
+        # 殺掉一個 OCR 進程，等 executor 發現進程池損壞
+        executor = pool._executor
+        pid = next(iter(executor._processes))
+        os.kill(pid, signal.SIGKILL)
+        print(f"💥 已中止 OCR 進程 {pid}")
+        deadline = time.time() + 10
+        while not executor._broken and time.time() < deadline:
+            time.sleep(0.1)
+
+        try:
+            print(f"✅ 進程中止後再次辨識：{run_once(pool, crop)}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ 進程中止後無法辨識：{e!r}")
+
+        ready = pool.warm_up().result(TIMEOUT)
+        ok = ready == POOL_SIZE
+        failed += 0 if ok else 1
+        print(f"{'✅' if ok else '❌'} 重建後預熱：{ready} 個進程就緒")
+    finally:
+        pool.shutdown()
+
+    leaked = shm_segments() - before
+    failed += 1 if leaked else 0
+    print(f"{'❌' if leaked else '✅'} 共享記憶體殘留：{len(leaked)} 個")
+
+    print("\n❌ OCR 進程池無法從進程中止中恢復" if failed else "\n✅ OCR 進程池可以從進程中止中恢復")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
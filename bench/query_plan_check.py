@@ -0,0 +1,151 @@
+import datetime
+import os
+import random
+import re
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+from fixture_server import ROOT
+
+import db
+import sql
+from main_data_fun import stream_summary, slot_rollup, slot_table
+
+# 檢查常用查詢的 EXPLAIN QUERY PLAN 有沒有用到索引，任何一個整張表掃描就回傳 1
+# 同時比較有無索引的查詢時間（一年份的合成資料）
+# python bench/query_plan_check.py [頻道數] [天數]
+# 查詢是實際呼叫 sql.py 的函式、用 trace callback 收集到的，改了 SQL 不必同步修改這裡
+
+CHANNELS = 60
+DAYS = 365
+ROUNDS = 20
+# slot_rollup 最多 頻道數 × 2 × 96 列，不會隨時間變大，全部頻道的時段圖整張讀也沒關係
+TABLES = {"main", "stream", "streamer", "working", "stream_stats", "same_stream"}
+
+
+def seed(path, channels, days):
+    """每 15 分鐘每個頻道一筆 main；約三分之一的頻道每天開一場 3 小時的直播"""
+    sql.init_db(path)
+    db.close_all()
+    conn = sqlite3.connect(path)
+    rng = random.Random(0)
+    start = datetime.datetime.now().replace(second=0, microsecond=0) - datetime.timedelta(days=days)
+
+    def main_rows():
+        for slot in range(days * 96):
+            t = start + datetime.timedelta(minutes=15 * slot)
+            date_str, time_str, ts = t.strftime("%Y-%m-%d"), t.strftime("%H:%M:%S"), int(t.timestamp())
+            for i in range(channels):
+                live = i % 3 == 0 and 20 <= t.hour <= 22
+                yield (date_str, time_str, ts, f"ch{i}", rng.randint(100, 3000) if live else 0,
+                       rng.randint(10, 500) if live and i % 2 else 0, 0, 0)
+
+    def stream_rows():
+        for day in range(days):
+            t = start + datetime.timedelta(days=day, hours=20)
+            end = t + datetime.timedelta(hours=3)
+            for i in range(0, channels, 3):
+                yield (f"ch{i}", "合成直播", "youtube" if i % 2 == 0 else "twitch", None,
+                       t.strftime("%Y-%m-%d %H:%M:%S"), end.strftime("%Y-%m-%d %H:%M:%S"),
+                       int(t.timestamp()), int(end.timestamp()))
+
+    conn.executemany("INSERT INTO main (date, time, ts, channel, youtube, twitch, yt_number, tw_number) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", main_rows())
+    conn.executemany("INSERT INTO stream (channel_name, name, type, url, start_time, end_time, start_ts, end_ts) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", stream_rows())
+    conn.executemany("INSERT INTO streamer (channel_id, channel_name) VALUES (?, ?)", [(f"ch{i}", f"頻道{i}") for i in range(channels)])
+    conn.execute("INSERT INTO same_stream (from_id, to_id, time) VALUES (2, 1, NULL)")
+    conn.commit()
+    sql.rebuild_stream_stats(conn)
+    sql.rebuild_slot_rollup(conn)
+    conn.execute("ANALYZE")
+    conn.close()
+
+
+def hot_calls(path):
+    """常用的查詢：(名稱, 呼叫函式)，儀表板的部分與 main_data.py 呼叫 main_data_fun 的方式相同
+    進行中的直播改由 stream_sessions 在記憶體裡查，啟動時才讀一次 stream，不列在這裡
+    儀表板開頁時的 SELECT * FROM streamer / stream / same_stream 與總觀看統計的 load_main 本來就讀整張表，也不列在這裡"""
+    def latest():
+        sql.DB_PATH = path
+        return sql.latest_live_channels(lambda msg: None)
+
+    return [
+        ("latest_live_channels", latest),
+        ("儀表板平均觀看數（單一頻道）", lambda: slot_rollup(db.get_connection(path), "ch0")),
+        ("儀表板直播統計（單一頻道）", lambda: stream_summary(db.get_connection(path), "youtube", "ch0")),
+        ("儀表板直播統計（全部頻道）", lambda: stream_summary(db.get_connection(path), "twitch")),
+        ("時段分布圖（單一頻道）", lambda: slot_table(db.get_connection(path), "ch0", "avg")),
+        ("時段分布圖（全部頻道）", lambda: slot_table(db.get_connection(path), None, "count")),
+    ]
+
+
+def capture(path, call):
+    """執行一次並收集送進 SQLite 的 SELECT（參數已代入）"""
+    statements = []
+    conn = db.get_connection(path)
+    conn.set_trace_callback(statements.append)
+    try:
+        call()
+    finally:
+        conn.set_trace_callback(None)
+    return [s for s in statements if s.lstrip().upper().startswith("SELECT")]
+
+
+def full_scans(conn, statement):
+    plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + statement)]
+    scans = [line for line in plan if (m := re.match(r"SCAN (\w+)", line)) and m.group(1) in TABLES]
+    return plan, scans
+
+
+def timing(call, rounds=ROUNDS):
+    call()
+    start = time.perf_counter()
+    for _ in range(rounds):
+        call()
+    return (time.perf_counter() - start) / rounds * 1000
+
+
+def main():
+    os.chdir(ROOT)
+    channels = int(sys.argv[1]) if len(sys.argv) > 1 else CHANNELS
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else DAYS
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "year.db")
+        start = time.perf_counter()
+        seed(path, channels, days)
+        print(f"📦 {channels} 個頻道 × {days} 天（{channels * days * 96:,} 筆 main），建立 {time.perf_counter() - start:.0f} 秒")
+
+        # 沒有索引的對照組
+        bare = os.path.join(folder, "bare.db")
+        shutil.copy(path, bare)
+        conn = sqlite3.connect(bare)
+        for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'idx_%'").fetchall():
+            conn.execute(f"DROP INDEX {name}")
+        conn.commit()
+        conn.close()
+
+        failed = False
+        for name, call in hot_calls(path):
+            conn = db.get_connection(path)
+            print(f"\n🔎 {name}")
+            for statement in capture(path, call):
+                plan, scans = full_scans(conn, statement)
+                for line in plan:
+                    print(f"    {line}")
+                if scans:
+                    failed = True
+                    print(f"  ❌ 整張表掃描：{', '.join(scans)}")
+
+            bare_call = dict(hot_calls(bare))[name]
+            print(f"  ⏱️ 有索引 {timing(call):.2f} ms，沒有索引 {timing(bare_call):.2f} ms")
+
+        db.close_all()
+    print("\n❌ 有查詢沒用到索引" if failed else "\n✅ 所有常用查詢都有用到索引")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
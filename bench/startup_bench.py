@@ -0,0 +1,83 @@
+import os
+import subprocess
+import sys
+
+from fixture_server import ROOT
+
+# 量測啟動時間：各模組的匯入時間、UI 視窗出現的時間、OCR 模型背景載入完成的時間
+# python bench/startup_bench.py
+# 每一項都在新的 Python 進程裡量，避免模組快取影響結果
+
+ROUNDS = 3
+
+IMPORT_TARGETS = ["ui", "ocr", "sql", "main", "easyocr"]
+
+IMPORT_SNIPPET = """
+import time
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start)
+"""
+
+# 視窗出現的時間：建立 App 並完成第一次繪製；啟動時的抓取工作換成空函式，不實際執行
+WINDOW_SNIPPET = """
+import time
+start = time.perf_counter()
+import tkinter as tk
+import ui
+ui.main_task = lambda *args: None
+root = tk.Tk()
+app = ui.App(root)
+root.update()
+print(time.perf_counter() - start)
+app.scheduler.shutdown(wait=False)
+root.destroy()
+"""
+
+READY_SNIPPET = """
+import time
+start = time.perf_counter()
+import ocr
+ocr.start_warmup().result()
+print(time.perf_counter() - start)
+"""
+
+
+def measure(snippet, rounds=ROUNDS):
+    timings = []
+    for _ in range(rounds):
+        proc = subprocess.run(
+            [sys.executable, "-c", snippet],
+            cwd=ROOT, capture_output=True, text=True, encoding="utf-8",
+        )
+        if proc.returncode != 0:
+            error = (proc.stderr.strip().splitlines() or ["未知錯誤"])[-1]
+            return None, error
+        timings.append(float(proc.stdout.strip().splitlines()[-1]))
+    return min(timings), None
+
+
+def report(label, snippet, rounds=ROUNDS):
+    seconds, error = measure(snippet, rounds)
+    if error:
+        print(f"  ⚠️ {label:<28} 無法量測：{error}")
+    else:
+        print(f"  {label:<30} {seconds * 1000:8.0f} ms")
+
+
+def main():
+    os.chdir(ROOT)
+    print(f"📦 模組匯入時間（{ROUNDS} 次取最快）")
+    for module in IMPORT_TARGETS:
+        report(f"import {module}", IMPORT_SNIPPET.format(module=module))
+
+    print("\n🪟 視窗出現時間")
+    report("ui.App 第一次繪製", WINDOW_SNIPPET)
+
+    print("\n🧠 OCR 模型載入完成（背景執行緒）")
+    report("start_warmup().result()", READY_SNIPPET, rounds=1)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+import os
+import sys
+import time
+import cv2
+import numpy as np
+
+from fixture_server import ROOT
+
+from frame import Frame
+from templates import TEMPLATE_FILES, TEMPLATE_SCALES, clear_templates, get_template, preload_templates
+from youtube import youtube_find_and_crop
+from twitch import twitch_find_and_crop
+
+# 比較「每次呼叫都讀檔、轉灰階、縮放 20 次」與模板登錄表的耗時
+# python bench/template_bench.py
+
+ROUNDS = 200
+FULL_ROUNDS = 5
+
+
+# 舊做法：每次呼叫都重新準備模板
+def prepare_uncached(path):
+    template_gray = cv2.cvtColor(cv2.imread(path), cv2.COLOR_BGR2GRAY)
+    return [cv2.resize(template_gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+            for scale in TEMPLATE_SCALES]
+
+
+def prepare_cached(path):
+    return get_template(path).levels
+
+
+def bench(fn, path, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn(path)
+    return (time.perf_counter() - start) / rounds * 1000
+
+
+# 把模板貼在 2560x1440 的假畫面上，量完整 find_and_crop 的耗時
+def synthetic_frame(template_path, x=1400, y=700):
+    rng = np.random.default_rng(0)
+    image = rng.integers(0, 60, size=(1440, 2560, 3), dtype=np.uint8)
+    template = cv2.imread(template_path)
+    h, w = template.shape[:2]
+    image[y:y + h, x:x + w] = template
+    return image
+
+
+def bench_full(find, template_path, rounds):
+    image = synthetic_frame(template_path)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        find(Frame(image), template_path, None)
+    return (time.perf_counter() - start) / rounds * 1000
+
+
+def main():
+    os.chdir(ROOT)
+    print("📐 模板準備（每次呼叫）")
+    for path in TEMPLATE_FILES:
+        clear_templates()
+        uncached = bench(prepare_uncached, path, ROUNDS)
+        preload_templates([path])
+        cached = bench(prepare_cached, path, ROUNDS)
+        print(f"  {path:<22} 每次重建 {uncached:7.3f} ms → 登錄表 {cached:7.4f} ms")
+
+    print("\n🔍 完整 find_and_crop（含 matchTemplate）")
+    preload_templates()
+    youtube_ms = bench_full(youtube_find_and_crop, "find/yt_find.png", FULL_ROUNDS)
+    twitch_ms = bench_full(twitch_find_and_crop, "find/tw_find_2.png", FULL_ROUNDS)
+    print(f"  youtube_find_and_crop  {youtube_ms:8.1f} ms")
+    print(f"  twitch_find_and_crop   {twitch_ms:8.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+import os
+import sys
+import tempfile
+import time
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from fixture_server import ROOT, load_font
+
+import ocr_cache
+import tesseract_engine
+from frame import Frame
+from sql import init_db, create_stream_tw
+
+# 比較新增直播紀錄（create_stream_tw，標題走 Tesseract）的延遲：
+#   cli：每次啟動 tesseract 進程並重新載入三個語言模型（改版前的做法）
+#   api：常駐的 tesserocr 實例（需要 pip install tesserocr）
+# python bench/tesseract_bench.py
+# 截圖是合成的：右上放 Twitch 的模板，標題畫在 create_stream_tw 裁切的位置
+
+ROUNDS = 5
+TEMPLATE = "find/tw_find_2.png"
+TEMPLATE_AT = (1700, 120)
+TITLES = ["【雑談】今天來聊聊天 Just Chatting", "Minecraft 生存 Day 12", "歌回 Singing Stream"]
+
+# create_stream_tw 裁切模板左方 1490、上方 20 開始，寬 1200、高 100 的區域
+def screenshot(title, font):
+    image = Image.new("RGB", (1920, 1080), (24, 24, 27))
+    x, y = TEMPLATE_AT
+    ImageDraw.Draw(image).text((x - 1490 + 10, y - 20 + 30), title, font=font, fill=(239, 239, 241))
+    canvas = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
+    template = cv2.imread(TEMPLATE)
+    h, w = template.shape[:2]
+    canvas[y:y + h, x:x + w] = template
+    return canvas
+
+
+def run(engine, images, db_path, crop_path):
+    tesseract_engine.TESSERACT_ENGINE = engine
+    # 每次都要真的辨識，不能命中 OCR 快取
+    ocr_cache._cache = ocr_cache.OcrCache(modes={})
+    timings = []
+    for round_index in range(ROUNDS):
+        for title, image in images:
+            args = {"frame": Frame(image), "screenshot_path": None, "cropped_path": crop_path}
+            start = time.perf_counter()
+            create_stream_tw(f"bench_{round_index}", args, db_path)
+            timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main():
+    os.chdir(ROOT)
+    print(f"tesseract：{tesseract_engine.find_tesseract()}")
+    print(f"tessdata：{tesseract_engine.find_tessdata(tesseract_engine.find_tesseract())}")
+    print(f"tesserocr：{'有' if tesseract_engine.tesserocr is not None else '沒有安裝'}")
+
+    font = load_font(40) or ImageFont.load_default()
+    images = [(title, screenshot(title, font)) for title in TITLES]
+    engines = ["cli"] + (["api"] if tesseract_engine.tesserocr is not None else [])
+
+    with tempfile.TemporaryDirectory() as folder:
+        db_path = os.path.join(folder, "bench.db")
+        crop_path = os.path.join(folder, "crop.png")
+        init_db(db_path)
+        for engine in engines:
+            timings = run(engine, images, db_path, crop_path)
+            first, rest = timings[0], timings[1:] or timings
+            print(f"{engine}：第一次 {first:.0f} ms，之後平均 {sum(rest) / len(rest):.0f} ms，"
+                  f"中位數 {sorted(rest)[len(rest) // 2]:.0f} ms（{len(timings)} 次）")
+    tesseract_engine.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,58 @@
+import json
+import os
+import sys
+import time
+
+from fixture_server import FIXTURE_DIR, GQLFixtureHandler, start_fixture_server
+
+from http_session import create_http_session
+from twitch import TW_HEADERS, twitch_fetch_live
+
+# 用錄製的 GQL 回應檢查 Twitch HTTP 後端的解析結果與延遲
+# 真實回應用 bench/capture_fixture.py 錄製（<login>.json），其餘是手寫的邊界情況
+# python bench/twitch_http_check.py
+
+TW_FIXTURES = os.path.join(FIXTURE_DIR, "twitch")
+ROUNDS = 20
+
+
+def check(result, expected):
+    if expected is None:
+        return result is None
+    if result is None:
+        return False
+    return all(result.get(key) == value for key, value in expected.items())
+
+
+def main():
+    with open(os.path.join(TW_FIXTURES, "expected.json"), encoding="utf-8") as f:
+        expected_map = json.load(f)
+
+    server, base_url = start_fixture_server(TW_FIXTURES, GQLFixtureHandler)
+    gql_url = f"{base_url}/gql"
+    session = create_http_session(TW_HEADERS)
+    failed = 0
+
+    try:
+        for login, expected in expected_map.items():
+            url = f"https://www.twitch.tv/{login}"
+
+            timings = []
+            for _ in range(ROUNDS):
+                start = time.perf_counter()
+                result = twitch_fetch_live(url, session, gql_url=gql_url)
+                timings.append(time.perf_counter() - start)
+
+            ok = check(result, expected)
+            failed += 0 if ok else 1
+            avg_ms = sum(timings) / len(timings) * 1000
+            print(f"{'✅' if ok else '❌'} {login:<24} {avg_ms:6.2f} ms  {result}")
+    finally:
+        server.shutdown()
+
+    print(f"\n{len(expected_map) - failed}/{len(expected_map)} 通過")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
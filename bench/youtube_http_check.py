@@ -0,0 +1,57 @@
+import json
+import os
+import sys
+import time
+
+from fixture_server import FIXTURE_DIR, start_fixture_server
+
+from http_session import create_http_session
+from youtube import YT_HEADERS, youtube_fetch_live
+
+# 用錄製的 /streams 頁面檢查 HTTP 後端的解析結果與延遲
+# 真實頁面用 bench/capture_fixture.py 錄製（captured_*.html），其餘是手寫的邊界情況
+# python bench/youtube_http_check.py
+
+YT_FIXTURES = os.path.join(FIXTURE_DIR, "youtube")
+ROUNDS = 20
+
+
+def check(result, expected):
+    if expected is None:
+        return result is None
+    if result is None:
+        return False
+    return all(result.get(key) == value for key, value in expected.items())
+
+
+def main():
+    with open(os.path.join(YT_FIXTURES, "expected.json"), encoding="utf-8") as f:
+        expected_map = json.load(f)
+
+    server, base_url = start_fixture_server(YT_FIXTURES)
+    session = create_http_session(YT_HEADERS)
+    failed = 0
+
+    try:
+        for name, expected in expected_map.items():
+            url = f"{base_url}/{name}"
+
+            timings = []
+            for _ in range(ROUNDS):
+                start = time.perf_counter()
+                result = youtube_fetch_live(url, session)
+                timings.append(time.perf_counter() - start)
+
+            ok = check(result, expected)
+            failed += 0 if ok else 1
+            avg_ms = sum(timings) / len(timings) * 1000
+            print(f"{'✅' if ok else '❌'} {name:<24} {avg_ms:6.2f} ms  {result}")
+    finally:
+        server.shutdown()
+
+    print(f"\n{len(expected_map) - failed}/{len(expected_map)} 通過")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+import os
+import sqlite3
+import threading
+
+# 每個執行緒保留一條連線重複使用，不再每個函式各自 connect / close
+
+# 連線建立時套用的設定
+# WAL：寫入時儀表板（Streamlit）仍可同時讀取；synchronous=NORMAL 在 WAL 下不會損毀資料，只是停電時可能少最後幾筆
+DB_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -16000,        # 負數單位為 KiB，約 16 MB
+    "mmap_size": 256 * 1024 * 1024,
+    "temp_store": "MEMORY",
+    "busy_timeout": 5000,        # 毫秒，遇到其他連線寫入時等待而不是直接失敗
+}
+
+_local = threading.local()
+_lock = threading.Lock()
+# close_all() 時加一，其他執行緒下次取用時發現編號不同就關掉舊連線重新建立
+_generation = 0
+
+
+def connect(db_path, pragmas=None):
+    """建立一條套用 DB_PRAGMAS 的新連線"""
+    conn = sqlite3.connect(db_path, check_same_thread=False)
+    for name, value in (DB_PRAGMAS if pragmas is None else pragmas).items():
+        conn.execute(f"PRAGMA {name} = {value}")
+    return conn
+
+
+def _thread_conns():
+    conns = getattr(_local, "conns", None)
+    if conns is None or _local.generation != _generation:
+        for conn in (conns or {}).values():
+            conn.close()
+        conns = _local.conns = {}
+        _local.generation = _generation
+    return conns
+
+
+def get_connection(db_path):
+    """
+    取得目前執行緒對應 db_path 的連線（第一次使用時建立）
+    同一個執行緒共用這條連線，寫入失敗時由呼叫端自己 rollback，不要留下沒結束的交易
+    執行緒結束時連線跟著被回收
+    """
+    conns = _thread_conns()
+    key = os.path.abspath(db_path)
+    conn = conns.get(key)
+    if conn is None:
+        conn = conns[key] = connect(db_path)
+    return conn
+
+
+def close_connection(db_path=None):
+    """關閉目前執行緒的連線（db_path 為 None 時全部關閉）"""
+    conns = _thread_conns()
+    keys = list(conns) if db_path is None else [os.path.abspath(db_path)]
+    for key in keys:
+        conn = conns.pop(key, None)
+        if conn is not None:
+            conn.close()
+
+
+def close_all():
+    """
+    關閉目前執行緒的連線，並讓其他執行緒下次取用時重新連線
+    （要搬移 / 刪除資料庫檔案、或換了 DB_PRAGMAS 之後呼叫）
+    """
+    global _generation
+    with _lock:
+        _generation += 1
+    close_connection()
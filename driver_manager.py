@@ -0,0 +1,269 @@
+import subprocess
+import threading
+import time
+import urllib3
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+
+# psutil 為選用套件，沒有安裝時不檢查記憶體用量
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+# 同一個 driver 載入幾次頁面後回收重建
+MAX_PAGE_LOADS = 60
+# Chrome（含所有子進程）記憶體超過多少 MB 就回收
+MAX_RSS_MB = 1500
+
+
+def cleanup_headless_chrome():
+    """僅清理 Selenium 啟動的 headless Chrome 進程"""
+    try:
+        # 尋找所有帶 "--headless" 的 Chrome 進程
+        result = subprocess.run(
+            'wmic process where "name=\'chrome.exe\' and commandline like \'%%--headless%%\'" get processid',
+            shell=True, capture_output=True, text=True
+        )
+
+        # 擷取 process ID
+        pids = [pid.strip() for pid in result.stdout.split() if pid.strip().isdigit()]
+        if pids:
+            for pid in pids:
+                subprocess.run(f"taskkill /PID {pid} /F", shell=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            print(f"🧹 已清理 {len(pids)} 個 headless Chrome 進程。")
+        else:
+            print("✅ 沒有發現殘留的 headless Chrome。")
+
+        # 一併清理殘留的 chromedriver
+        subprocess.run("taskkill /f /im chromedriver.exe", shell=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    except Exception as e:
+        print(f"⚠️ 清理過程出錯：{e}")
+
+
+def create_driver(cleanup=True):
+    urllib3.PoolManager().clear()
+    # 多個 worker 同時運作時不可清理，否則會關掉其他 worker 的 Chrome
+    if cleanup:
+        cleanup_headless_chrome()
+
+    options = Options()
+    options.add_argument('--headless')
+    options.add_argument('--disable-gpu')
+    options.add_argument('--window-size=2560,1440')
+    options.add_argument('--mute-audio')
+    options.add_argument('--ignore-certificate-errors')
+    options.add_argument('--ignore-ssl-errors')
+    options.add_argument('--no-sandbox')
+    options.add_argument('--disable-dev-shm-usage')
+    options.add_argument('--disable-features=VizDisplayCompositor')
+    options.add_argument('--disable-software-rasterizer')
+    options.add_argument('--disable-extensions')
+    options.add_argument('--disable-infobars')
+    options.add_argument('--disable-blink-features=AutomationControlled')
+    options.add_argument('--dns-prefetch-disable')  # ✅ 避免 TCP DNS hang
+    options.add_argument("--disable-breakpad")
+    options.add_argument("--disable-crash-reporter")
+    options.add_argument("--disable-logging")
+    options.add_argument("--log-level=3")
+    options.add_argument('--disable-features=NetworkService,NetworkServiceInProcess')
+
+    try:
+        driver = webdriver.Chrome(options=options)
+        driver.set_page_load_timeout(20)   # ✅ 加上載入逾時保護
+        driver.set_script_timeout(20)
+        return driver
+    except Exception as e:
+        print(f"❌ ChromeDriver 初始化失敗：{e}")
+        time.sleep(3)
+        if cleanup:
+            cleanup_headless_chrome()
+        return webdriver.Chrome(options=options)
+
+
+# 安靜地關閉 driver（已崩潰的 driver quit 也可能丟例外）
+def quit_driver(driver):
+    if driver is None:
+        return
+    try:
+        driver.quit()
+    except Exception:
+        pass
+
+
+# 簡單的存活檢查：能執行一行 JS 就當作還活著
+def is_driver_alive(driver):
+    if driver is None:
+        return False
+    try:
+        return driver.execute_script("return 1") == 1
+    except Exception:
+        return False
+
+
+# Chrome 與其所有子進程的記憶體用量（MB），無法取得時回傳 None
+def driver_rss_mb(driver):
+    if psutil is None:
+        return None
+    try:
+        proc = psutil.Process(driver.service.process.pid)
+        total = proc.memory_info().rss
+        for child in proc.children(recursive=True):
+            try:
+                total += child.memory_info().rss
+            except psutil.Error:
+                pass
+        return total / (1024 * 1024)
+    except Exception:
+        return None
+
+
+class DriverManager:
+    """
+    管理所有 Chrome driver 的生命週期：
+    - 取用前做存活檢查
+    - 載入頁數或記憶體超過上限就回收重建
+    - 保留一個預先啟動的備用瀏覽器，壞掉時直接接手不必冷啟動
+    """
+
+    def __init__(self, max_page_loads=MAX_PAGE_LOADS, max_rss_mb=MAX_RSS_MB, standby=True):
+        self.max_page_loads = max_page_loads
+        self.max_rss_mb = max_rss_mb
+        self.use_standby = standby
+
+        self._lock = threading.Lock()
+        self._idle = []           # 週期之間保留的 driver
+        self._page_loads = {}     # id(driver) -> 已載入頁數
+        self._standby = None
+        self._standby_thread = None
+        self._started = False
+
+    def start(self):
+        """
+        第一次使用時清理殘留 Chrome
+        備用瀏覽器等到第一次建立 driver 時才啟動（HTTP 後端全部命中時不開任何瀏覽器）
+        """
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        cleanup_headless_chrome()
+
+    # ---------- 備用瀏覽器 ----------
+
+    def _refill_standby(self):
+        if not self.use_standby:
+            return
+        with self._lock:
+            if self._standby is not None:
+                return
+            if self._standby_thread and self._standby_thread.is_alive():
+                return
+            self._standby_thread = threading.Thread(target=self._launch_standby, daemon=True)
+            self._standby_thread.start()
+
+    def _launch_standby(self):
+        try:
+            driver = create_driver(cleanup=False)
+        except Exception as e:
+            print(f"⚠️ 備用瀏覽器啟動失敗：{e}")
+            return
+        with self._lock:
+            if self._standby is None and self._started:
+                self._standby = driver
+                driver = None
+        # 已有備用或管理器已關閉時，多出來的直接關掉
+        quit_driver(driver)
+
+    def _take_standby(self):
+        with self._lock:
+            driver, self._standby = self._standby, None
+        if driver is not None and not is_driver_alive(driver):
+            quit_driver(driver)
+            driver = None
+        return driver
+
+    # ---------- 取得 / 歸還 ----------
+
+    def _new_driver(self):
+        driver = self._take_standby()
+        if driver is not None:
+            print("🔁 由備用瀏覽器接手")
+        else:
+            driver = create_driver(cleanup=False)
+        self._page_loads[id(driver)] = 0
+        self._refill_standby()
+        return driver
+
+    def acquire(self):
+        """取得一個可用的 driver（優先使用上個週期保留下來的）"""
+        self.start()
+        while True:
+            with self._lock:
+                driver = self._idle.pop() if self._idle else None
+            if driver is None:
+                return self._new_driver()
+            if is_driver_alive(driver):
+                return driver
+            self._discard(driver)
+
+    def release(self, driver):
+        """週期結束時歸還 driver，留給下個週期使用"""
+        if driver is None:
+            return
+        if is_driver_alive(driver):
+            with self._lock:
+                self._idle.append(driver)
+        else:
+            self._discard(driver)
+
+    def ensure(self, driver):
+        """
+        每次載入頁面前呼叫：
+        檢查 driver 是否存活、是否該回收，必要時換成新的 driver
+        driver 為 None（還沒取用）時才向管理器取得，優先使用上個週期保留下來的
+        """
+        if driver is None:
+            driver = self.acquire()
+        elif not is_driver_alive(driver):
+            return self.replace(driver)
+
+        count = self._page_loads.get(id(driver), 0)
+        if count >= self.max_page_loads:
+            print(f"♻️ driver 已載入 {count} 頁，回收重建")
+            return self.replace(driver)
+
+        if self.max_rss_mb:
+            rss = driver_rss_mb(driver)
+            if rss is not None and rss > self.max_rss_mb:
+                print(f"♻️ driver 記憶體 {rss:.0f} MB 超過上限，回收重建")
+                return self.replace(driver)
+
+        self._page_loads[id(driver)] = count + 1
+        return driver
+
+    def replace(self, driver):
+        """丟棄壞掉或需要回收的 driver，回傳接手的新 driver"""
+        self._discard(driver)
+        driver = self._new_driver()
+        self._page_loads[id(driver)] = 1
+        return driver
+
+    def _discard(self, driver):
+        if driver is None:
+            return
+        self._page_loads.pop(id(driver), None)
+        # 崩潰的 Chrome quit 可能卡住，放到背景執行
+        threading.Thread(target=quit_driver, args=(driver,), daemon=True).start()
+
+    def shutdown(self):
+        """關閉所有 driver（包含備用瀏覽器）"""
+        with self._lock:
+            drivers = self._idle + [self._standby]
+            self._idle = []
+            self._standby = None
+            self._started = False
+        for driver in drivers:
+            quit_driver(driver)
+        self._page_loads.clear()
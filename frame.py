@@ -0,0 +1,104 @@
+import os
+import cv2
+import numpy as np
+from PIL import Image
+
+# 除錯用：開啟後才會把截圖、比對標記、裁切結果寫到 pictures/ 底下
+DEBUG_IMAGE_SINK = False
+
+
+class Frame:
+    """
+    一次截圖的解碼結果
+    從 get_screenshot_as_png 解碼後，比對、裁切、OCR 都直接使用 NumPy 陣列，不經過硬碟
+    """
+
+    def __init__(self, image, path=None):
+        self.image = image   # BGR 陣列
+        self.path = path     # 除錯輸出用的檔案路徑
+        self.crop = None     # 最近一次 find_and_crop 的裁切結果
+        self._gray = None
+        self._small = {}     # 縮小倍率 -> 縮小後的灰階圖
+        self.matches = {}    # (模板, 門檻) -> 比對結果，同一張截圖不重複比對
+
+    @classmethod
+    def from_png(cls, png_bytes, path=None):
+        buf = np.frombuffer(png_bytes, dtype=np.uint8)
+        image = cv2.imdecode(buf, cv2.IMREAD_COLOR)
+        if image is None:
+            return None
+        return cls(image, path)
+
+    @classmethod
+    def from_driver(cls, driver, path=None):
+        """直接從 driver 取得截圖，並視設定寫一份到除錯路徑"""
+        frame = cls.from_png(driver.get_screenshot_as_png(), path)
+        if frame is not None and path:
+            debug_save(path, frame.image)
+        return frame
+
+    # 只有灰階圖時（例如只做比對），不需要彩色原圖
+    @classmethod
+    def from_gray(cls, gray):
+        frame = cls(None)
+        frame._gray = gray
+        return frame
+
+    @classmethod
+    def load(cls, path):
+        image = cv2.imread(path)
+        if image is None:
+            return None
+        return cls(image, path)
+
+    # 灰階只轉一次，之後的比對共用
+    @property
+    def gray(self):
+        if self._gray is None:
+            self._gray = cv2.cvtColor(self.image, cv2.COLOR_BGR2GRAY)
+        return self._gray
+
+    # 粗略比對用的縮小灰階圖，同一個倍率只縮一次
+    def small_gray(self, factor):
+        if factor not in self._small:
+            self._small[factor] = downscale(self.gray, factor)
+        return self._small[factor]
+
+    @property
+    def shape(self):
+        return self.image.shape
+
+
+def downscale(gray, factor):
+    return cv2.resize(gray, None, fx=1 / factor, fy=1 / factor, interpolation=cv2.INTER_AREA)
+
+
+# 接受 Frame、BGR 陣列或檔案路徑（舊用法），統一轉成 Frame
+def load_frame(img):
+    if isinstance(img, Frame):
+        return img
+    if isinstance(img, np.ndarray):
+        return Frame(img)
+    if isinstance(img, str):
+        return Frame.load(img)
+    return None
+
+
+# 除錯輸出：只有 DEBUG_IMAGE_SINK 開啟（或 force）時才寫檔
+def debug_save(path, image, force=False):
+    if not (DEBUG_IMAGE_SINK or force) or not path or image is None:
+        return False
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    cv2.imwrite(path, image)
+    return True
+
+
+# 給 Tesseract / PIL 使用：陣列轉成 RGB 的 PIL 圖片，路徑則直接開啟
+def to_pil(img):
+    if isinstance(img, np.ndarray):
+        if img.ndim == 2:
+            return Image.fromarray(img)
+        return Image.fromarray(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
+    return Image.open(img)
@@ -0,0 +1,284 @@
+import glob
+import os
+import threading
+import cv2
+import numpy as np
+
+import stats
+
+# 觀看人數的字型與縮放是固定的，直接用字形模板比對數字，不必跑整個深度 OCR
+# 模板放在 find/glyphs/<平台>/<標籤>_<編號>.png，不隨程式附帶：
+# 一開始全部交給 EasyOCR，再用 EasyOCR 讀出的人數切字存成模板（observe / learn），第一次執行時就會自己建好
+# 模板庫要先連續 GLYPH_VERIFY 張和 EasyOCR 結果一致才開始取代 EasyOCR，
+# 之後每 GLYPH_RECHECK 張仍有一張交給 EasyOCR 抽查，不一致就停用、補學這張、重新驗證
+GLYPH_DIR = "find/glyphs"
+# 每個字形縮放成固定大小後比較
+GLYPH_SIZE = (12, 20)   # (寬, 高)
+# 相似度低於這個值就當作不認得，整張改用 EasyOCR
+GLYPH_MIN_SCORE = 0.8
+# 每個標籤最多保留幾張模板，額滿後由新學到的依序覆蓋最舊的
+GLYPH_MAX_PER_LABEL = 20
+# 開始取代 EasyOCR 前需要連續一致的張數（每次啟動重新驗證）
+GLYPH_VERIFY = 30
+# 通過驗證後每幾張抽查一次
+GLYPH_RECHECK = 20
+
+# 檔名標籤 <-> 字元
+LABEL_CHARS = {str(d): str(d) for d in range(10)}
+LABEL_CHARS.update({"comma": ",", "ren": "人"})
+CHAR_LABELS = {c: label for label, c in LABEL_CHARS.items()}
+
+
+# ---------- 切字 ----------
+
+def binarize(crop):
+    """轉成文字為 1、背景為 0 的二值圖（不論亮字暗底或暗字亮底）"""
+    gray = crop if crop.ndim == 2 else cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+    _, binary = cv2.threshold(gray, 0, 1, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    # 文字的像素比背景少，多數為 1 就反轉
+    if binary.mean() > 0.5:
+        binary = 1 - binary
+    return binary
+
+
+def segment(crop):
+    """
+    用垂直投影把一行文字切成一個個字形
+    每個字形保留整行的高度（逗號才會落在下方），回傳 (起點 x, 終點 x, 正規化影像) 列表
+    """
+    binary = binarize(crop)
+    rows = np.flatnonzero(binary.any(axis=1))
+    if rows.size == 0:
+        return []
+    line = binary[rows[0]:rows[-1] + 1]
+
+    cols = line.any(axis=0)
+    # 找出連續有文字的欄位區段
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], cols.astype(np.int8), [0]))))
+    # 窄的字形（例如 1、逗號）左右補白到固定寬高比，縮放後才不會被拉成一整塊
+    min_width = int(round(line.shape[0] * GLYPH_SIZE[0] / GLYPH_SIZE[1]))
+    glyphs = []
+    for start, end in zip(edges[::2], edges[1::2]):
+        glyph = line[:, start:end].astype(np.float32)
+        pad = max(0, min_width - glyph.shape[1])
+        if pad:
+            glyph = np.pad(glyph, ((0, 0), (pad // 2, pad - pad // 2)))
+        glyphs.append((int(start), int(end), cv2.resize(glyph, GLYPH_SIZE, interpolation=cv2.INTER_AREA)))
+    return glyphs
+
+
+def _vectorize(images):
+    """攤平並標準化（減平均、除以長度），內積就是正規化相關係數"""
+    vectors = np.stack([image.ravel() for image in images]).astype(np.float32)
+    vectors -= vectors.mean(axis=1, keepdims=True)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-6)
+
+
+# ---------- 模板庫 ----------
+
+class GlyphBank:
+    """一個平台的字形模板：labels[i] 對應 vectors 的第 i 列"""
+
+    def __init__(self, labels, images):
+        self.labels = list(labels)
+        self.vectors = _vectorize(images) if images else np.zeros((0, GLYPH_SIZE[0] * GLYPH_SIZE[1]), np.float32)
+
+    def __len__(self):
+        return len(self.labels)
+
+    @classmethod
+    def load(cls, folder):
+        labels, images = [], []
+        for path in sorted(glob.glob(os.path.join(folder, "*.png"))):
+            label = os.path.basename(path).rsplit("_", 1)[0]
+            image = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+            if label in LABEL_CHARS and image is not None:
+                labels.append(label)
+                images.append(cv2.resize(image, GLYPH_SIZE).astype(np.float32) / 255)
+        return cls(labels, images)
+
+    def classify(self, glyphs):
+        """所有字形一次和所有模板做內積，回傳 [(字元, 相似度), ...]"""
+        if not glyphs or not len(self):
+            return []
+        scores = _vectorize([image for _, _, image in glyphs]) @ self.vectors.T
+        best = scores.argmax(axis=1)
+        return [(LABEL_CHARS[self.labels[i]], float(scores[row, i])) for row, i in enumerate(best)]
+
+
+_lock = threading.RLock()
+_banks = {}   # 平台 -> GlyphBank
+_next = {}    # (平台, 標籤) -> 下一個寫入的編號（累加，取餘數後覆蓋最舊的）
+_verify = {}  # 平台 -> {"agreed": 連續一致張數, "active": 是否取代 EasyOCR, "reads": 通過後讀取張數}
+
+
+def get_bank(platform):
+    with _lock:
+        if platform not in _banks:
+            _banks[platform] = GlyphBank.load(os.path.join(GLYPH_DIR, platform))
+        return _banks[platform]
+
+
+def clear_banks():
+    with _lock:
+        _banks.clear()
+        _next.clear()
+        _verify.clear()
+
+
+def label_text(platform, count):
+    """人數在裁切圖上的文字：YouTube「1,234 人」、Twitch「1,234」"""
+    return f"{count:,} 人" if platform == "youtube" else f"{count:,}"
+
+
+def _write_sample(folder, platform, crop, text):
+    """
+    把一張裁切圖切字後依文字存成模板，回傳寫入的模板數
+    YouTube 的人數在最左邊（後面還有「正在觀看」），Twitch 的人數在最右邊（前面可能有圖示）
+    切出來的字形數量少於文字長度的樣本會略過
+    """
+    chars = [c for c in text if not c.isspace()]
+    glyphs = segment(crop)
+    if len(glyphs) < len(chars) or any(c not in CHAR_LABELS for c in chars):
+        return 0
+    glyphs = glyphs[:len(chars)] if platform == "youtube" else glyphs[len(glyphs) - len(chars):]
+    written = 0
+    for c, (_, _, image) in zip(chars, glyphs):
+        label = CHAR_LABELS[c]
+        key = (platform, label)
+        if key not in _next:
+            _next[key] = len(glob.glob(os.path.join(folder, f"{label}_*.png")))
+        n = _next[key] % GLYPH_MAX_PER_LABEL
+        _next[key] += 1
+        cv2.imwrite(os.path.join(folder, f"{label}_{n}.png"), (image * 255).astype(np.uint8))
+        written += 1
+    return written
+
+
+def build_bank(samples, platform, folder=None):
+    """
+    從標記好的裁切圖建立模板庫
+    samples：[(裁切圖, 文字), ...]，文字例如 "1,234 人"（YouTube）或 "3,598"（Twitch）
+    回傳寫入的模板數
+    """
+    folder = folder or os.path.join(GLYPH_DIR, platform)
+    os.makedirs(folder, exist_ok=True)
+    with _lock:
+        written = sum(_write_sample(folder, platform, crop, text) for crop, text in samples)
+        _banks.pop(platform, None)
+    return written
+
+
+def learn(crop, platform, count):
+    """用 EasyOCR 讀出的人數把這張裁切圖的字形加進模板庫，回傳寫入的模板數"""
+    folder = os.path.join(GLYPH_DIR, platform)
+    os.makedirs(folder, exist_ok=True)
+    with _lock:
+        written = _write_sample(folder, platform, crop, label_text(platform, count))
+        if written:
+            _banks.pop(platform, None)
+    stats.incr(f"glyph.{platform}.learned", written)
+    return written
+
+
+def observe(crop, platform, count):
+    """
+    EasyOCR 讀完一張裁切圖後呼叫：比對模板庫的讀法，一致就累計驗證
+    讀錯時停用、重新驗證並學這張；沒把握（讀不出來）時只學這張，不算讀錯
+    count 為 EasyOCR 的人數，失敗（負數）時不處理
+    """
+    if count is None or int(count) < 0 or crop is None:
+        return
+    guess = classify_count(crop, platform)
+    with _lock:
+        state = _verify.setdefault(platform, {"agreed": 0, "active": False, "reads": 0})
+        if guess is not None and int(guess) == int(count):
+            state["agreed"] += 1
+            if not state["active"] and state["agreed"] >= GLYPH_VERIFY:
+                state["active"] = True
+                print(f"✅ {platform} 字形模板連續 {GLYPH_VERIFY} 張與 EasyOCR 一致，開始取代 EasyOCR")
+            return
+        if guess is not None:
+            if state["active"]:
+                print(f"⚠️ {platform} 字形模板讀成 {guess}，EasyOCR 為 {count}，停用並重新驗證")
+            stats.incr(f"glyph.{platform}.mismatch")
+            state["agreed"] = 0
+            state["active"] = False
+    learn(crop, platform, int(count))
+
+
+# ---------- 讀取人數 ----------
+
+def _confident(result, index):
+    return result[index][1] >= GLYPH_MIN_SCORE
+
+
+def _digits_before(glyphs, result, end):
+    """
+    從 end 往左收集有把握的數字與逗號
+    緊貼著這段數字的字形如果認不出來（可能是同一個數字的一部分），整段當作沒把握
+    """
+    index = end - 1
+    while index >= 0 and _confident(result, index) and result[index][0] in "0123456789,":
+        index -= 1
+    first = index + 1
+    if first == end:
+        return None
+
+    # 間距小於字寬就算同一串數字
+    width = max(g[1] - g[0] for g in glyphs[first:end])
+    if first > 0 and not _confident(result, first - 1) and glyphs[first][0] - glyphs[first - 1][1] < width:
+        return None
+    if end < len(glyphs) and not _confident(result, end) and glyphs[end][0] - glyphs[end - 1][1] < width:
+        return None
+
+    text = "".join(char for char, _ in result[first:end]).strip(",")
+    return text.replace(",", "") if any(c.isdigit() for c in text) else None
+
+
+def read_count(crop, platform):
+    """
+    用字形模板讀取觀看人數，回傳字串（與 extract_viewer_count 相同）
+    模板庫還沒通過驗證、輪到抽查、或沒把握時回傳 None，由呼叫端改用 EasyOCR（之後再呼叫 observe）
+    """
+    with _lock:
+        state = _verify.get(platform)
+        if state is None or not state["active"]:
+            return None
+        state["reads"] += 1
+        if state["reads"] % GLYPH_RECHECK == 0:
+            stats.incr(f"glyph.{platform}.recheck")
+            return None
+    count = classify_count(crop, platform)
+    stats.incr(f"glyph.{platform}.{'hit' if count else 'miss'}")
+    return count
+
+
+def classify_count(crop, platform):
+    """
+    只用模板庫讀取觀看人數（不看驗證狀態），沒有模板或沒把握時回傳 None
+    YouTube：「人」前面的數字；Twitch：最右邊一段連續的數字
+    """
+    bank = get_bank(platform)
+    if not len(bank):
+        return None
+    if isinstance(crop, str):
+        crop = cv2.imread(crop)
+    if crop is None or not crop.size:
+        return None
+
+    glyphs = segment(crop)
+    result = bank.classify(glyphs)
+    count = None
+    if platform == "youtube":
+        for index, (char, score) in enumerate(result):
+            if char == "人" and score >= GLYPH_MIN_SCORE:
+                count = _digits_before(glyphs, result, index)
+                break
+    else:
+        ends = [i + 1 for i, (char, score) in enumerate(result)
+                if char.isdigit() and score >= GLYPH_MIN_SCORE]
+        if ends:
+            count = _digits_before(glyphs, result, ends[-1])
+    return count
@@ -0,0 +1,12 @@
+import requests
+from requests.adapters import HTTPAdapter
+
+
+# 建立共用的 keep-alive session（多個 worker 共用連線池），YouTube / Twitch 的 HTTP 後端都用這個
+def create_http_session(headers=None, pool_size=8):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=1)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update(headers or {})
+    return session
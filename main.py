@@ -1,123 +1,338 @@
 import csv
 import time
 import sqlite3
-import easyocr
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-import subprocess
 import socket
 import urllib3
 import os
 import sys
+import queue
+import threading
 
 
 from youtube import (
     youtube_capture_screenshot,
     youtube_find_and_crop,  
-    youtube_extract_viewer_count
+    youtube_extract_viewer_count,
+    youtube_dom_viewer_count,
+    youtube_live_link,
+    youtube_fetch_live,
+    youtube_parse_viewer_count,
+    YT_VIEWER_ALLOWLIST
 )
 
 from twitch import (
     twitch_capture_screenshot,
     twitch_find_and_crop,
     twitch_extract_viewer_count,
+    twitch_dom_viewer_count,
+    twitch_fetch_live,
+    twitch_detect,
+    twitch_parse_viewer_count,
+    TW_VIEWER_ALLOWLIST
+)
+
+import stats
+from ocr import ocr_job, run_ocr_jobs, get_reader, start_warmup
+from ocr_pool import OcrPool, OCR_POOL_SIZE, OCR_TORCH_THREADS
+from glyphs import read_count, observe
+import ocr_cache
+from templates import preload_templates
+
+from driver_manager import (
+    DriverManager,
+    cleanup_headless_chrome
 )
 
 from sql import (
     init_db,
     add_streamer,
-    save_viewer_count,
     load_channels_from_db,
-    yt_number_get,
-    tw_number_get,
-    insert_working
+    insert_working,
+    cut_title_yt,
+    cut_title_tw,
+    CycleWriter
 )
 
-OCR_READER = easyocr.Reader(['ch_tra', 'en'], gpu=False)  
+# EasyOCR 模型不保證多執行緒同時推論安全，用鎖保護
+# 模型本身由 ocr.get_reader() 在第一次需要時載入（或由 warm_up 提早在背景載入）
+OCR_LOCK = threading.Lock()
 DB_PATH = "data.db"
 
+# 同時運作的 WebDriver 數量
+WORKER_COUNT = 3
+
+# 觀看人數擷取模式
+# "dom"：先從網頁 DOM 讀取，選擇器失效時才用截圖 + OCR
+# "ocr"：只用截圖 + 模板比對 + OCR
+EXTRACT_MODE = "dom"
+
+# YouTube 擷取後端
+# "http"：不開瀏覽器直接解析頁面 JSON，失敗的頻道才改用 Selenium
+# "selenium"：一律用 Selenium 截圖
+YT_BACKEND = "http"
+
+# Twitch 擷取後端（同上），"http" 使用 Twitch GQL 查詢
+TW_BACKEND = "http"
+
+# 觀看人數 OCR 的執行方式
+# "inline"：擷取時當場辨識
+# "batch"：擷取階段只收集裁切圖，所有頻道擷取完才一起批次辨識
+# "pool"：裁切圖交給獨立的 OCR 進程池，瀏覽器繼續載入下一頁，辨識在背景進行
+OCR_MODE = "pool"
+# 每批送進辨識器的裁切圖數量（batch 模式）
+OCR_BATCH_SIZE = 8
+
+# 觀看人數先用字形模板讀取（glyphs.read_count），沒把握時才送 EasyOCR
+# 模板庫由 EasyOCR 的讀取結果自動建立（glyphs.observe），連續一致一段時間後才開始取代 EasyOCR
+GLYPH_OCR = True
 
-def yt_part(log, cid, name, yt_url, driver):
+# 跨週期保留的 OCR 進程池（pool 模式第一次用到時建立）
+# ui.py 的預熱執行緒與 main() 可能同時第一次取用，用鎖確保只建立一個（每個都會各自載入模型）
+OCR_POOL = None
+OCR_POOL_LOCK = threading.Lock()
+
+# 跨週期保留的 driver 管理器（第一次執行 main 時建立）
+DRIVER_MANAGER = None
+
+
+def yt_part(log, cid, name, yt_url, driver, manager=None):
     
     log(f"📺 處理 YouTube 頻道：{name}")
     screenshot_path = f"pictures/yt_picture/{cid}_capture.png"
     cropped_path = f"pictures/yt_crop/{cid}_crop.png"
     template_path = "find/yt_find.png"
+    # 擷取過程取得的資料（截圖、直播標題、網址），新增直播紀錄時使用
+    # 確定沒開台時（不是擷取失敗）加上 "offline"，用來結束進行中的直播
+    capture = {"frame": None}
+    
+    # 步驟 0（HTTP 後端）：不開瀏覽器直接取得開台狀態
+    if YT_BACKEND == "http":
+        with stats.timer("yt.http.time"):
+            info = youtube_fetch_live(yt_url)
+        if info is not None and not info["live"]:
+            stats.incr("yt.http.offline")
+            capture["offline"] = True
+            log(f"❌ {name} youtube沒在開台（HTTP）")
+            return 0, False, True, driver, capture
+        if info is not None:
+            stats.incr("yt.http.live")
+            capture["title"] = info["title"]
+            capture["video_url"] = info["video_url"]
+            log(f"🎉 [{name}] 正在觀看人數：{info['viewers']} 人（HTTP）")
+            return info["viewers"], True, True, driver, capture
+        stats.incr("yt.http.miss")
+        log("⚠️ HTTP 解析失敗，改用 Selenium")
     
     # 步驟 1：截圖網頁
-    ok, driver,error = youtube_capture_screenshot(yt_url, screenshot_path, driver)
+    if manager:
+        driver = manager.ensure(driver)
+    ok, driver,error,frame = youtube_capture_screenshot(yt_url, screenshot_path, driver, manager=manager)
     if not ok:
         log("❌ 截圖失敗，略過此頻道")
-        return 0, False, error, driver
-    
+        return 0, False, error, driver, capture
+    capture["frame"] = frame
+    
+    # 步驟 2（DOM 模式）：直接從網頁讀取，失敗才往下走 OCR
+    if EXTRACT_MODE == "dom":
+        with stats.timer("yt.dom.time"):
+            state, dom_count = youtube_dom_viewer_count(driver)
+        if state == "offline":
+            stats.incr("yt.dom.offline")
+            capture["offline"] = True
+            log(f"❌ {name} youtube沒在開台（DOM）")
+            return 0, False, error, driver, capture
+        if state == "live":
+            stats.incr("yt.dom.live")
+            capture.update(youtube_live_link(driver))
+            log(f"🎉 [{name}] 正在觀看人數：{dom_count} 人（DOM）")
+            return dom_count, True, error, driver, capture
+        stats.incr("yt.dom.miss")
+        log("⚠️ DOM 讀取失敗，改用 OCR")
+
+    with stats.timer("yt.ocr.time"):
+        yt_count, streaming, error, driver, frame = yt_ocr_part(log, cid, name, frame, cropped_path, template_path, error, driver, capture)
+    stats.incr("yt.ocr.live" if streaming else "yt.ocr.not_live")
+    # 頁面還在，先記下直播網址與標題（新增直播紀錄時用，不必重新載入頁面點擊）
+    if streaming and driver is not None:
+        capture.update(youtube_live_link(driver))
+    # 等待批次 OCR 時不保留整張截圖，還缺標題或網址時先裁好標題區域與點擊座標
+    if "ocr" in capture:
+        if not capture.get("title") or not capture.get("video_url"):
+            title_crop, find_x, find_y = cut_title_yt(frame, template_path, cropped_path)
+            capture["title_crop"] = title_crop
+            capture["find_xy"] = (find_x, find_y)
+        capture["frame"] = None
+    return yt_count, streaming, error, driver, capture
+
+
+# 截圖 + 模板比對 + OCR 取得 YouTube 觀看人數
+def yt_ocr_part(log, cid, name, frame, cropped_path, template_path, error, driver, capture=None):
 
-    
     # 步驟 2：裁切圖片和確認是否再開台
     yt_find_and_crop_rt, find_x, find_y = \
         youtube_find_and_crop(
-            screenshot_path, 
+            frame, 
             template_path, 
             cropped_path,
             offset_x=-500,
             offset_y=110,
             crop_height=30,
-            crop_width=350
+            crop_width=350,
+            channel=cid
         )
         # 較長的標題
         
     if yt_find_and_crop_rt==1:
+        if capture is not None:
+            capture["offline"] = True
         log(f"❌ {name} youtube沒在開台")
-        return 0 ,False,error, driver
+        return 0 ,False,error, driver, frame
     elif yt_find_and_crop_rt==2:
         log("❌ 圖片開啟失敗")
-        return 0 ,False,error, driver
+        return 0 ,False,error, driver, frame
     
     log(f"✅ {name} youtube正在開台")
     
+    # 批次模式：先收集裁切圖，整個週期擷取完再一起辨識
+    if OCR_MODE != "inline" and capture is not None:
+        # 等待辨識期間只保留裁切圖：失敗時重試用的另一個位置（offset_y=80）也先裁好
+        crop = frame.crop.copy()
+        rt, _, _ = youtube_find_and_crop(frame, template_path, cropped_path, 80, channel=cid)
+        retry_crop = frame.crop.copy() if rt == 0 else None
+        capture["ocr"] = defer_ocr(
+            "yt_count", crop, YT_VIEWER_ALLOWLIST, youtube_parse_viewer_count,
+            fallback=lambda count: yt_ocr_retry(crop, retry_crop, count)
+        )
+        log(f"🕒 {name} 已加入 OCR 批次")
+        return 0 ,True,error, driver, frame
+    
     # 步驟 3：OCR 提取觀看人數
-    yt_count = youtube_extract_viewer_count(cropped_path, OCR_READER)
-    yt_count = int(yt_count) if isinstance(yt_count, str) else yt_count  # 確保是整數
+    yt_count = ocr_count("yt_count", frame.crop)
     
     
     if yt_count == -1:
         
         yt_find_and_crop_rt, find_x, find_y = \
             youtube_find_and_crop(
-                screenshot_path, 
+                frame, 
                 template_path, 
                 cropped_path,
-                80
+                80,
+                channel=cid
             )
             
         if yt_find_and_crop_rt==1:
+            if capture is not None:
+                capture["offline"] = True
             log(f"❌ {name} youtube沒在開台")
-            return 0 ,False,error, driver
+            return 0 ,False,error, driver, frame
         elif yt_find_and_crop_rt==2:
             log("❌ 圖片開啟失敗")
-            return 0 ,False,error, driver
+            return 0 ,False,error, driver, frame
         
-        yt_count = youtube_extract_viewer_count(cropped_path, OCR_READER)
-        yt_count = int(yt_count) if isinstance(yt_count, str) else yt_count
+        yt_count = ocr_count("yt_count", frame.crop)
         
         if(yt_count == -1):
             log(f"❌ [{name}] OCR 辨識失敗")
-            return 0 ,False,error, driver
+            return 0 ,False,error, driver, frame
     
     if yt_count == -2:
         log(f"❌ OCR 處理時發生錯誤")
-        return 0 ,False,error, driver
+        return 0 ,False,error, driver, frame
     else:
         log(f"🎉 [{name}] 正在觀看人數：{yt_count} 人")
-        return yt_count ,True,error, driver
-
-
-def tw_part(log, cid, name, tw_url , driver):
+        return yt_count ,True,error, driver, frame
+
+
+# 取得 OCR 進程池（跨週期保留，模型只在每個進程啟動時載入一次）
+def get_ocr_pool():
+    global OCR_POOL
+    with OCR_POOL_LOCK:
+        if OCR_POOL is None:
+            OCR_POOL = OcrPool(OCR_POOL_SIZE, OCR_TORCH_THREADS)
+        return OCR_POOL
+
+
+# 建立等待辨識的 OCR 工作；快取命中或字形模板讀得出來（GLYPH_OCR）就直接完成，pool 模式會立刻送進 OCR 進程池在背景辨識
+def defer_ocr(task, crop, allowlist, parse, fallback):
+    job = ocr_job(crop, allowlist, parse, fallback)
+    job["task"] = task
+    count = ocr_cache.lookup(task, crop)
+    if count is not None:
+        job["count"] = int(count)
+        job["cached"] = True
+        return job
+    # 字形模板有把握的不必送 OCR
+    count = read_count(crop, count_platform(task)) if GLYPH_OCR else None
+    if count is not None:
+        job["count"] = int(count)
+        job["glyph"] = True
+    elif OCR_MODE == "pool":
+        job["future"] = get_ocr_pool().submit(task, crop)
+    return job
+
+
+def count_platform(task):
+    return "youtube" if task.startswith("yt") else "twitch"
+
+
+# 完整辨識一張人數裁切圖（extract_viewer_count：辨識器沒結果時再跑偵測 + 辨識），回傳整數
+# 字形模板有把握時直接使用；pool 模式送進 OCR 進程池，主進程不載入模型；其他模式在這個進程辨識
+def ocr_count(task, crop):
+    count = read_count(crop, count_platform(task)) if GLYPH_OCR else None
+    if count is not None:
+        return int(count)
+    if OCR_MODE == "pool":
+        pool = get_ocr_pool()
+        count = pool.result(pool.submit(task, crop))
+    else:
+        extract = youtube_extract_viewer_count if task == "yt_count" else twitch_extract_viewer_count
+        with OCR_LOCK:
+            count = extract(crop, get_reader())
+        count = int(count) if isinstance(count, str) else count
+    # EasyOCR 的結果拿來驗證、補充字形模板
+    if GLYPH_OCR:
+        observe(crop, count_platform(task), count)
+    return count
+
+
+# 批次辨識失敗時逐張重試：先完整辨識原本的裁切圖，再換成另一個位置的裁切圖（retry_crop）
+# pool 模式的 OCR 進程已經對原本的裁切圖做過完整辨識，只有進程出錯（-2）時才重送
+def yt_ocr_retry(crop, retry_crop, count=-1):
+    if OCR_MODE != "pool" or count == -2:
+        yt_count = ocr_count("yt_count", crop)
+        if yt_count != -1:
+            return yt_count
+
+    if retry_crop is None:
+        return -1
+    return ocr_count("yt_count", retry_crop)
+
+
+def tw_part(log, cid, name, tw_url , driver, manager=None):
     log(f"🎮 處理 Twitch 頻道：{name}")
     screenshot_path = f"pictures/tw_picture/{cid}_capture.png"
     cropped_path = f"pictures/tw_crop/{cid}_crop.png"
     template_path = "find/tw_find_2.png"
-    template_path_2 = "find/tw_find_1.png"
-    
+    # 擷取過程取得的資料（截圖、直播標題），新增直播紀錄時使用
+    capture = {"frame": None}
+    
+    # 步驟 0（HTTP 後端）：不開瀏覽器直接取得開台狀態
+    if TW_BACKEND == "http":
+        with stats.timer("tw.http.time"):
+            info = twitch_fetch_live(tw_url)
+        if info is not None and not info["live"]:
+            stats.incr("tw.http.offline")
+            capture["offline"] = True
+            log(f"❌ {name} twitch沒在開台（HTTP）")
+            return 0, False, True, driver, capture
+        if info is not None:
+            stats.incr("tw.http.live")
+            capture["title"] = info["title"]
+            log(f"🎉 [{name}] 正在觀看人數：{info['viewers']} 人（HTTP）")
+            return info["viewers"], True, True, driver, capture
+        stats.incr("tw.http.miss")
+        log("⚠️ HTTP 查詢失敗，改用 Selenium")
     
     max_retries = 3
     retry_count = 0
@@ -125,33 +340,52 @@ def tw_part(log, cid, name, tw_url , driver):
 
     while retry_count < max_retries:
         # 步驟 1：截圖
-        ok, driver,error = twitch_capture_screenshot(tw_url, screenshot_path, driver)
+        if manager:
+            driver = manager.ensure(driver)
+        ok, driver,error,frame = twitch_capture_screenshot(tw_url, screenshot_path, driver, manager=manager)
         if not ok:
             log("❌ 截圖失敗，略過此頻道")
-            return 0, False,error, driver 
-
-        # 步驟 2：先比對 path1（開台畫面）
-        rt1 = twitch_find_and_crop(screenshot_path, template_path, cropped_path)
+            return 0, False,error, driver, capture
+        capture["frame"] = frame
+
+        # 步驟 2（DOM 模式）：直接從網頁讀取，失敗才往下走模板比對
+        if EXTRACT_MODE == "dom":
+            with stats.timer("tw.dom.time"):
+                state, dom_count = twitch_dom_viewer_count(driver)
+            if state == "offline":
+                stats.incr("tw.dom.offline")
+                capture["offline"] = True
+                log(f"❌ {name} twitch沒在開台（DOM）")
+                return 0, False, error, driver, capture
+            if state == "live":
+                stats.incr("tw.dom.live")
+                log(f"🎉 [{name}] 正在觀看人數：{dom_count} 人（DOM）")
+                return dom_count, True, error, driver, capture
+            stats.incr("tw.dom.miss")
+            log("⚠️ DOM 讀取失敗，改用 OCR")
+
+        # 步驟 2：同一張截圖一次比對開台 / 沒開台兩個模板
+        match_start = time.perf_counter()
+        state, frame = twitch_detect(frame, channel=cid)
         
-        if rt1 == 0:
+        if frame is None:
+            log("❌ 圖片開啟失敗")
+            return 0, False,error, driver, capture
+
+        if state == "live":
+            # 比對結果已留在 frame 上，這裡只做裁切
+            twitch_find_and_crop(frame, template_path, cropped_path, channel=cid)
             log(f"✅ {name} twitch正在開台")
             success = True
             break
-
-        elif rt1 == 2:
-            log("❌ 圖片開啟失敗（path1）")
-            return 0, False,error, driver
-
-        # 若 rt1 == 1，進入第二層判斷，用 path2（沒開台畫面）確認
-        rt2 = twitch_find_and_crop(screenshot_path, template_path_2, cropped_path)
         
-        if rt2 == 0:
-            log(f"❌ {name} twitch沒在開台")
-            return 0, False,error, driver
+        stats.add_time("tw.ocr.time", time.perf_counter() - match_start)
 
-        elif rt2 == 2:
-            log("❌ 圖片開啟失敗（path2）")
-            return 0, False,error, driver
+        if state == "offline":
+            stats.incr("tw.ocr.not_live")
+            capture["offline"] = True
+            log(f"❌ {name} twitch沒在開台")
+            return 0, False,error, driver, capture
 
         # 兩個都沒找到，屬於畫面異常，重試
         log("⚠️ 無法確認開台狀態，重新截圖中...")
@@ -159,87 +393,46 @@ def tw_part(log, cid, name, tw_url , driver):
 
     if not success:
         log(f"❌ {name} twitch疑似開台但畫面錯誤（已重試 {max_retries} 次）")
-        return 0, False,error, driver
+        stats.incr("tw.ocr.not_live")
+        return 0, False,error, driver, capture
 
 
+    # 批次模式：先收集裁切圖，整個週期擷取完再一起辨識
+    if OCR_MODE != "inline":
+        crop = frame.crop.copy()
+        capture["ocr"] = defer_ocr(
+            "tw_count", crop, TW_VIEWER_ALLOWLIST, twitch_parse_viewer_count,
+            fallback=lambda count: tw_ocr_retry(crop, count)
+        )
+        # 等待辨識期間不保留整張截圖，新增直播紀錄要用的標題區域先裁好
+        capture["title_crop"] = cut_title_tw(frame, cropped_path)
+        capture["frame"] = None
+        stats.add_time("tw.ocr.time", time.perf_counter() - match_start)
+        log(f"🕒 {name} 已加入 OCR 批次")
+        return 0 , True, error, driver, capture
+
     # 步驟 3：OCR 提取觀看人數
-    tw_count = twitch_extract_viewer_count(cropped_path, OCR_READER)
-    tw_count = int(tw_count) # 確保是整數
+    tw_count = ocr_count("tw_count", frame.crop)
+    stats.add_time("tw.ocr.time", time.perf_counter() - match_start)
+    stats.incr("tw.ocr.live" if tw_count >= 0 else "tw.ocr.not_live")
     
     if tw_count == -2:
         log(f"❌ OCR 處理時發生錯誤")
-        return 0 , False, error, driver
+        return 0 , False, error, driver, capture
     elif tw_count == -1:
         log(f"❌ [{name}] 沒有找到觀看人數")
-        return 0 , False, error, driver
+        return 0 , False, error, driver, capture
     else:
         log(f"🎉 [{name}] 正在觀看人數：{tw_count} 人")
-        return tw_count , True, error, driver
-
-
-def cleanup_headless_chrome():
-    """僅清理 Selenium 啟動的 headless Chrome 進程"""
-    try:
-        # 尋找所有帶 "--headless" 的 Chrome 進程
-        result = subprocess.run(
-            'wmic process where "name=\'chrome.exe\' and commandline like \'%%--headless%%\'" get processid',
-            shell=True, capture_output=True, text=True
-        )
-
-        # 擷取 process ID
-        pids = [pid.strip() for pid in result.stdout.split() if pid.strip().isdigit()]
-        if pids:
-            for pid in pids:
-                subprocess.run(f"taskkill /PID {pid} /F", shell=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-            print(f"🧹 已清理 {len(pids)} 個 headless Chrome 進程。 test")
-        else:
-            print("✅ 沒有發現殘留的 headless Chrome。test")
-
-        # 一併清理殘留的 chromedriver
-        subprocess.run("taskkill /f /im chromedriver.exe", shell=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-    except Exception as e:
-        print(f"⚠️ 清理過程出錯：{e}")
-        
-
-
-
-def create_driver():
-    urllib3.PoolManager().clear()
-    cleanup_headless_chrome()
-
-    options = Options()
-    options.add_argument('--headless')
-    options.add_argument('--disable-gpu')
-    options.add_argument('--window-size=2560,1440')
-    options.add_argument('--mute-audio')
-    options.add_argument('--ignore-certificate-errors')
-    options.add_argument('--ignore-ssl-errors')
-    options.add_argument('--no-sandbox')
-    options.add_argument('--disable-dev-shm-usage')
-    options.add_argument('--disable-features=VizDisplayCompositor')
-    options.add_argument('--disable-software-rasterizer')
-    options.add_argument('--disable-extensions')
-    options.add_argument('--disable-infobars')
-    options.add_argument('--disable-blink-features=AutomationControlled')
-    options.add_argument('--dns-prefetch-disable')  # ✅ 避免 TCP DNS hang
-    options.add_argument("--disable-breakpad")
-    options.add_argument("--disable-crash-reporter")
-    options.add_argument("--disable-logging")
-    options.add_argument("--log-level=3")
-    options.add_argument('--disable-features=NetworkService,NetworkServiceInProcess')
-
-    try:
-        driver = webdriver.Chrome(options=options)
-        driver.set_page_load_timeout(20)   # ✅ 加上載入逾時保護
-        driver.set_script_timeout(20)
-        return driver
-    except Exception as e:
-        print(f"❌ ChromeDriver 初始化失敗：{e}")
-        time.sleep(3)
-        cleanup_headless_chrome()
-        return webdriver.Chrome(options=options)
+        return tw_count , True, error, driver, capture
 
 
+# 批次辨識失敗時逐張重試（完整偵測 + 辨識）
+# pool 模式的 OCR 進程已經做過同樣的完整辨識，只有進程出錯（-2）時才重送
+def tw_ocr_retry(crop, count=-1):
+    if OCR_MODE == "pool" and count != -2:
+        return count
+    return ocr_count("tw_count", crop)
 
 
 def reset_socket_layer():
@@ -249,6 +442,7 @@ def reset_socket_layer():
     except Exception as e:
         print(f"⚠️ socket 清理失敗：{e}")
 
+# 最後手段：driver 管理器連續無法啟動瀏覽器時才重啟整個 UI
 def restart_ui():
     print("🚨 錯誤過多，正在重新啟動 UI 程式...")
     cleanup_headless_chrome()
@@ -257,44 +451,303 @@ def restart_ui():
     os.execl(python, python, ui_path)
 
 
-def main(log_callback=None,kind=0):
+# 處理單一頻道：YouTube、Twitch 擷取後寫入資料庫
+# 回傳處理完後的 driver（可能已被重建）
+def process_channel(log, channel, driver, cycle_state):
+    cid, name, yt_url, tw_url = channel
+    manager = cycle_state["manager"]
+
+    ytstreaming = False  # 是否正在 YouTube 開台
+    twstreaming = False  # 是否正在 Twitch 開台
+    yt_count = 0  # YouTube 觀看人數
+    tw_count = 0  # Twitch 觀看人數
+    error = True
+    yt_capture = {}  # YouTube 擷取結果（截圖、標題等，新增直播紀錄時重複使用）
+    tw_capture = {}  # Twitch 擷取結果
+
+    log(f"\n🔍 處理頻道：{name} (ID: {cid})")
+
+    # 處理 YouTube 頻道
+    if yt_url:
+        yt_count ,ytstreaming,error,driver,yt_capture = yt_part(log, cid, name, yt_url, driver, manager)
+    else:
+        log(f"❌ {name} 沒有提供 YouTube 連結，跳過")
+
+    if not error:
+        log("🔁 YouTube 擷取時 driver 出錯，已換上新的 driver")
+
+    # 處理 Twitch 頻道
+    error = True
+    if tw_url:
+        tw_count ,twstreaming,error,driver,tw_capture = tw_part(log, cid, name, tw_url, driver, manager)
+    else:
+        log(f"❌ {name} 沒有提供 Twitch 直播連結，跳過")
+
+    if not error:
+        log("🔁 Twitch 擷取時 driver 出錯，已換上新的 driver")
+
+    record = {
+        "channel": channel,
+        "yt": [yt_count, ytstreaming, yt_capture],
+        "tw": [tw_count, twstreaming, tw_capture],
+    }
+
+    # 還有裁切圖在等批次 OCR 時，先記下來，辨識完再寫入資料庫
+    if "ocr" in yt_capture or "ocr" in tw_capture:
+        with cycle_state["lock"]:
+            cycle_state["pending"].append(record)
+    else:
+        driver = finish_channel(log, record, driver, cycle_state)
+
+    reset_socket_layer()
+    time.sleep(0.5)
+    return driver
+
+
+# 依擷取結果寫入資料庫（新增或延長直播紀錄、儲存觀看人數）
+# 回傳處理完後的 driver（可能已被重建）
+def finish_channel(log, record, driver, cycle_state):
+    cid = record["channel"][0]
+    yt_capture = record["yt"][2]
+    tw_capture = record["tw"][2]
+    manager = cycle_state["manager"]
+
+    # 確定沒開台的平台結束進行中的直播（擷取失敗時不動，下次開台仍接續同一場）
+    if yt_capture.get("offline"):
+        cycle_state["writer"].stream_offline(cid, 0)
+    if tw_capture.get("offline"):
+        cycle_state["writer"].stream_offline(cid, 1)
+
+    # 只有 YouTube 缺標題或網址、要重新載入頁面點擊時才需要 driver，需要時才取用
+    # 擷取失敗時 driver 可能已被關閉，交給 manager.ensure 檢查並換新
+    holder = {"driver": driver}
+    def get_driver():
+        holder["driver"] = manager.ensure(holder["driver"])
+        return holder["driver"]
+
+    try:
+        write_channel(log, record, get_driver, cycle_state)
+    except Exception:
+        # 呼叫端只會處理原本傳入的 driver，中途取得的先歸還
+        if holder["driver"] is not driver:
+            manager.release(holder["driver"])
+        raise
+    return holder["driver"]
+
+
+# 新增或延長直播紀錄、儲存觀看人數；get_driver() 在需要點擊取得影片網址時才取得 driver
+def write_channel(log, record, get_driver, cycle_state):
+    cid, name, yt_url, tw_url = record["channel"]
+    yt_count, ytstreaming, yt_capture = record["yt"]
+    tw_count, twstreaming, tw_capture = record["tw"]
+
+    if ytstreaming or twstreaming:
+        log(f"✅ {name} 直播狀態：YouTube: {str(yt_count)+"人" if ytstreaming else "沒有開台"}, Twitch: {str(tw_count)+"人" if twstreaming else "沒有開台"}")
+
+        with cycle_state["lock"]:
+            if ytstreaming:
+                cycle_state["create"] += 1
+            if twstreaming:
+                cycle_state["create"] += 1
+
+        if ytstreaming:
+            args ={
+                "get_driver": get_driver,
+                "cid": cid,
+                "yt_url": yt_url,
+                "screenshot_path" : f"pictures/yt_picture/{cid}_capture.png",
+                "cropped_path" : f"pictures/yt_crop/{cid}_crop.png",
+                "template_path" : "find/yt_find.png",
+                "ocr_pool": OCR_POOL if OCR_MODE == "pool" else None
+            } 
+            args.update(yt_capture)
+            yt_number = cycle_state["writer"].stream_number(cid, 0, args)
+        else:
+            yt_number = 0
+
+        if twstreaming:
+            args ={
+                "screenshot_path" : f"pictures/tw_picture/{cid}_capture.png",
+                "cropped_path" : f"pictures/tw_crop/{cid}_crop.png",
+                "ocr_pool": OCR_POOL if OCR_MODE == "pool" else None
+            }
+            args.update(tw_capture)
+            tw_number = cycle_state["writer"].stream_number(cid, 1, args)
+        else:
+            tw_number = 0
+
+        # 先放進週期的寫入緩衝，週期結束時一次寫入
+        cycle_state["writer"].save_viewer_count(cid, yt_count, tw_count, yt_number, tw_number)
+
+
+# 批次辨識結果寫回各頻道的紀錄，辨識失敗的平台當作沒開台
+def resolve_ocr(log, record):
+    name = record["channel"][1]
+    for platform in ("yt", "tw"):
+        count, streaming, capture = record[platform]
+        job = capture.pop("ocr", None)
+        if job is None:
+            continue
+        if job["count"] is not None and job["count"] >= 0:
+            record[platform][0] = job["count"]
+            log(f"🎉 [{name}] 正在觀看人數：{job['count']} 人（批次 OCR）")
+        else:
+            record[platform][0] = 0
+            record[platform][1] = False
+            stats.incr(f"{platform}.ocr.failed")
+            log(f"❌ [{name}] OCR 辨識失敗")
+
+
+# 辨識階段：所有頻道擷取完後一次處理等待中的裁切圖，再寫入資料庫
+def recognize_pending(log, cycle_state, batch_size=OCR_BATCH_SIZE):
+    pending = cycle_state["pending"]
+    if not pending:
+        return
+
+    jobs = [record[p][2]["ocr"] for record in pending for p in ("yt", "tw") if "ocr" in record[p][2]]
+    waiting = [job for job in jobs if job["count"] is None and job.get("future") is None]
+    reader = None
+    if OCR_MODE == "pool":
+        # pool 模式主進程不載入模型，還沒送出的裁切圖也交給 OCR 進程池
+        for job in waiting:
+            job["future"] = get_ocr_pool().submit(job["task"], job["crop"])
+    elif waiting:
+        # 模型只有在還有裁切圖要在這個進程辨識時才需要（等待背景載入完成）
+        reader = get_reader()
+    count, batches, elapsed = run_ocr_jobs(reader, jobs, batch_size, OCR_LOCK, OCR_POOL)
+    # 只快取這張裁切圖本身的辨識結果，逐張重試（fallback）的結果不存
+    # EasyOCR 讀的（不是快取或字形模板）拿來驗證、補充字形模板；fallback 的已在 ocr_count 裡處理
+    for job in jobs:
+        if not job.get("cached") and not job.get("fallback_used"):
+            ocr_cache.store(job["task"], job["crop"], job["count"])
+            if GLYPH_OCR and not job.get("glyph"):
+                observe(job["crop"], count_platform(job["task"]), job["count"])
+    if batches:
+        log(f"\n📦 批次 OCR：{count} 張裁切圖，{batches} 批，共 {elapsed:.2f} 秒"
+            f"（{count / max(elapsed, 1e-6):.1f} 張/秒）")
+    else:
+        log(f"\n📦 OCR 進程池：{count} 張裁切圖辨識完成")
+
+    manager = cycle_state["manager"]
+    driver = None
+    try:
+        for record in pending:
+            resolve_ocr(log, record)
+            if record["yt"][1] or record["tw"][1]:
+                # 只有新開台、還缺影片網址要重新載入頁面點擊時，finish_channel 才會取用 driver
+                try:
+                    driver = finish_channel(log, record, driver, cycle_state)
+                except Exception as e:
+                    log(f"❌ 寫入頻道 {record['channel'][1]} 時發生錯誤：{e}")
+                    driver = manager.replace(driver) if driver is not None else None
+    finally:
+        manager.release(driver)
+    pending.clear()
+
+
+# 啟動時在背景預先準備：模板、OCR 模型（pool 模式啟動 OCR 進程池，每個進程各自載入模型）
+# 回傳模型的 readiness future
+def warm_up():
+    preload_templates()
+    if OCR_MODE == "pool":
+        return get_ocr_pool().warm_up()
+    return start_warmup()
+
+
+# 累計無法取得 driver 的次數，連續過多時重啟 UI
+def record_failure(cycle_state):
+    with cycle_state["lock"]:
+        cycle_state["fail_count"] += 1
+        too_many = cycle_state["fail_count"] >= 5
+        if too_many:
+            cycle_state["fail_count"] = 0
+    if too_many:
+        restart_ui()
+
+
+def record_success(cycle_state):
+    with cycle_state["lock"]:
+        cycle_state["fail_count"] = 0
+
+
+# 取得 driver 管理器（跨週期保留，瀏覽器不必每次冷啟動）
+def get_driver_manager():
+    global DRIVER_MANAGER
+    if DRIVER_MANAGER is None:
+        DRIVER_MANAGER = DriverManager()
+    return DRIVER_MANAGER
+
+
+# worker：各自最多使用一個 driver，從共用佇列取頻道處理直到佇列清空
+def channel_worker(worker_id, log, channel_queue, cycle_state):
+    manager = cycle_state["manager"]
+
+    # 日誌加上 worker 編號，方便分辨交錯的輸出
+    def worker_log(msg):
+        body = msg.lstrip("\n")
+        log(msg[:len(msg) - len(body)] + f"[W{worker_id}] " + body)
+
+    # driver 等到需要時才取用（HTTP 後端沒命中、要截圖或點擊時），全部命中時不開瀏覽器
+    driver = None
+    try:
+        while True:
+            try:
+                channel = channel_queue.get_nowait()
+            except queue.Empty:
+                break
+
+            try:
+                driver = process_channel(worker_log, channel, driver, cycle_state)
+                record_success(cycle_state)
+            except Exception as e:
+                worker_log(f"❌ 處理頻道 {channel[1]} 時發生錯誤：{e}")
+                if driver is None:
+                    # 還沒取得 driver 就失敗（多半是瀏覽器建立失敗），下一個頻道需要時再試
+                    record_failure(cycle_state)
+                    continue
+                try:
+                    driver = manager.replace(driver)
+                except Exception as e2:
+                    worker_log(f"❌ 無法取得新的 driver：{e2}")
+                    driver = None
+                    record_failure(cycle_state)
+            finally:
+                channel_queue.task_done()
+    finally:
+        # 歸還給管理器，下個週期繼續使用
+        manager.release(driver)
+
+
+def main(log_callback=None,kind=0,workers=WORKER_COUNT):
     """
     主函數：整合所有步驟
+    workers：同時運作的 WebDriver 數量
     """
     
     #程式計時器
     start_time = time.time()
     
-    fail_count = 0
-    
     # 初始化資料庫
     init_db()
     
     working_id = insert_working(True,False,None,0,kind,0)  
+    stats.reset()
     
-    cleanup_headless_chrome()
-    
-    
-    # 設定 Selenium WebDriver
-    # options = Options()
-    # options.add_argument('--headless=new')     # 新版 headless 模式，支援 GPU
-    # options.add_argument('--use-gl=angle')     # 使用 ANGLE (DirectX)
-    # options.add_argument('--window-size=2560,1440')
-    # options.add_argument('--mute-audio')
-    # options.add_argument('--ignore-certificate-errors')
-    # options.add_argument('--ignore-ssl-errors')
-    
+    # 模板只在第一次載入並預先縮放，OCR 模型在背景載入，之後的週期直接使用
+    warm_up()
     
-
-    driver = create_driver()
-
+    # 第一次啟動管理器時會清理殘留 Chrome，之後的 driver 都由管理器建立
+    manager = get_driver_manager()
+    manager.start()
     
     # 日誌輸出函數
+    log_lock = threading.Lock()
     def log(msg):
-        if log_callback:
-            log_callback(msg + "\n")
-        else:
-            print(msg)
+        with log_lock:
+            if log_callback:
+                log_callback(msg + "\n")
+            else:
+                print(msg)
     
     
     log("🎯 開始執行直播觀看人數提取程序")
@@ -302,96 +755,65 @@ def main(log_callback=None,kind=0):
     
     # 讀取頻道清單
     channel_list = load_channels_from_db(DB_PATH)
-    
-    
-    create = 0
+
+    channel_queue = queue.Queue()
+    for channel in channel_list:
+        channel_queue.put(channel)
+
+    cycle_state = {
+        "lock": threading.Lock(),
+        "fail_count": 0,
+        "create": 0,
+        "manager": manager,
+        "pending": [],  # 等待批次 OCR 的頻道
+        "writer": CycleWriter(DB_PATH),  # 整個週期的資料庫寫入
+    }
+
     # 主程式開始
-    for cid, name, yt_url, tw_url in channel_list:
-        
-        
-        ytstreaming = False  # 是否正在 YouTube 開台
-        twstreaming = False  # 是否正在 Twitch 開台
-        yt_count = 0  # YouTube 觀看人數
-        tw_count = 0  # Twitch 觀看人數
-        
-        log(f"\n🔍 處理頻道：{name} (ID: {cid})")
-        
-        # 處理 YouTube 頻道
-        if yt_url:
-            yt_count ,ytstreaming,error,driver = yt_part(log, cid, name, yt_url, driver)
-        else:
-            log(f"❌ {name} 沒有提供 YouTube 連結，跳過")
-        
-        if not error:
-            fail_count += 1
-            if fail_count >=5:
-                fail_count = 0
-                restart_ui()
-        
-        # 處理 Twitch 頻道
-        
-        if tw_url:
-            tw_count ,twstreaming,error,driver = tw_part(log, cid, name, tw_url, driver)
-        else:
-            log(f"❌ {name} 沒有提供 Twitch 直播連結，跳過")
-        
-        if not error:
-            fail_count += 1
-            if fail_count >=5:
-                restart_ui()
-        
-        if ytstreaming or twstreaming:
-            log(f"✅ {name} 直播狀態：YouTube: {str(yt_count)+"人" if ytstreaming else "沒有開台"}, Twitch: {str(tw_count)+"人" if twstreaming else "沒有開台"}")
-            
-            if ytstreaming:
-                create = create + 1
-            
-            if twstreaming:
-                create = create + 1
-            
-            
-            if ytstreaming:
-                args ={
-                    "driver": driver,
-                    "cid": cid,
-                    "yt_url": yt_url,
-                    "screenshot_path" : f"pictures/yt_picture/{cid}_capture.png",
-                    "cropped_path" : f"pictures/yt_crop/{cid}_crop.png",
-                    "template_path" : "find/yt_find.png",
-                    "OCR_READER": OCR_READER
-                } 
-                yt_number = yt_number_get(cid, args, DB_PATH)
-            else:
-                
-                yt_number = 0
-            
-            if twstreaming:
-                args ={
-                    "screenshot_path" : f"pictures/tw_picture/{cid}_capture.png",
-                    "cropped_path" : f"pictures/tw_crop/{cid}_crop.png",
-                    "OCR_READER": OCR_READER
-                }
-                #tw_number = 0
-                tw_number = tw_number_get(cid, args, DB_PATH)
-            else:
-                tw_number = 0
-            
-            save_viewer_count(cid, yt_count, tw_count, yt_number, tw_number, DB_PATH)
-            
-        reset_socket_layer()
-        time.sleep(0.5)
+    workers = max(1, min(workers, len(channel_list)))
+    log(f"🧵 使用 {workers} 個 driver 同時處理 {len(channel_list)} 個頻道")
+
+    threads = []
+    for worker_id in range(workers):
+        t = threading.Thread(
+            target=channel_worker,
+            args=(worker_id + 1, log, channel_queue, cycle_state),
+            daemon=True
+        )
+        t.start()
+        threads.append(t)
 
+    for t in threads:
+        t.join()
+
+    # 辨識階段：擷取階段收集到的裁切圖一起辨識後寫入資料庫
+    recognize_pending(log, cycle_state)
     
     log("\n✅ 所有頻道處理完成")
     print("\n✅ 所有頻道處理完成")
     
-    driver.quit()  # 關閉 WebDriver
-    
     end_time = time.time()
     elapsed = end_time - start_time
     log(f"\n⏱️ 程式總共執行了 {elapsed:.2f} 秒")
-    
-    insert_working(False,True,elapsed,working_id,kind,create)  # 更新工作紀錄為完成
+
+    # 整個週期的紀錄與工作紀錄在同一個交易裡寫入
+    writer = cycle_state["writer"]
+    with stats.timer("db.write"):
+        writer.finish(working_id, elapsed, cycle_state["create"])
+    log(f"💾 資料庫寫入：main {writer.written['main']} 筆，stream 更新 {writer.written['stream_end']} 筆、"
+        f"新增 {writer.written['stream_new']} 筆、結束 {writer.written['stream_closed']} 場，"
+        f"{writer.written['commits']} 次 commit")
+
+    # OCR 快取命中率，有設定存檔時寫回
+    hits, near_hits, misses = ocr_cache.cache_summary()
+    log(f"\n🗃️ OCR 快取：命中 {hits}，相近命中 {near_hits}，未命中 {misses}")
+    ocr_cache.save_cache()
+
+    # 各擷取路徑的命中次數與耗時
+    log("\n📊 擷取統計：")
+    for line in stats.summary_lines():
+        log(f"  {line}")
+
     
 
 if __name__ == "__main__":
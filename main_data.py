@@ -1,13 +1,17 @@
-import sqlite3
 import pandas as pd
 import streamlit as st
 from st_aggrid import AgGrid, GridOptionsBuilder
 from datetime import datetime
 
+from db import get_connection
+
 from main_data_fun import (
     plot_time_distribution,
     plot_time_count_distribution,
-    plot_time_count_all_channels
+    plot_time_count_all_channels,
+    main_datetimes,
+    stream_summary,
+    slot_rollup
 )
 
 #streamlit run main_data.py
@@ -15,16 +19,13 @@ from main_data_fun import (
 # 資料庫路徑
 db_path = "data.db"
 
-# 讀取資料
-with sqlite3.connect(db_path) as conn:
-    df = pd.read_sql_query("SELECT * FROM main", conn)
+# 讀取資料（WAL 模式下抓取程式寫入時也能讀）
+# 直播統計與時段分布圖改讀 stream_stats / slot_rollup，整個 main 只有總觀看統計需要時才讀（load_main）
+with get_connection(db_path) as conn:
     df_streamer = pd.read_sql_query("SELECT * FROM streamer", conn)
     df_stream = pd.read_sql_query("SELECT * FROM stream", conn)
     df_same_stream = pd.read_sql_query("SELECT * FROM same_stream", conn)
 
-# 合併日期與時間
-df['datetime'] = pd.to_datetime(df['date'] + ' ' + df['time'])
-
 # 建立 from_id -> to_id 映射字典
 same_stream_map = dict(zip(df_same_stream['from_id'], df_same_stream['to_id']))
 
@@ -32,11 +33,20 @@ same_stream_map = dict(zip(df_same_stream['from_id'], df_same_stream['to_id']))
 def map_stream_id(stream_id):
     return same_stream_map.get(stream_id, stream_id)
 
-# 轉換 df_yt_summary 直播ID
-df['yt_number'] = df['yt_number'].apply(map_stream_id)
 
-# Twitch 同理
-df['tw_number'] = df['tw_number'].apply(map_stream_id)
+# 讀取整個 main 表，加上時間並轉換合併後的直播ID
+def load_main(conn):
+    df = pd.read_sql_query("SELECT * FROM main", conn)
+
+    # 時間（epoch 轉成本地時間）
+    df['datetime'] = main_datetimes(df)
+
+    # 轉換 df_yt_summary 直播ID
+    df['yt_number'] = df['yt_number'].apply(map_stream_id)
+
+    # Twitch 同理
+    df['tw_number'] = df['tw_number'].apply(map_stream_id)
+    return df
 
 
 # 🔽 檢視模式選單
@@ -77,12 +87,11 @@ if view_mode == "單一頻道":
     # 取得對應的 channel_id
     selected_channel = name_to_id[selected_name]
 
-    # 用 channel_id 篩選 main 表資料
-    df_selected = df[df['channel'] == selected_channel].copy()
-
-    # 平均觀看數（排除 <10）
-    yt_avg = df_selected[df_selected['youtube'] >= 10]['youtube'].mean()
-    tw_avg = df_selected[df_selected['twitch'] >= 10]['twitch'].mean()
+    # 平均觀看數（排除 <10）：各時段的合計加總起來就是這個頻道全部的紀錄
+    conn = get_connection(db_path)
+    df_slots = slot_rollup(conn, selected_channel).groupby('platform')[['view_sum', 'view_count']].sum()
+    yt_avg = df_slots.loc['youtube', 'view_sum'] / df_slots.loc['youtube', 'view_count'] if 'youtube' in df_slots.index else float('nan')
+    tw_avg = df_slots.loc['twitch', 'view_sum'] / df_slots.loc['twitch', 'view_count'] if 'twitch' in df_slots.index else float('nan')
 
     yt_avg_display = f"{yt_avg:.1f}" if not pd.isna(yt_avg) else "無資料"
     tw_avg_display = f"{tw_avg:.1f}" if not pd.isna(tw_avg) else "無資料"
@@ -91,31 +100,9 @@ if view_mode == "單一頻道":
     col1.metric("📺 YouTube 平均觀看數", yt_avg_display)
     col2.metric("🎮 Twitch 平均觀看數", tw_avg_display)
 
-    # YouTube 統計
-    df_youtube = df_selected[df_selected['yt_number'] != 0]
-    df_yt_summary = df_youtube.groupby('yt_number').agg(
-        yt_avg=('youtube', lambda x: x[x >= 10].mean()),
-        yt_max=('youtube', lambda x: x[x >= 10].max()),
-        yt_min=('youtube', lambda x: x[x >= 10].min()),
-        count=('datetime', 'count'),
-        start_time=('datetime', 'min'),
-        end_time=('datetime', 'max')
-    ).reset_index()
-    df_yt_summary.columns = ['直播ID', '平均觀看數', '最大觀看數', '最小觀看數', '資料筆數', '開始時間', '結束時間']
-
-    
-    
-    # Twitch 統計
-    df_twitch = df_selected[df_selected['tw_number'] != 0]
-    df_tw_summary = df_twitch.groupby('tw_number').agg(
-        tw_avg=('twitch', lambda x: x[x >= 10].mean()),
-        tw_max=('twitch', lambda x: x[x >= 10].max()),
-        tw_min=('twitch', lambda x: x[x >= 10].min()),
-        count=('datetime', 'count'),
-        start_time=('datetime', 'min'),
-        end_time=('datetime', 'max')
-    ).reset_index()
-    df_tw_summary.columns = ['直播ID', '平均觀看數', '最大觀看數', '最小觀看數', '資料筆數', '開始時間', '結束時間']
+    # YouTube / Twitch 統計（抓取程式寫入時已累加在 stream_stats）
+    df_yt_summary = stream_summary(conn, "youtube", selected_channel)
+    df_tw_summary = stream_summary(conn, "twitch", selected_channel)
 
     # 加上時間字串欄位
     for df_summary in [df_yt_summary, df_tw_summary]:
@@ -217,7 +204,7 @@ if view_mode == "單一頻道":
             if st.form_submit_button("新增"):
                 now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")  # 取得現在時間字串
                 try:
-                    with sqlite3.connect(db_path) as conn:
+                    with get_connection(db_path) as conn:
                         conn.execute(
                             "INSERT INTO same_stream (from_id, to_id, time) VALUES (?, ?, ?)",
                             (from_id, to_id, now)
@@ -277,9 +264,9 @@ if view_mode == "單一頻道":
     )
     
     # 畫出時間分布圖
-    plot_time_distribution(df, selected_channel)
+    plot_time_distribution(conn, selected_channel)
     
-    plot_time_count_distribution(df, selected_channel)
+    plot_time_count_distribution(conn, selected_channel)
     
 # ---------- 總統計模式 ----------
 elif view_mode == "總觀看統計":
@@ -290,6 +277,7 @@ elif view_mode == "總觀看統計":
     valid_channels = df_streamer['channel_id'].tolist()
 
     # 過濾 main 表只保留出現在 streamer 的頻道
+    df = load_main(get_connection(db_path))
     df_filtered = df[df['channel'].isin(valid_channels)].copy()
 
     # YouTube 直播場數計算（非0的 yt_number 計數）
@@ -369,35 +357,14 @@ elif view_mode == "總觀看統計":
 elif view_mode == "全部頻道影片":
     st.subheader("🎥 所有頻道影片一覽")
 
-    # 濾除無意義資料（直播編號 = 0）
-    df_youtube = df[df['yt_number'] != 0].copy()
-    df_twitch = df[df['tw_number'] != 0].copy()
-
-    # YouTube 統計
-    df_yt_summary = df_youtube.groupby('yt_number').agg(
-        yt_avg=('youtube', lambda x: x[x >= 10].mean()),
-        yt_max=('youtube', lambda x: x[x >= 10].max()),
-        yt_min=('youtube', lambda x: x[x >= 10].min()),
-        count=('datetime', 'count'),
-        start_time=('datetime', 'min'),
-        end_time=('datetime', 'max'),
-        channel=('channel', 'first')
-    ).reset_index()
-    df_yt_summary.columns = ['直播ID', '平均觀看數', '最大觀看數', '最小觀看數', '資料筆數', '開始時間', '結束時間', 'channel_id']
+    # YouTube 統計（直播編號 = 0 的紀錄不會進 stream_stats）
+    conn = get_connection(db_path)
+    df_yt_summary = stream_summary(conn, "youtube")
     df_yt_summary = pd.merge(df_yt_summary, df_stream[['id', 'name']], how='left', left_on='直播ID', right_on='id')
     df_yt_summary = pd.merge(df_yt_summary, df_streamer[['channel_id', 'channel_name']], how='left', on='channel_id')
 
     # Twitch 統計
-    df_tw_summary = df_twitch.groupby('tw_number').agg(
-        tw_avg=('twitch', lambda x: x[x >= 10].mean()),
-        tw_max=('twitch', lambda x: x[x >= 10].max()),
-        tw_min=('twitch', lambda x: x[x >= 10].min()),
-        count=('datetime', 'count'),
-        start_time=('datetime', 'min'),
-        end_time=('datetime', 'max'),
-        channel=('channel', 'first')
-    ).reset_index()
-    df_tw_summary.columns = ['直播ID', '平均觀看數', '最大觀看數', '最小觀看數', '資料筆數', '開始時間', '結束時間', 'channel_id']
+    df_tw_summary = stream_summary(conn, "twitch")
     df_tw_summary = pd.merge(df_tw_summary, df_stream[['id', 'name']], how='left', left_on='直播ID', right_on='id')
     df_tw_summary = pd.merge(df_tw_summary, df_streamer[['channel_id', 'channel_name']], how='left', on='channel_id')
 
@@ -496,4 +463,4 @@ elif view_mode == "全部頻道影片":
             gb2.configure_column(col, width=width, filter=False)
     AgGrid(df_tw_display, gridOptions=gb2.build(), theme='balham', height=400, width=900, key='tw_all_video')
     
-    plot_time_count_all_channels(df)
+    plot_time_count_all_channels(conn)
@@ -1,70 +1,110 @@
 import pandas as pd
 import plotly.express as px
 import streamlit as st
-
-def plot_time_distribution(df_main, selected_channel):
-
-    df_selected = df_main[df_main['channel'] == selected_channel].copy()
-
-    # 建立 datetime
-    df_selected['datetime'] = pd.to_datetime(df_selected['date'] + " " + df_selected['time'])
-
-    # 把時間四捨五入到15分鐘
-    def round_to_15min(dt):
-        discard = pd.Timedelta(minutes=dt.minute % 15,
-                                seconds=dt.second,
-                                microseconds=dt.microsecond)
-        dt = dt - discard
-        if discard >= pd.Timedelta(minutes=7.5):
-            dt += pd.Timedelta(minutes=15)
-        return dt
-
-    df_selected['time_15min_dt'] = df_selected['datetime'].apply(round_to_15min)
-
-    # 取出一天中的時間（忽略日期），轉成 pd.Timedelta（方便排序和跨天處理）
-    df_selected['time_only'] = df_selected['time_15min_dt'].dt.time.apply(
-        lambda t: pd.Timedelta(hours=t.hour, minutes=t.minute)
-    )
-
-    # 為了讓時間軸從12:00開始，跨到隔天12:00，
-    # 把早於12:00的時間加一天(24小時)
-    def adjust_time(timedelta_obj):
-        noon = pd.Timedelta(hours=12)
-        if timedelta_obj < noon:
-            return timedelta_obj + pd.Timedelta(days=1)
-        else:
-            return timedelta_obj
-
-    df_selected['time_for_sort'] = df_selected['time_only'].apply(adjust_time)
-
-    # YouTube 平均（過濾 >= 10）
-    df_youtube_group = (
-        df_selected[df_selected['youtube'] >= 10]
-        .groupby('time_for_sort')['youtube']
-        .mean()
+from datetime import datetime
+
+# 本地時區（台灣沒有日光節約時間，用目前的時差即可）
+LOCAL_TZ = datetime.now().astimezone().tzinfo
+
+
+def epoch_to_local(series):
+    """epoch 秒轉成本地時間（不帶時區）"""
+    return pd.to_datetime(series, unit='s', utc=True).dt.tz_convert(LOCAL_TZ).dt.tz_localize(None)
+
+
+def main_datetimes(df):
+    """
+    main 的 ts（epoch 秒）轉成本地時間
+    還沒回填 ts 的舊資料才用 date + time 字串組出來
+    """
+    dt = epoch_to_local(df['ts'])
+    missing = df['ts'].isna() | (df['ts'] <= 0)
+    if missing.any():
+        dt[missing] = pd.to_datetime(df.loc[missing, 'date'] + ' ' + df.loc[missing, 'time'])
+    return dt
+
+
+# 直播統計表的欄位（與原本 groupby 的結果相同）
+SUMMARY_COLUMNS = ['直播ID', '平均觀看數', '最大觀看數', '最小觀看數', '資料筆數', '開始時間', '結束時間', 'channel_id']
+
+
+def stream_summary(conn, platform, channel=None):
+    """
+    從 stream_stats 讀出每場直播的統計（platform："youtube" / "twitch"，channel 為 None 時全部頻道）
+    same_stream 的 from_id 併入 to_id 後再合計
+    平均 / 最大 / 最小只算人數 >= 10 的紀錄，沒有時為 NaN
+    """
+    query = '''
+        SELECT COALESCE((SELECT to_id FROM same_stream WHERE from_id = s.stream_id ORDER BY rowid DESC LIMIT 1),
+                        s.stream_id) AS merged_id,
+               SUM(view_sum), SUM(view_count), MAX(view_max), MIN(view_min), SUM(samples),
+               MIN(first_ts), MAX(last_ts), MIN(channel)
+        FROM stream_stats AS s
+        WHERE platform = ?
+    '''
+    params = [platform]
+    if channel is not None:
+        query += " AND channel = ?"
+        params.append(channel)
+    query += " GROUP BY merged_id ORDER BY merged_id"
+
+    rows = conn.execute(query, params).fetchall()
+    df = pd.DataFrame(rows, columns=['直播ID', 'view_sum', 'view_count', '最大觀看數', '最小觀看數', '資料筆數',
+                                     'first_ts', 'last_ts', 'channel_id'])
+    df.insert(1, '平均觀看數', df['view_sum'] / df['view_count'].where(df['view_count'] > 0))
+    df['開始時間'] = epoch_to_local(df['first_ts'])
+    df['結束時間'] = epoch_to_local(df['last_ts'])
+    df[['最大觀看數', '最小觀看數']] = df[['最大觀看數', '最小觀看數']].astype(float)
+    return df[SUMMARY_COLUMNS]
+
+
+# 時段分布圖的時段（與 sql.SLOT_SECONDS 相同：15 分鐘，一天 96 個），圖從 12:00 排到隔天 12:00
+SLOT_MINUTES = 15
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+
+
+def slot_rollup(conn, channel=None):
+    """
+    從 slot_rollup 讀出每個時段、平台的人數合計與筆數（channel 為 None 時合計全部頻道）
+    只含人數 >= 10 的紀錄；回傳 slot, platform, view_sum, view_count
+    """
+    query = "SELECT slot, platform, SUM(view_sum), SUM(view_count) FROM slot_rollup"
+    params = []
+    if channel is not None:
+        query += " WHERE channel = ?"
+        params.append(channel)
+    query += " GROUP BY slot, platform"
+    return pd.DataFrame(conn.execute(query, params).fetchall(),
+                        columns=['slot', 'platform', 'view_sum', 'view_count'])
+
+
+def slot_table(conn, channel=None, value="avg"):
+    """
+    時段分布圖的資料：每個有資料的時段一列（time_for_sort、youtube、twitch、time_15min_str）
+    value："avg" 平均人數，"count" 筆數；只有一個平台有資料的時段，另一個平台補 0
+    """
+    df = slot_rollup(conn, channel)
+    df['value'] = df['view_sum'] / df['view_count'] if value == "avg" else df['view_count']
+    df_group = (
+        df.pivot(index='slot', columns='platform', values='value')
+        .reindex(columns=['youtube', 'twitch'])
+        .fillna(0)
         .reset_index()
     )
-
-    # Twitch 平均（過濾 >= 10）
-    df_twitch_group = (
-        df_selected[df_selected['twitch'] >= 10]
-        .groupby('time_for_sort')['twitch']
-        .mean()
-        .reset_index()
+    # 早於 12:00 的時段排到後面（隔天）
+    df_group['time_for_sort'] = (df_group['slot'] - SLOTS_PER_DAY // 2) % SLOTS_PER_DAY
+    df_group = df_group.sort_values('time_for_sort').reset_index(drop=True)
+    minutes = df_group['slot'] * SLOT_MINUTES
+    df_group['time_15min_str'] = (
+        (minutes // 60).map("{:02d}".format) + ":" + (minutes % 60).map("{:02d}".format)
     )
+    return df_group.drop(columns='slot')
 
-    # 合併兩平台
-    df_group = pd.merge(df_youtube_group, df_twitch_group, on='time_for_sort', how='outer').fillna(0)
-    df_group = df_group.sort_values('time_for_sort')
 
-    # 轉成可顯示的時間字串（格式 HH:MM）
-    def timedelta_to_str(td):
-        total_minutes = int(td.total_seconds() // 60)
-        hours = (total_minutes // 60) % 24
-        minutes = total_minutes % 60
-        return f"{hours:02d}:{minutes:02d}"
+def plot_time_distribution(conn, selected_channel):
 
-    df_group['time_15min_str'] = df_group['time_for_sort'].apply(timedelta_to_str)
+    # 平均觀眾數（過濾 >= 10，由 slot_rollup 預先合計）
+    df_group = slot_table(conn, selected_channel, "avg")
 
     # 轉長格式畫圖
     df_melt = df_group.melt(id_vars='time_15min_str', value_vars=['youtube', 'twitch'],
@@ -87,72 +127,13 @@ def plot_time_distribution(df_main, selected_channel):
     st.plotly_chart(fig, use_container_width=True)
 
 
-def plot_time_count_distribution(df_main, selected_channel):
-    import pandas as pd
+def plot_time_count_distribution(conn, selected_channel):
     import plotly.express as px
     import streamlit as st
 
-    df_selected = df_main[df_main['channel'] == selected_channel].copy()
-
-    # 建立 datetime
-    df_selected['datetime'] = pd.to_datetime(df_selected['date'] + " " + df_selected['time'])
-
-    # 四捨五入到15分鐘
-    def round_to_15min(dt):
-        discard = pd.Timedelta(minutes=dt.minute % 15,
-                                seconds=dt.second,
-                                microseconds=dt.microsecond)
-        dt = dt - discard
-        if discard >= pd.Timedelta(minutes=7.5):
-            dt += pd.Timedelta(minutes=15)
-        return dt
-
-    df_selected['time_15min_dt'] = df_selected['datetime'].apply(round_to_15min)
-
-    # 取出一天中的時間（忽略日期）
-    df_selected['time_only'] = df_selected['time_15min_dt'].dt.time.apply(
-        lambda t: pd.Timedelta(hours=t.hour, minutes=t.minute)
-    )
-
-    # 調整時間排序起點12:00
-    def adjust_time(timedelta_obj):
-        noon = pd.Timedelta(hours=12)
-        if timedelta_obj < noon:
-            return timedelta_obj + pd.Timedelta(days=1)
-        else:
-            return timedelta_obj
-
-    df_selected['time_for_sort'] = df_selected['time_only'].apply(adjust_time)
-
-    # YouTube 計次（過濾 youtube >= 10）
-    df_youtube_count = (
-        df_selected.loc[df_selected['youtube'] >= 10]
-        .groupby('time_for_sort')
-        .size()
-        .reset_index(name='youtube_count')
-    )
-
-    # Twitch 計次（過濾 twitch >= 10）
-    df_twitch_count = (
-        df_selected.loc[df_selected['twitch'] >= 10]
-        .groupby('time_for_sort')
-        .size()
-        .reset_index(name='twitch_count')
-    )
-
-    # 合併
-    df_group = pd.merge(df_youtube_count, df_twitch_count, on='time_for_sort', how='outer').fillna(0)
-
-    df_group = df_group.sort_values('time_for_sort')
-
-    # 時間字串
-    def timedelta_to_str(td):
-        total_minutes = int(td.total_seconds() // 60)
-        hours = (total_minutes // 60) % 24
-        minutes = total_minutes % 60
-        return f"{hours:02d}:{minutes:02d}"
-
-    df_group['time_15min_str'] = df_group['time_for_sort'].apply(timedelta_to_str)
+    # 每個時段的計次（過濾 >= 10，由 slot_rollup 預先合計）
+    df_group = slot_table(conn, selected_channel, "count").rename(
+        columns={'youtube': 'youtube_count', 'twitch': 'twitch_count'})
 
     # 轉長格式畫圖
     df_melt = df_group.melt(
@@ -182,69 +163,11 @@ def plot_time_count_distribution(df_main, selected_channel):
     st.plotly_chart(fig, use_container_width=True)
     
 
-def plot_time_count_all_channels(df_main):
-
-    df_selected = df_main.copy()
-
-    # 建立 datetime
-    df_selected['datetime'] = pd.to_datetime(df_selected['date'] + " " + df_selected['time'])
-
-    # 四捨五入到15分鐘
-    def round_to_15min(dt):
-        discard = pd.Timedelta(minutes=dt.minute % 15,
-                                seconds=dt.second,
-                                microseconds=dt.microsecond)
-        dt = dt - discard
-        if discard >= pd.Timedelta(minutes=7.5):
-            dt += pd.Timedelta(minutes=15)
-        return dt
-
-    df_selected['time_15min_dt'] = df_selected['datetime'].apply(round_to_15min)
-
-    # 取出一天中的時間（忽略日期）
-    df_selected['time_only'] = df_selected['time_15min_dt'].dt.time.apply(
-        lambda t: pd.Timedelta(hours=t.hour, minutes=t.minute)
-    )
-
-    # 調整時間排序起點12:00
-    def adjust_time(timedelta_obj):
-        noon = pd.Timedelta(hours=12)
-        if timedelta_obj < noon:
-            return timedelta_obj + pd.Timedelta(days=1)
-        else:
-            return timedelta_obj
-
-    df_selected['time_for_sort'] = df_selected['time_only'].apply(adjust_time)
-
-    # YouTube 計次（過濾 youtube >= 10）
-    df_youtube_count = (
-        df_selected.loc[df_selected['youtube'] >= 10]
-        .groupby('time_for_sort')
-        .size()
-        .reset_index(name='youtube_count')
-    )
-
-    # Twitch 計次（過濾 twitch >= 10）
-    df_twitch_count = (
-        df_selected.loc[df_selected['twitch'] >= 10]
-        .groupby('time_for_sort')
-        .size()
-        .reset_index(name='twitch_count')
-    )
-
-    # 合併
-    df_group = pd.merge(df_youtube_count, df_twitch_count, on='time_for_sort', how='outer').fillna(0)
-
-    df_group = df_group.sort_values('time_for_sort')
-
-    # 時間字串
-    def timedelta_to_str(td):
-        total_minutes = int(td.total_seconds() // 60)
-        hours = (total_minutes // 60) % 24
-        minutes = total_minutes % 60
-        return f"{hours:02d}:{minutes:02d}"
+def plot_time_count_all_channels(conn):
 
-    df_group['time_15min_str'] = df_group['time_for_sort'].apply(timedelta_to_str)
+    # 全部頻道每個時段的計次（過濾 >= 10，由 slot_rollup 預先合計）
+    df_group = slot_table(conn, None, "count").rename(
+        columns={'youtube': 'youtube_count', 'twitch': 'twitch_count'})
 
     # 轉長格式畫圖
     df_melt = df_group.melt(
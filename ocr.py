@@ -0,0 +1,185 @@
+import contextlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+import stats
+
+# ---------- 模型延遲載入 ----------
+
+# EasyOCR（連同 torch）載入要好幾秒，改成第一次需要時才載入，
+# 或由 start_warmup() 提早在背景載入
+_warmup_lock = threading.Lock()
+_reader_future = None
+
+
+def _load_reader():
+    import easyocr
+
+    start = time.perf_counter()
+    reader = easyocr.Reader(['ch_tra', 'en'], gpu=False)
+    print(f"✅ OCR 模型載入完成（{time.perf_counter() - start:.1f} 秒）")
+    return reader
+
+
+def start_warmup():
+    """在背景執行緒開始載入 OCR 模型，回傳 readiness future（重複呼叫回傳同一個）"""
+    global _reader_future
+    with _warmup_lock:
+        # 上次載入失敗時重新載入
+        if _reader_future is None or (_reader_future.done() and _reader_future.exception()):
+            executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ocr-warmup")
+            _reader_future = executor.submit(_load_reader)
+            executor.shutdown(wait=False)
+        return _reader_future
+
+
+def get_reader(timeout=None):
+    """取得 EasyOCR reader，模型還在載入時會等待載入完成"""
+    return start_warmup().result(timeout)
+
+
+# 裁切圖已經只剩一行文字，直接送進辨識器，略過 EasyOCR 的 CRAFT 文字偵測
+RECOGNIZER_ONLY = True
+
+
+def _as_array(crop):
+    if isinstance(crop, np.ndarray):
+        return crop
+    if isinstance(crop, str):
+        return cv2.imread(crop)
+    return None
+
+
+def recognize_crop(reader, crop, allowlist=None):
+    """把整張裁切圖當成一個預先定好的文字框，只跑辨識器"""
+    h, w = crop.shape[:2]
+    return reader.recognize(
+        crop,
+        horizontal_list=[[0, w, 0, h]],
+        free_list=[],
+        allowlist=allowlist,
+        detail=0,
+    )
+
+
+def read_crop(reader, crop, allowlist=None, accept=None):
+    """
+    辨識裁切圖的文字，回傳與 readtext(detail=0) 相同的字串列表
+    優先走只有辨識器的快速路徑（限定 allowlist 字元），
+    accept(text) 判斷結果不可用時，改回完整的 readtext（偵測 + 辨識）
+    """
+    image = _as_array(crop)
+    if RECOGNIZER_ONLY and image is not None and image.size:
+        result = recognize_crop(reader, image, allowlist)
+        if accept is None or accept(" ".join(result)):
+            stats.incr("ocr.fast.hit")
+            return result
+        stats.incr("ocr.fast.miss")
+    return reader.readtext(crop, detail=0)
+
+
+# ---------- 整個週期的批次辨識 ----------
+
+# 每次送進辨識器的裁切圖數量
+OCR_BATCH_SIZE = 8
+
+
+def ocr_job(crop, allowlist, parse, fallback=None):
+    """
+    一張等待批次辨識的裁切圖
+    parse(result) 把辨識結果轉成人數（失敗回傳 -1）
+    fallback(count) 批次結果不可用時逐張重試（count 為原本的結果），回傳人數或負數
+    """
+    return {"crop": crop, "allowlist": allowlist, "parse": parse, "fallback": fallback, "count": None}
+
+
+def recognize_batch(reader, crops, allowlist=None, batch_size=OCR_BATCH_SIZE):
+    """
+    多張裁切圖一起送進辨識器（recognizer 層級的批次），回傳每張的字串列表
+    EasyOCR 的 recognize 在 CPU 上會一個框一個框處理，這裡直接呼叫 get_text 才能真的批次
+    """
+    try:
+        from easyocr.config import imgH
+        from easyocr.recognition import get_text
+        from easyocr.utils import get_image_list, reformat_input
+    except ImportError:
+        return [recognize_crop(reader, crop, allowlist) for crop in crops]
+
+    image_list = []
+    max_width = 0
+    for index, crop in enumerate(crops):
+        _, gray = reformat_input(crop)
+        h, w = gray.shape[:2]
+        items, width = get_image_list([[0, w, 0, h]], [], gray, model_height=imgH)
+        # 文字框座標換成裁切圖編號，辨識完依編號放回
+        image_list += [(index, img) for _, img in items]
+        max_width = max(max_width, width)
+
+    if allowlist:
+        ignore_char = ''.join(set(reader.character) - set(allowlist))
+    else:
+        ignore_char = ''.join(set(reader.character) - set(reader.lang_char))
+
+    results = [[] for _ in crops]
+    if not image_list:
+        return results
+    for index, text, _ in get_text(reader.character, imgH, int(max_width), reader.recognizer,
+                                   reader.converter, image_list, ignore_char, 'greedy', 5,
+                                   batch_size, 0.1, 0.5, 0.003, 0, reader.device):
+        results[index].append(text)
+    return results
+
+
+def _parse(job, result):
+    try:
+        count = job["parse"](result)
+        return int(count) if isinstance(count, str) else count
+    except Exception as e:
+        print(f"❌ OCR 結果解析錯誤：{e}")
+        return -2
+
+
+def run_ocr_jobs(reader, jobs, batch_size=OCR_BATCH_SIZE, lock=None, pool=None):
+    """
+    依 allowlist 分組，每 batch_size 張一批辨識，結果寫回 job["count"]
+    已經有結果的略過，已經送進 OCR 進程池的（有 future）只等待結果
+    批次結果解析失敗的才呼叫 fallback 逐張處理，並標記 job["fallback_used"]
+    （fallback 的結果可能來自別的裁切位置，不對應原本的裁切圖，呼叫端不要拿去快取）
+    回傳 (張數, 批數, 辨識耗時秒數)
+    """
+    groups = {}
+    for job in jobs:
+        if job["count"] is not None:
+            continue   # 已經有結果（例如字形比對）
+        if job.get("future") is not None and pool is not None:
+            job["count"] = pool.result(job["future"])
+        else:
+            groups.setdefault(job["allowlist"], []).append(job)
+
+    batches = 0
+    elapsed = 0.0
+    for allowlist, group in groups.items():
+        for start in range(0, len(group), batch_size):
+            chunk = group[start:start + batch_size]
+            with stats.timer("ocr.batch.time") as t, (lock or contextlib.nullcontext()):
+                results = recognize_batch(reader, [job["crop"] for job in chunk], allowlist, batch_size)
+            batches += 1
+            elapsed += t.elapsed
+            stats.incr("ocr.batch.crops", len(chunk))
+            print(f"📦 OCR 批次 {len(chunk)} 張，{t.elapsed * 1000:.0f} ms（{len(chunk) / max(t.elapsed, 1e-6):.1f} 張/秒）")
+
+            for job, result in zip(chunk, results):
+                job["count"] = _parse(job, result)
+
+    # 批次辨識失敗的逐張重試（完整偵測 + 辨識）
+    for job in jobs:
+        if job["count"] < 0 and job["fallback"]:
+            stats.incr("ocr.batch.fallback")
+            job["count"] = job["fallback"](job["count"])
+            job["fallback_used"] = True
+
+    return len(jobs), batches, elapsed
@@ -0,0 +1,235 @@
+import functools
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+import stats
+from ocr import _as_array
+
+# 同一張裁切圖（人數沒變的直播、重複出現的標題）不必重跑 OCR
+# 快取容量（筆數），超過時淘汰最久沒用到的
+OCR_CACHE_SIZE = 1024
+# 各種辨識的比對方式："exact" 像素完全相同；"near" 感知雜湊相近也算；"off" 不快取
+# 人數差一個字只有少數像素不同，只用 exact；標題改一兩個字的雜湊也很接近，near 會拿到舊標題，同樣只用 exact
+OCR_CACHE_MODE = {
+    "yt_count": "exact",
+    "tw_count": "exact",
+    "yt_title": "exact",
+    "tw_title": "exact",
+}
+# 感知雜湊（dHash）的取樣大小 (寬, 高)，雜湊長度為 寬 * 高 位元
+HASH_SIZE = (64, 16)
+# near 模式允許的雜湊差異位元數
+OCR_CACHE_NEAR_BITS = 16
+# 設定檔名就會在啟動時載入、每個週期結束時寫回，None 表示只保留在記憶體
+OCR_CACHE_FILE = None
+
+
+def _gray(crop):
+    return crop if crop.ndim == 2 else cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+
+
+def exact_key(crop):
+    """像素內容（含大小）的雜湊"""
+    crop = np.ascontiguousarray(crop)
+    digest = hashlib.blake2b(crop.tobytes(), digest_size=16)
+    digest.update(str(crop.shape).encode())
+    return digest.hexdigest()
+
+
+def perceptual_hash(crop):
+    """dHash：縮小後比較左右相鄰像素的亮度，回傳整數"""
+    w, h = HASH_SIZE
+    small = cv2.resize(_gray(crop), (w + 1, h), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def _valid(value):
+    """只快取成功的結果（失敗為 -1 / -2）"""
+    if isinstance(value, str):
+        return bool(value)
+    return isinstance(value, int) and value >= 0
+
+
+class OcrCache:
+    """
+    以裁切圖內容為鍵的 LRU 快取
+    exact 用像素雜湊直接查表；near 在同種類、同大小的項目裡找感知雜湊最接近的
+    """
+
+    def __init__(self, size=OCR_CACHE_SIZE, modes=None, near_bits=OCR_CACHE_NEAR_BITS):
+        self.size = size
+        self.modes = dict(OCR_CACHE_MODE if modes is None else modes)
+        self.near_bits = near_bits
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # (種類, exact_key) -> (phash, shape, value)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _keys(self, kind, crop):
+        image = _as_array(crop)
+        if image is None or not image.size:
+            return None
+        phash = perceptual_hash(image) if self.modes.get(kind) == "near" else None
+        return (kind, exact_key(image)), phash, image.shape[:2]
+
+    def lookup(self, kind, crop):
+        """回傳快取的結果，沒有時回傳 None"""
+        mode = self.modes.get(kind, "off")
+        if mode == "off":
+            return None
+        keys = self._keys(kind, crop)
+        if keys is None:
+            return None
+        key, phash, shape = keys
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                stats.incr(f"ocr.cache.{kind}.hit")
+                return entry[2]
+
+            if mode == "near":
+                best, best_bits = None, self.near_bits + 1
+                for other, (other_hash, other_shape, _) in self._entries.items():
+                    if other[0] != kind or other_shape != shape or other_hash is None:
+                        continue
+                    bits = (phash ^ other_hash).bit_count()
+                    if bits < best_bits:
+                        best, best_bits = other, bits
+                if best is not None:
+                    self._entries.move_to_end(best)
+                    stats.incr(f"ocr.cache.{kind}.near_hit")
+                    return self._entries[best][2]
+
+        stats.incr(f"ocr.cache.{kind}.miss")
+        return None
+
+    def store(self, kind, crop, value):
+        if self.modes.get(kind, "off") == "off" or not _valid(value):
+            return
+        keys = self._keys(kind, crop)
+        if keys is None:
+            return
+        key, phash, shape = keys
+        with self._lock:
+            self._entries[key] = (phash, tuple(shape), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    # ---------- 存檔 ----------
+
+    def save(self, path):
+        with self._lock:
+            entries = [
+                {"kind": kind, "key": key, "phash": None if phash is None else f"{phash:x}",
+                 "shape": list(shape), "value": value}
+                for (kind, key), (phash, shape, value) in self._entries.items()
+            ]
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "entries": entries}, f, ensure_ascii=False)
+        os.replace(tmp, path)
+        return len(entries)
+
+    def load(self, path):
+        """讀回存檔（舊的在前，維持 LRU 順序），檔案不存在或格式不對時回傳 0"""
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            entries = data["entries"]
+        except (OSError, ValueError, KeyError, TypeError):
+            return 0
+        loaded = 0
+        with self._lock:
+            for item in entries:
+                try:
+                    phash = None if item["phash"] is None else int(item["phash"], 16)
+                    key = (item["kind"], item["key"])
+                    self._entries[key] = (phash, tuple(item["shape"]), item["value"])
+                except (KeyError, TypeError, ValueError):
+                    continue
+                loaded += 1
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+        return loaded
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """整個進程共用的快取，設定 OCR_CACHE_FILE 時第一次取用會載入存檔"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = OcrCache()
+            if OCR_CACHE_FILE:
+                loaded = _cache.load(OCR_CACHE_FILE)
+                if loaded:
+                    print(f"✅ 已載入 OCR 快取 {loaded} 筆")
+        return _cache
+
+
+def lookup(kind, crop):
+    return get_cache().lookup(kind, crop)
+
+
+def store(kind, crop, value):
+    get_cache().store(kind, crop, value)
+
+
+def save_cache():
+    """把快取寫回 OCR_CACHE_FILE（沒設定時不做事），回傳寫入筆數"""
+    if not OCR_CACHE_FILE or _cache is None:
+        return 0
+    try:
+        return _cache.save(OCR_CACHE_FILE)
+    except OSError as e:
+        print(f"⚠️ OCR 快取存檔失敗：{e}")
+        return 0
+
+
+def cache_summary():
+    """(命中, 相近命中, 未命中)，給週期日誌使用"""
+    counters, _ = stats.snapshot()
+    totals = [0, 0, 0]
+    for name, value in counters.items():
+        if name.startswith("ocr.cache."):
+            for i, suffix in enumerate((".hit", ".near_hit", ".miss")):
+                if name.endswith(suffix):
+                    totals[i] += value
+    return tuple(totals)
+
+
+def cached(kind):
+    """
+    包在 OCR 函式外面：第一個參數是裁切圖（陣列或路徑）
+    命中就直接回傳，沒命中時執行原函式並記下成功的結果
+    """
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(crop, *args, **kwargs):
+            value = lookup(kind, crop)
+            if value is not None:
+                print(f"✅ OCR 快取命中：{value}")
+                return value
+            value = func(crop, *args, **kwargs)
+            store(kind, crop, value)
+            return value
+        return wrapper
+    return decorate
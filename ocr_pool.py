@@ -0,0 +1,214 @@
+import multiprocessing
+import os
+import time
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import stats
+
+# OCR 進程數量，每個進程各自載入一份 EasyOCR / Tesseract
+OCR_POOL_SIZE = 2
+# 每個 OCR 進程使用的 torch 執行緒數
+OCR_TORCH_THREADS = 2
+# 預熱時等待所有進程載入模型的上限（秒）
+OCR_WARMUP_TIMEOUT = 300
+
+
+# ---------- OCR 進程內 ----------
+
+_READER = None
+_BARRIER = None
+
+
+def _init_worker(torch_threads, barrier=None):
+    """每個 OCR 進程啟動時只執行一次：設定 torch 執行緒並載入模型"""
+    global _READER, _BARRIER
+    _BARRIER = barrier
+    import torch
+    import easyocr
+
+    torch.set_num_threads(torch_threads)
+    _READER = easyocr.Reader(['ch_tra', 'en'], gpu=False)
+
+
+def _attach(shm_name, shape, dtype):
+    """從共享記憶體複製出裁切圖，複製完立刻放掉共享記憶體"""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        return np.ndarray(shape, dtype=dtype, buffer=shm.buf).copy()
+    finally:
+        shm.close()
+
+
+def _ready(timeout):
+    """
+    預熱用的工作：能執行就表示這個進程的 initializer（載入模型）已經跑完
+    在 barrier 等其他進程，size 個工作才會分別落在 size 個不同的進程上
+    """
+    if _BARRIER is not None:
+        _BARRIER.wait(timeout)
+    return os.getpid()
+
+
+def _run_task(task, shm_name, shape, dtype):
+    from youtube import youtube_extract_viewer_count, youtube_extract_name_2
+    from twitch import twitch_extract_viewer_count, twitch_extract_name_2
+
+    crop = _attach(shm_name, shape, dtype)
+    start = time.perf_counter()
+    if task == "yt_count":
+        value = youtube_extract_viewer_count(crop, _READER)
+    elif task == "tw_count":
+        value = twitch_extract_viewer_count(crop, _READER)
+    elif task == "yt_title":
+        value = youtube_extract_name_2(crop)
+    elif task == "tw_title":
+        value = twitch_extract_name_2(crop)
+    else:
+        raise ValueError(f"未知的 OCR 工作：{task}")
+
+    # 人數統一轉成整數（失敗為 -1 / -2），標題維持字串
+    if task.endswith("_count"):
+        value = int(value) if isinstance(value, str) else value
+    return value, time.perf_counter() - start
+
+
+# ---------- 主進程 ----------
+
+class OcrPool:
+    """
+    獨立的 OCR 進程池：瀏覽器擷取的執行緒只負責送出裁切圖，
+    辨識在其他進程進行，不會卡住下一個頁面的載入
+    裁切圖透過共享記憶體傳遞，避免 pickle 整個陣列
+    """
+
+    def __init__(self, size=OCR_POOL_SIZE, torch_threads=OCR_TORCH_THREADS):
+        self.size = size
+        self.torch_threads = torch_threads
+        self._executor = None
+        self._barrier = None
+        self._ready = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        self._get_executor()
+        return self
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                # barrier 逾時或損壞後不能再用，每個 executor 各用一個新的
+                self._barrier = multiprocessing.Barrier(self.size)
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.size,
+                    initializer=_init_worker,
+                    initargs=(self.torch_threads, self._barrier),
+                )
+            return self._executor
+
+    def _reset(self, executor):
+        """
+        丟掉損壞的 executor（有 OCR 進程死掉時整個 ProcessPoolExecutor 都不能再用），下次取用時重建
+        其他執行緒已經換過新的時不動
+        """
+        with self._lock:
+            if self._executor is not executor:
+                return
+            self._executor = None
+            self._barrier = None
+            self._ready = None
+        stats.incr("ocr.pool.rebuild")
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, fn, *args):
+        """送進 executor；進程池已經損壞時重建一次再送"""
+        executor = self._get_executor()
+        try:
+            return executor.submit(fn, *args)
+        except BrokenProcessPool:
+            print("⚠️ OCR 進程池有進程中止，重新建立進程池")
+            self._reset(executor)
+            return self._get_executor().submit(fn, *args)
+
+    def warm_up(self):
+        """
+        啟動所有 OCR 進程並讓每個進程載入模型，回傳 readiness future（結果為已就緒的進程數）
+        """
+        with self._lock:
+            # 重複呼叫回傳同一個
+            if self._ready is not None and not (self._ready.done() and self._ready.exception()):
+                return self._ready
+            failed = self._ready is not None
+            executor = self._executor
+        # 上次預熱失敗（barrier 已損壞、或有進程死掉）時整個進程池重建再預熱
+        if failed and executor is not None:
+            self._reset(executor)
+        executor = self._get_executor()
+        with self._lock:
+            ready = self._ready = Future()
+
+        def wait():
+            start = time.perf_counter()
+            try:
+                futures = [self._submit(_ready, OCR_WARMUP_TIMEOUT) for _ in range(self.size)]
+                pids = {future.result() for future in futures}
+            except Exception as e:
+                print(f"❌ OCR 進程預熱失敗：{e}")
+                if isinstance(e, BrokenProcessPool):
+                    self._reset(executor)
+                ready.set_exception(e)
+                return
+            stats.add_time("ocr.pool.warmup", time.perf_counter() - start)
+            ready.set_result(len(pids))
+
+        threading.Thread(target=wait, name="ocr-pool-warmup", daemon=True).start()
+        return ready
+
+    def submit(self, task, crop):
+        """
+        送出一張裁切圖，回傳 Future，結果為人數（int）或標題（str）
+        task："yt_count"、"tw_count"、"yt_title"、"tw_title"
+        """
+        crop = np.ascontiguousarray(crop)
+        shm = shared_memory.SharedMemory(create=True, size=max(crop.nbytes, 1))
+        np.ndarray(crop.shape, dtype=crop.dtype, buffer=shm.buf)[...] = crop
+
+        # OCR 進程讀完（或失敗）後才釋放共享記憶體
+        def release(_=None):
+            shm.close()
+            try:
+                shm.unlink()
+            except FileNotFoundError:
+                pass
+
+        try:
+            future = self._submit(_run_task, task, shm.name, crop.shape, crop.dtype.str)
+        except Exception:
+            release()
+            raise
+        stats.incr(f"ocr.pool.{task}")
+        future.add_done_callback(release)
+        return future
+
+    def result(self, future, timeout=None):
+        """等待結果並記錄辨識耗時，失敗時回傳 -2（進程中止時下一次送出會重建進程池）"""
+        try:
+            value, elapsed = future.result(timeout)
+        except Exception as e:
+            print(f"❌ OCR 進程處理失敗：{e}")
+            stats.incr("ocr.pool.error")
+            return -2
+        stats.add_time("ocr.pool.time", elapsed)
+        return value
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+            self._barrier = None
+            self._ready = None
+        if executor is not None:
+            executor.shutdown(wait=True)
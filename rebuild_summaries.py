@@ -0,0 +1,23 @@
+import sys
+import time
+
+from db import get_connection, close_all
+from sql import DB_PATH, init_db, rebuild_stream_stats, rebuild_slot_rollup
+
+# 從 main 重新計算儀表板用的彙總表（stream_stats、slot_rollup）
+# 升級資料庫時會自動算一次；手動修改或刪除過 main 的資料後再執行
+# python rebuild_summaries.py [資料庫路徑]
+
+
+def main(db_path=DB_PATH):
+    init_db(db_path)
+    conn = get_connection(db_path)
+    for name, rebuild in (("stream_stats", rebuild_stream_stats), ("slot_rollup", rebuild_slot_rollup)):
+        start = time.perf_counter()
+        rows = rebuild(conn)
+        print(f"✅ 已重新計算 {name}：{rows} 筆（{time.perf_counter() - start:.1f} 秒）")
+    close_all()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else DB_PATH)
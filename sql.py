@@ -2,6 +2,7 @@ import sqlite3
 import time
 import datetime
 import csv
+import threading
 
 from youtube import (
     youtube_find_and_crop,
@@ -17,13 +18,243 @@ from twitch import (
     twitch_extract_name_2
 )
 
+from frame import load_frame
+from db import get_connection
+from stream_sessions import get_sessions, platform_name
+import ocr_cache
+
 
 DB_PATH = "data.db"
 
+# 資料庫結構升級，依序執行；已套用到第幾步記在 PRAGMA user_version
+SCHEMA_UPGRADES = [
+    # 1：整數 epoch 時間欄位（秒），範圍查詢改用整數比較，並建立常用查詢的覆蓋索引；既有資料一次回填
+    [
+        lambda conn: _add_epoch_columns(conn),
+        lambda conn: backfill_epochs(conn),
+    ],
+    # 2：每場直播的統計（stream_stats），儀表板不必每次重新 groupby 整個 main；既有資料一次算好
+    [
+        "CREATE INDEX IF NOT EXISTS idx_stream_stats_channel ON stream_stats (platform, channel)",
+        "CREATE INDEX IF NOT EXISTS idx_same_stream_from ON same_stream (from_id)",
+        lambda conn: rebuild_stream_stats(conn),
+    ],
+    # 3：每個頻道每個 15 分鐘時段的人數合計（slot_rollup），時段分布圖最多只讀 96 列；既有資料一次算好
+    [
+        lambda conn: rebuild_slot_rollup(conn),
+    ],
+    # 4：舊版回填把無法解析的時間填成 0（會被當成 1970 年），改回 NULL 並重新計算 stream_stats
+    [
+        lambda conn: _clear_zero_epochs(conn),
+        lambda conn: rebuild_stream_stats(conn),
+    ],
+]
+
+# 每個資料表的 epoch 欄位與對應的文字時間，舊資料由 backfill_epochs 分段回填
+EPOCH_COLUMNS = [
+    ("main", "ts", "date || ' ' || time"),
+    ("stream", "start_ts", "start_time"),
+    ("stream", "end_ts", "end_time"),
+    ("working", "ts", "time"),
+]
+# 回填時每次更新幾筆（每段各自 commit，儀表板與抓取程式不會被卡住太久）
+BACKFILL_CHUNK = 20000
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# stream_stats 的平均 / 最大 / 最小只算觀看人數達到這個值的紀錄（與儀表板原本的過濾相同）
+STATS_MIN_VIEWERS = 10
+
+# 時段分布圖的時段長度：一天分成 SLOTS_PER_DAY 個，時間四捨五入到最近的時段（剛好一半時進位）
+SLOT_SECONDS = 15 * 60
+SLOTS_PER_DAY = 24 * 60 * 60 // SLOT_SECONDS
+
+SLOT_ROLLUP_UPSERT = '''
+    INSERT INTO slot_rollup (channel, platform, slot, view_sum, view_count)
+    VALUES (?, ?, ?, ?, 1)
+    ON CONFLICT (channel, platform, slot) DO UPDATE SET
+        view_sum = view_sum + excluded.view_sum,
+        view_count = view_count + 1
+'''
+
+# 每寫入一筆 main 就把人數累加進對應直播的統計；min / max 遇到 NULL（沒達門檻）時保留另一邊
+STREAM_STATS_UPSERT = '''
+    INSERT INTO stream_stats (stream_id, platform, channel, samples, view_sum, view_count, view_min, view_max, first_ts, last_ts)
+    VALUES (?1, ?2, ?3, 1, ?4, ?5, ?6, ?6, ?7, ?7)
+    ON CONFLICT (platform, stream_id) DO UPDATE SET
+        samples = samples + 1,
+        view_sum = view_sum + excluded.view_sum,
+        view_count = view_count + excluded.view_count,
+        view_min = COALESCE(MIN(view_min, excluded.view_min), view_min, excluded.view_min),
+        view_max = COALESCE(MAX(view_max, excluded.view_max), view_max, excluded.view_max),
+        first_ts = MIN(first_ts, excluded.first_ts),
+        last_ts = MAX(last_ts, excluded.last_ts)
+'''
+
+
+# 現在時間的文字與 epoch（兩個欄位一起寫入）
+def now_stamp():
+    now = datetime.datetime.now().replace(microsecond=0)
+    return now.strftime(TIME_FORMAT), int(now.timestamp())
+
+
+def _add_epoch_columns(conn):
+    for table, column, _ in EPOCH_COLUMNS:
+        existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+        if column not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} INTEGER DEFAULT NULL")
+    for statement in (
+        # latest_live_channels：某個時段內各頻道的最大人數；ts 在最前面，回填時也用它找還沒填的
+        "CREATE INDEX IF NOT EXISTS idx_main_ts ON main (ts, channel, youtube, twitch)",
+        # 儀表板：單一頻道的時間序列
+        "CREATE INDEX IF NOT EXISTS idx_main_channel_ts ON main (channel, ts, youtube, twitch)",
+        # stream_sessions 啟動時的 load：end_ts 範圍內各頻道 + 平台的最後一場
+        "CREATE INDEX IF NOT EXISTS idx_stream_channel_type_end_ts ON stream (channel_name, type, end_ts)",
+        "CREATE INDEX IF NOT EXISTS idx_working_ts ON working (ts)",
+    ):
+        conn.execute(statement)
+
+
+# 把舊資料的文字時間轉成 epoch，分段進行、每段 commit，中斷後再執行會從還沒填的地方繼續
+# 文字時間是本地時間，strftime 的 'utc' 修飾把它換成 UTC 秒數（與 datetime.timestamp() 相同）
+# 只在結構升級（第 1 版）時執行一次；無法解析的時間維持 NULL，不會被當成 1970 年
+def backfill_epochs(conn, chunk_size=BACKFILL_CHUNK):
+    total = 0
+    for table, column, text in EPOCH_COLUMNS:
+        epoch = f"CAST(strftime('%s', {text}, 'utc') AS INTEGER)"
+        filled = 0
+        while True:
+            try:
+                cursor = conn.execute(f'''
+                    UPDATE {table}
+                    SET {column} = {epoch}
+                    WHERE id IN (SELECT id FROM {table} WHERE {column} IS NULL AND {epoch} IS NOT NULL LIMIT ?)
+                ''', (chunk_size,))
+                conn.commit()
+            except sqlite3.Error:
+                conn.rollback()
+                raise
+            if cursor.rowcount <= 0:
+                break
+            filled += cursor.rowcount
+            print(f"⏳ 回填 {table}.{column}：已處理 {filled} 筆")
+        total += filled
+    return total
+
+
+def _clear_zero_epochs(conn):
+    for table, column, _ in EPOCH_COLUMNS:
+        conn.execute(f"UPDATE {table} SET {column} = NULL WHERE {column} = 0")
+
+
+# main 的紀錄（date, time, channel, youtube, twitch, yt_number, tw_number, ts）累加進 stream_stats
+# 和寫入 main 用同一個 cursor，一起 commit
+def update_stream_stats(cursor, rows):
+    params = []
+    for _, _, channel, yt_count, tw_count, yt_number, tw_number, ts in rows:
+        for platform, stream_id, viewers in (("youtube", yt_number, yt_count), ("twitch", tw_number, tw_count)):
+            if not stream_id:
+                continue
+            counted = viewers >= STATS_MIN_VIEWERS
+            params.append((stream_id, platform, channel, viewers if counted else 0, int(counted),
+                           viewers if counted else None, ts))
+    cursor.executemany(STREAM_STATS_UPSERT, params)
+
+
+# epoch 所在的時段（本地時間，0 為 00:00，四捨五入到最近的時段）
+def slot_of_day(ts):
+    local = time.localtime(ts)
+    seconds = local.tm_hour * 3600 + local.tm_min * 60 + local.tm_sec
+    return (seconds + SLOT_SECONDS // 2) // SLOT_SECONDS % SLOTS_PER_DAY
+
+
+# main 的紀錄累加進 slot_rollup（只算人數 >= STATS_MIN_VIEWERS 的平台）
+def update_slot_rollup(cursor, rows):
+    params = []
+    for _, _, channel, yt_count, tw_count, _, _, ts in rows:
+        slot = slot_of_day(ts)
+        for platform, viewers in (("youtube", yt_count), ("twitch", tw_count)):
+            if viewers >= STATS_MIN_VIEWERS:
+                params.append((channel, platform, slot, viewers))
+    cursor.executemany(SLOT_ROLLUP_UPSERT, params)
+
+
+# 寫入 main 時一起更新的彙總表
+def update_summaries(cursor, rows):
+    update_stream_stats(cursor, rows)
+    update_slot_rollup(cursor, rows)
+
+
+# 從 main 重新計算整個 stream_stats（升級時、或手動修改過 main 之後）
+def rebuild_stream_stats(conn):
+    try:
+        conn.execute("DELETE FROM stream_stats")
+        for platform, number, viewers in (("youtube", "yt_number", "youtube"), ("twitch", "tw_number", "twitch")):
+            counted = f"CASE WHEN {viewers} >= {STATS_MIN_VIEWERS} THEN {viewers} END"
+            epoch = "COALESCE(ts, CAST(strftime('%s', date || ' ' || time, 'utc') AS INTEGER))"
+            conn.execute(f'''
+                INSERT INTO stream_stats (stream_id, platform, channel, samples, view_sum, view_count, view_min, view_max, first_ts, last_ts)
+                SELECT {number}, ?, MIN(channel), COUNT(*), COALESCE(SUM({counted}), 0), COUNT({counted}),
+                       MIN({counted}), MAX({counted}), MIN({epoch}), MAX({epoch})
+                FROM main
+                WHERE {number} != 0
+                GROUP BY {number}
+            ''', (platform,))
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    return conn.execute("SELECT COUNT(*) FROM stream_stats").fetchone()[0]
+
+
+# 從 main 重新計算整個 slot_rollup（升級時、或手動修改過 main 之後）
+# 本地時間的秒數：有 ts 時用 ts 換算，舊資料用 date + time（當成 UTC 解析就等於本地的秒數）
+def rebuild_slot_rollup(conn):
+    local = '''CASE WHEN ts > 0 THEN CAST(strftime('%s', ts, 'unixepoch', 'localtime') AS INTEGER)
+                   ELSE CAST(strftime('%s', date || ' ' || time) AS INTEGER) END'''
+    slot = f"(({local}) % 86400 + {SLOT_SECONDS // 2}) / {SLOT_SECONDS} % {SLOTS_PER_DAY}"
+    try:
+        conn.execute("DELETE FROM slot_rollup")
+        for platform in ("youtube", "twitch"):
+            conn.execute(f'''
+                INSERT INTO slot_rollup (channel, platform, slot, view_sum, view_count)
+                SELECT channel, ?, {slot} AS slot_of_day, SUM({platform}), COUNT(*)
+                FROM main
+                WHERE {platform} >= {STATS_MIN_VIEWERS} AND slot_of_day IS NOT NULL
+                GROUP BY channel, slot_of_day
+            ''', (platform,))
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    return conn.execute("SELECT COUNT(*) FROM slot_rollup").fetchone()[0]
+
+
+# 套用還沒套用過的結構升級，回傳升級後的版本
+def upgrade_db(conn):
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for number, statements in enumerate(SCHEMA_UPGRADES[version:], start=version + 1):
+        start = time.perf_counter()
+        try:
+            for statement in ([statements] if callable(statements) else statements):
+                if callable(statement):
+                    statement(conn)
+                else:
+                    conn.execute(statement)
+            conn.execute(f"PRAGMA user_version = {number}")
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        print(f"✅ 資料庫結構升級到第 {number} 版（{time.perf_counter() - start:.1f} 秒）")
+        version = number
+    return version
+
+
 # 初始化資料庫
 # 如果資料庫不存在，會自動建立
 def init_db(db_path=DB_PATH):
-    conn = sqlite3.connect(db_path)
+    conn = get_connection(db_path)
     cursor = conn.cursor()
     cursor.execute('''
     CREATE TABLE IF NOT EXISTS main (
@@ -34,7 +265,8 @@ def init_db(db_path=DB_PATH):
         youtube INTEGER NOT NULL,
         twitch INTEGER NOT NULL,
         yt_number INTEGER DEFAULT 0,
-        tw_number INTEGER DEFAULT 0
+        tw_number INTEGER DEFAULT 0,
+        ts INTEGER DEFAULT NULL
     )
     ''')
     
@@ -46,7 +278,9 @@ def init_db(db_path=DB_PATH):
         type TEXT NOT NULL,
         url TEXT DEFAULT NULL,
         start_time TEXT NOT NULL,
-        end_time TEXT NOT NULL
+        end_time TEXT NOT NULL,
+        start_ts INTEGER DEFAULT NULL,
+        end_ts INTEGER DEFAULT NULL
     )
     ''')
     
@@ -67,12 +301,56 @@ def init_db(db_path=DB_PATH):
         finish TEXT NOT NULL,
         timer REAL DEFAULT NULL,
         kind TEXT DEFAULT NULL,
-        "create" INTEGER DEFAULT NULL
+        "create" INTEGER DEFAULT NULL,
+        ts INTEGER DEFAULT NULL
     )
     ''')
-    
+
+    # 儀表板合併同一場直播用（from_id 併入 to_id）
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS same_stream(
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        from_id INTEGER NOT NULL,
+        to_id INTEGER NOT NULL,
+        time TEXT DEFAULT NULL
+    )
+    ''')
+
+    # 每場直播的統計，由寫入 main 時累加（update_stream_stats）
+    # samples：紀錄筆數；view_*：只算人數 >= STATS_MIN_VIEWERS 的紀錄；first_ts / last_ts：第一筆與最後一筆的時間
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS stream_stats(
+        platform TEXT NOT NULL,
+        stream_id INTEGER NOT NULL,
+        channel TEXT NOT NULL,
+        samples INTEGER NOT NULL,
+        view_sum INTEGER NOT NULL,
+        view_count INTEGER NOT NULL,
+        view_min INTEGER DEFAULT NULL,
+        view_max INTEGER DEFAULT NULL,
+        first_ts INTEGER DEFAULT NULL,
+        last_ts INTEGER DEFAULT NULL,
+        PRIMARY KEY (platform, stream_id)
+    )
+    ''')
+
+    # 每個頻道、平台、一天中的時段（0 ~ SLOTS_PER_DAY - 1）人數合計與筆數，只算人數 >= STATS_MIN_VIEWERS
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS slot_rollup(
+        channel TEXT NOT NULL,
+        platform TEXT NOT NULL,
+        slot INTEGER NOT NULL,
+        view_sum INTEGER NOT NULL,
+        view_count INTEGER NOT NULL,
+        PRIMARY KEY (channel, platform, slot)
+    ) WITHOUT ROWID
+    ''')
+
     conn.commit()
-    conn.close()
+
+    upgrade_db(conn)
+    # 讓查詢規劃器更新索引統計（只在需要時才真的分析）
+    conn.execute("PRAGMA optimize")
 
 
 # 儲存觀看人數到資料庫
@@ -84,7 +362,7 @@ def save_viewer_count \
     tw_number=0,
     db_path=DB_PATH):
     
-    conn = sqlite3.connect(db_path)
+    conn = get_connection(db_path)
     cursor = conn.cursor()
     now = time.localtime()
     date_str = time.strftime('%Y-%m-%d', now)
@@ -92,13 +370,17 @@ def save_viewer_count \
 
 
 
-    cursor.execute('''
-    INSERT INTO main (date, time, channel, youtube, twitch, yt_number, tw_number)
-    VALUES (?, ?, ?, ?, ?, ?, ?)
-    ''', (date_str, time_str, channel_id, yt_count, tw_count, yt_number, tw_number))
-
-    conn.commit()
-    conn.close()
+    row = (date_str, time_str, channel_id, yt_count, tw_count, yt_number, tw_number, int(time.mktime(now)))
+    try:
+        cursor.execute('''
+        INSERT INTO main (date, time, channel, youtube, twitch, yt_number, tw_number, ts)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', row)
+        update_summaries(cursor, [row])
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
     print(f"✅ 已儲存至資料庫：{channel_id} - YouTube: {yt_count} 人, Twitch: {tw_count} 人 ({date_str} {time_str})")
 
 
@@ -107,125 +389,159 @@ def save_viewer_count \
 # yt_number_get 回傳 YouTube 直播紀錄的 ID
 # 用在 main.py 中新增 main用
 def yt_number_get(channel_id, args, db_path=DB_PATH):
-    
-    istreaming = is_straming(channel_id, 0, db_path)
-    if istreaming:
-        now = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    return stream_number_get(channel_id, 0, args, db_path)
 
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            UPDATE stream
-            SET end_time = ?
-            WHERE id = ?
-        ''', (now, istreaming))
 
-        conn.commit()
-        conn.close()
-        print(f"✅ 已更新 stream ID={istreaming} 的 end_time 為 {now}")
-        
-        return istreaming
-    else:
-        rtid = create_stream_yt(channel_id, args, db_path)
-        return rtid
+def tw_number_get(channel_id, args, db_path=DB_PATH):
+    return stream_number_get(channel_id, 1, args, db_path)
 
 
-def tw_number_get(channel_id, args, db_path=DB_PATH):
-    
-    istreaming = is_straming(channel_id, 1, db_path)
+# 延續中的直播更新 end_time，沒有時新增一筆；進行中的直播從 stream_sessions 查，不必查 stream 表
+# type 0 為 YouTube，1 為 Twitch
+def stream_number_get(channel_id, type, args, db_path=DB_PATH):
+    sessions = get_sessions(db_path)
+    now, now_ts = now_stamp()
+    istreaming = sessions.lookup(channel_id, type, now_ts)
     if istreaming:
-        now = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-
-        conn = sqlite3.connect(db_path)
+        conn = get_connection(db_path)
         cursor = conn.cursor()
 
-        cursor.execute('''
-            UPDATE stream
-            SET end_time = ?
-            WHERE id = ?
-        ''', (now, istreaming))
-
-        conn.commit()
-        conn.close()
+        try:
+            cursor.execute('''
+                UPDATE stream
+                SET end_time = ?, end_ts = ?
+                WHERE id = ?
+            ''', (now, now_ts, istreaming))
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
         print(f"✅ 已更新 stream ID={istreaming} 的 end_time 為 {now}")
-        
-        return istreaming
+        rtid = istreaming
+    elif type == 0:
+        rtid = create_stream_yt(channel_id, args, db_path)
     else:
         rtid = create_stream_tw(channel_id, args, db_path)
-        return rtid
 
+    sessions.touch(channel_id, type, rtid, now_ts)
+    return rtid
 
-# is_straming 函數用於檢查頻道是否在最近30分鐘內有開台
-# type 0 為 YouTube，1 為 Twitch
-def is_straming(channel_id, type, db_path=DB_PATH):
-    now = datetime.datetime.now()
-    time_30min_ago = now - datetime.timedelta(minutes=35)
 
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    
-    if type == 0:
-        type = "youtube"
-    else:
-        type = "twitch"
+# 裁切 YouTube 直播標題的區域，回傳 (裁切圖, 點擊座標 x, y)，沒找到時裁切圖為 None
+# 裁切圖複製一份，不會連帶保留整張截圖
+def cut_title_yt(frame, template_path, cropped_path):
+    rt, find_x, find_y = youtube_find_and_crop(frame, template_path, cropped_path, 45, crop_height=100, crop_width=420)
+    crop = frame.crop.copy() if frame is not None and frame.crop is not None else None
+    return crop, find_x, find_y
 
-    cursor.execute('''
-        SELECT * FROM stream
-        WHERE channel_name = ?
-        AND end_time BETWEEN ? AND ?
-        AND type = ?
-    ''', (
-        channel_id,
-        time_30min_ago.strftime('%Y-%m-%d %H:%M:%S'),
-        now.strftime('%Y-%m-%d %H:%M:%S'),
-        type
-    ))
-    
-    result = cursor.fetchone()
-    conn.close()
-    
-    return result[0] if result else 0
-
-
-# create_stream_yt 函數用於新增 YouTube 的 stream
-def create_stream_yt\
-(channel_id, args, db_path=DB_PATH):
-    
-    now = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    
+# 裁切 Twitch 直播標題的區域，沒找到時回傳 None
+def cut_title_tw(frame, cropped_path):
+    twitch_find_and_crop(frame, "find/tw_find_2.png", cropped_path,
+                    offset_x=-1490,offset_y=-20, crop_height=100, crop_width=1200)
+    return frame.crop.copy() if frame is not None and frame.crop is not None else None
+
+
+# 辨識標題裁切圖：有 OCR 進程池時交給池子（Tesseract 只在進程內載入一次）
+def extract_title(args, task, extract, crop):
+    if crop is None:
+        return -1
+    pool = args.get("ocr_pool")
+    if pool is not None:
+        # 送進 OCR 進程前先查主進程的快取（進程內的快取不會傳回來）
+        title = ocr_cache.lookup(task, crop)
+        if title is None:
+            title = pool.result(pool.submit(task, crop))
+            ocr_cache.store(task, crop, title)
+        return title
+    return extract(crop)
+
+
+# 新增直播紀錄需要的標題與網址（YouTube）
+def stream_info_yt(args):
     """
     args ={
-                "driver": driver,
+                "get_driver": get_driver,  # 需要時才取得 driver（點擊取得影片網址）
                 "cid": cid,
                 "yt_url": yt_url,
                 "screenshot_path" : f"pictures/yt_picture/{cid}_capture.png",
                 "cropped_path" : f"pictures/yt_crop/{cid}_crop.png",
                 "template_path" : "find/yt_find.png",
-                "OCR_READER": OCR_READER
+                "ocr_pool": OCR_POOL
             } 
+    再加上 yt_part 的擷取結果：frame（截圖）、title、video_url（HTTP 後端或截圖時的頁面），
+    等待批次 OCR 的紀錄不保留截圖，改為先裁好的 title_crop 與點擊座標 find_xy
+    回傳 (name, url)
     """
     
     #youtube_capture_screenshot(test_yt_url, test_save_path, driver)
-    nouse,find_x,find_y = youtube_find_and_crop\
-    (args["screenshot_path"], args["template_path"], args["cropped_path"], 45,crop_height=100,crop_width=420)
-    name = youtube_extract_name_2(args["cropped_path"])
-    url = youtube_click_for_link(args["driver"],args["yt_url"],find_x,find_y)
+    # 擷取時已經取得標題與網址時直接使用，沒有時才重新載入頁面點擊
+    name = args.get("title")
+    url = args.get("video_url")
+
+    if not name or not url:
+        if "title_crop" in args:
+            crop = args["title_crop"]
+            find_x, find_y = args["find_xy"]
+        else:
+            # 優先使用記憶體中的截圖，沒有時才讀檔
+            frame = load_frame(args.get("frame") or args["screenshot_path"])
+            crop, find_x, find_y = cut_title_yt(frame, args["template_path"], args["cropped_path"])
+        if not name:
+            name = extract_title(args, "yt_title", youtube_extract_name_2, crop)
+        if not url:
+            url = youtube_click_for_link(args["get_driver"](),args["yt_url"],find_x,find_y)
+    return name, url
+
+
+# 新增直播紀錄需要的標題與網址（Twitch）
+def stream_info_tw(args):
+    """
+    args ={
+                "screenshot_path" : f"pictures/yt_picture/{cid}_capture.png",
+                "cropped_path" : f"pictures/yt_crop/{cid}_crop.png",
+                "ocr_pool": OCR_POOL
+            } 
+    再加上 tw_part 的擷取結果：frame（截圖）、title（HTTP 後端），
+    等待批次 OCR 的紀錄不保留截圖，改為先裁好的 title_crop
+    回傳 (name, url)
+    """
     
-    #name = "space"
-    #url = "space"  
+    # HTTP 後端已經取得標題時直接使用
+    name = args.get("title")
+    if not name:
+        if "title_crop" in args:
+            crop = args["title_crop"]
+        else:
+            crop = cut_title_tw(load_frame(args.get("frame") or args["screenshot_path"]), args["cropped_path"])
+        name = extract_title(args, "tw_title", twitch_extract_name_2, crop)
+    return name, "twitch"
+
 
+# 寫入一筆 stream，開始與結束時間都是 now（now_stamp() 的 (文字, epoch)）
+def insert_stream(cursor, channel_id, name, type, url, now):
+    now_text, now_ts = now
     cursor.execute('''
-        INSERT INTO stream (channel_name, name, type, url, start_time, end_time)
-        VALUES (?, ?, ?, ?, ?, ?)
-    ''', (channel_id, name, "youtube", url, now, now))
+        INSERT INTO stream (channel_name, name, type, url, start_time, end_time, start_ts, end_ts)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (channel_id, name, type, url, now_text, now_text, now_ts, now_ts))
+    return cursor.lastrowid
 
-    conn.commit()
-    inserted_id = cursor.lastrowid
-    conn.close()
+
+# create_stream_yt 函數用於新增 YouTube 的 stream
+def create_stream_yt\
+(channel_id, args, db_path=DB_PATH):
+    
+    now = now_stamp()
+    name, url = stream_info_yt(args)
+
+    conn = get_connection(db_path)
+    try:
+        inserted_id = insert_stream(conn.cursor(), channel_id, name, "youtube", url, now)
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
 
     print(f"✅ 已新增直播紀錄，ID = {inserted_id}")
     return inserted_id  # 回傳這筆資料的 id
@@ -236,35 +552,16 @@ def create_stream_yt\
 def create_stream_tw\
 (channel_id, args, db_path=DB_PATH):
 
-    now = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    
-    """
-    args ={
-                "screenshot_path" : f"pictures/yt_picture/{cid}_capture.png",
-                "cropped_path" : f"pictures/yt_crop/{cid}_crop.png",
-                "OCR_READER": OCR_READER
-            } 
-    """
-    
-    
-    twitch_find_and_crop(args["screenshot_path"], "find/tw_find_2.png", args["cropped_path"],
-                    offset_x=-1490,offset_y=-20, crop_height=100, crop_width=1200)
-    name = twitch_extract_name_2(args["cropped_path"])
-    url = "twitch"
-    #name = "space"
-    #url = "space"  
-
-    cursor.execute('''
-        INSERT INTO stream (channel_name, name, type, url, start_time, end_time)
-        VALUES (?, ?, ?, ?, ?, ?)
-    ''', (channel_id, name, "twitch", url, now, now))
+    now = now_stamp()
+    name, url = stream_info_tw(args)
 
-    conn.commit()
-    inserted_id = cursor.lastrowid
-    conn.close()
+    conn = get_connection(db_path)
+    try:
+        inserted_id = insert_stream(conn.cursor(), channel_id, name, "twitch", url, now)
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
 
     print(f"✅ 已新增直播紀錄，ID = {inserted_id}")
     return inserted_id  # 回傳這筆資料的 id
@@ -276,7 +573,7 @@ def create_stream_tw\
 def insert_working(start,finish, timer,id,kind,create):
     
     """將一筆資料插入 streamer 資料表中"""
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection(DB_PATH)
     cursor = conn.cursor()
 
     fin_text = "Finish" if finish else "Problem" 
@@ -290,12 +587,12 @@ def insert_working(start,finish, timer,id,kind,create):
     
     if start:
         try:
-            now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            now, now_ts = now_stamp()
             
             cursor.execute('''
-                INSERT INTO working (time, finish, timer,kind,"create")
-                VALUES (?, ?, ?, ?, ?)
-            ''', (now, fin_text, timer,kind,create))
+                INSERT INTO working (time, finish, timer,kind,"create", ts)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (now, fin_text, timer,kind,create, now_ts))
             conn.commit()
             id = cursor.lastrowid
             
@@ -303,9 +600,8 @@ def insert_working(start,finish, timer,id,kind,create):
             
             return id
         except sqlite3.IntegrityError as e:
+            conn.rollback()
             print(f"❌ 新增失敗，時間可能重複：{e}")
-        finally:
-            conn.close()
     else:
         try:
             timer = round(timer, 2)
@@ -317,12 +613,136 @@ def insert_working(start,finish, timer,id,kind,create):
             conn.commit()
             print("✅ 成功更新 working 紀錄")
         except sqlite3.Error as e:
+            conn.rollback()
             print(f"❌ 更新失敗：{e}")
-        finally:
-            conn.close()
 
 
 
+# ---------- 整個週期一次寫入 ----------
+
+# 每累積幾筆 main 紀錄就先寫入一次（None：整個週期只在最後寫入一次）
+CYCLE_CHUNK_SIZE = None
+
+
+class CycleWriter:
+    """
+    收集一個抓取週期的 main 紀錄與 stream 更新，最後用 executemany 在同一個交易裡寫入，
+    working 紀錄也在同一個交易裡更新為完成
+    週期中途當掉時什麼都不會寫入，working 維持 "Problem"
+    新開台的 stream 先給暫時的負數編號，寫入時換成真正的 id
+    進行中的直播從 stream_sessions 查，commit 成功後才把這個週期的開台 / 收台套用回去
+    """
+
+    def __init__(self, db_path=DB_PATH, chunk_size=CYCLE_CHUNK_SIZE):
+        self.db_path = db_path
+        self.chunk_size = chunk_size
+        self._lock = threading.Lock()
+        self._rows = []          # main：(date, time, channel, youtube, twitch, yt_number, tw_number, ts)
+        self._ends = {}          # stream id -> (end_time, end_ts)
+        self._new = {}           # 暫時編號 -> (channel_id, name, type, url, now_stamp())
+        self._ids = {}           # 已寫入的暫時編號 -> 真正的 id（分段寫入時後面的紀錄還會用到）
+        self._seen = {}          # (channel_id, type) -> (stream id 或暫時編號, end_ts)
+        self._offline = set()    # 這個週期沒開台的 (channel_id, type)
+        self.sessions = get_sessions(db_path)
+        self._next_temp = -1
+        self.written = {"main": 0, "stream_end": 0, "stream_new": 0, "stream_closed": 0, "commits": 0}
+
+    def stream_number(self, channel_id, type, args):
+        """
+        取得這次開台的 stream 編號：延續中的直播記下新的 end_time，新開台的先查好標題與網址
+        type 0 為 YouTube，1 為 Twitch
+        """
+        now = now_stamp()
+        istreaming = self.sessions.lookup(channel_id, type, now[1])
+        if istreaming:
+            with self._lock:
+                self._ends[istreaming] = now
+                self._seen[(channel_id, type)] = (istreaming, now[1])
+            return istreaming
+
+        name, url = stream_info_yt(args) if type == 0 else stream_info_tw(args)
+        with self._lock:
+            temp_id = self._next_temp
+            self._next_temp -= 1
+            self._new[temp_id] = (channel_id, name, platform_name(type), url, now)
+            self._seen[(channel_id, type)] = (temp_id, now[1])
+        return temp_id
+
+    def stream_offline(self, channel_id, type):
+        """這個週期看到沒開台，寫入後結束記憶體中的直播"""
+        with self._lock:
+            self._offline.add((channel_id, type))
+
+    def save_viewer_count(self, channel_id, yt_count=0, tw_count=0, yt_number=0, tw_number=0):
+        now = time.localtime()
+        date_str = time.strftime('%Y-%m-%d', now)
+        time_str = time.strftime('%H:%M:%S', now)
+        with self._lock:
+            self._rows.append((date_str, time_str, channel_id, yt_count, tw_count, yt_number, tw_number,
+                               int(time.mktime(now))))
+            full = self.chunk_size and len(self._rows) >= self.chunk_size
+            if full:
+                self._write()
+
+    def finish(self, working_id, timer, create, finish=True):
+        """寫入剩下的資料，並在同一個交易裡更新 working 紀錄"""
+        with self._lock:
+            self._write((finish, timer, create, working_id))
+
+    def _write(self, working=None):
+        conn = get_connection(self.db_path)
+        if conn.in_transaction:
+            # 各個寫入函數失敗時都會 rollback，這裡還有交易代表有地方漏掉了，會跟這個週期一起 commit
+            print("⚠️ 連線上有還沒結束的交易，將與這個週期的紀錄一起寫入")
+        cursor = conn.cursor()
+        try:
+            # 新開台的 stream 逐筆寫入才拿得到 id（一個週期通常只有幾筆）
+            ids = {temp_id: insert_stream(cursor, *row) for temp_id, row in self._new.items()}
+            ids.update(self._ids)
+            rows = [row[:5] + (ids.get(row[5], row[5]), ids.get(row[6], row[6])) + row[7:] for row in self._rows]
+
+            cursor.executemany('''
+                INSERT INTO main (date, time, channel, youtube, twitch, yt_number, tw_number, ts)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', rows)
+            update_summaries(cursor, rows)
+            cursor.executemany('''
+                UPDATE stream
+                SET end_time = ?, end_ts = ?
+                WHERE id = ?
+            ''', [(end, end_ts, stream_id) for stream_id, (end, end_ts) in self._ends.items()])
+
+            if working is not None:
+                finish, timer, create, working_id = working
+                cursor.execute('''
+                    UPDATE working
+                    SET finish = ?, timer = ?, "create" = ?
+                    WHERE id = ?
+                ''', ("Finish" if finish else "Problem", round(timer, 2), create, working_id))
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+
+        self.written["main"] += len(rows)
+        self.written["stream_end"] += len(self._ends)
+        self.written["stream_new"] += len(self._new)
+        self._ids = ids
+        self.written["commits"] += 1
+
+        # 已經寫進資料庫，記憶體中的直播狀態跟著更新
+        for (channel_id, type), (stream_id, end_ts) in self._seen.items():
+            self.sessions.touch(channel_id, type, ids.get(stream_id, stream_id), end_ts)
+        for channel_id, type in self._offline:
+            self.written["stream_closed"] += self.sessions.close(channel_id, type)
+
+        self._rows.clear()
+        self._ends.clear()
+        self._new.clear()
+        self._seen.clear()
+        self._offline.clear()
+
+
 # streamers 資料表相關操作
 
 # 新增直播主資料到資料庫
@@ -330,8 +750,8 @@ def add_streamer(channel_id, channel_name, yt_url=None, tw_url=None, db_path=DB_
     """
     新增一筆直播主資料到 streamer 資料表
     """
+    conn = get_connection(db_path)
     try:
-        conn = sqlite3.connect(db_path)
         cursor = conn.cursor()
 
         cursor.execute('''
@@ -347,15 +767,14 @@ def add_streamer(channel_id, channel_name, yt_url=None, tw_url=None, db_path=DB_
         return True
 
     except Exception as e:
+        conn.rollback()
         print("❌ 新增失敗：", e)
         return False
 
-    finally:
-        conn.close()
 
 # 從 CSV 檔案匯入直播主資料到資料庫
 def import_streamers_from_csv(csv_path, db_path):
-    conn = sqlite3.connect(db_path)
+    conn = get_connection(db_path)
     cursor = conn.cursor()
 
     with open(csv_path, newline='', encoding='utf-8') as csvfile:
@@ -370,7 +789,6 @@ def import_streamers_from_csv(csv_path, db_path):
             add_streamer(channel_id, channel_name, yt_url, tw_url, db_path)
 
     conn.commit()
-    conn.close()
     print("✅ 匯入完成！")
 
 # 從資料庫讀取 streamer 表中的頻道資料
@@ -380,12 +798,11 @@ def load_channels_from_db(db_path):
     從資料庫讀取 streamer 表中的頻道資料
     回傳格式：[("channel_id", "channel_name", "yt_full_url", "tw_url"), ...]
     """
-    conn = sqlite3.connect(db_path)
+    conn = get_connection(db_path)
     cursor = conn.cursor()
 
     cursor.execute("SELECT channel_id, channel_name, yt_url, tw_url FROM streamer")
     rows = cursor.fetchall()
-    conn.close()
 
     channel_list = []
     for channel_id, channel_name, yt_url, tw_url in rows:
@@ -401,7 +818,7 @@ def load_channels_from_db(db_path):
 # 回傳格式：[("channel_id", youtube_viewers, twitch_viewers), ...]
 def latest_live_channels(log):
     
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection(DB_PATH)
     cursor = conn.cursor()
     
     # 獲取當前時間，並計算最近的15分鐘時間點
@@ -424,34 +841,20 @@ def latest_live_channels(log):
     
     # 轉換時間格式為字串
     start_date = start_time.strftime("%Y-%m-%d")
-    start_time_str = start_time.strftime("%H:%M:%S")
     start_time_output = start_time.strftime("%H:%M")
     end_date = end_time.strftime("%Y-%m-%d")
-    end_time_str = end_time.strftime("%H:%M:%S")
     end_time_output = end_time.strftime("%H:%M")
     
     
     log(f"📅 查詢時間區間：{start_date} {start_time_output} ~ {end_date} {end_time_output}\n")
 
-    # 如果區間跨日，需要分成兩個條件查詢
-    if start_date == end_date:
-        cursor.execute("""
-            SELECT channel, MAX(youtube) as youtube, MAX(twitch) as twitch
-            FROM main
-            WHERE date=? AND time >= ? AND time < ? AND (youtube>0 OR twitch>0)
-            GROUP BY channel
-        """, (start_date, start_time_str, end_time_str))
-    else:
-        cursor.execute("""
-            SELECT channel, MAX(youtube) as youtube, MAX(twitch) as twitch
-            FROM main
-            WHERE
-                (date = ? AND time >= ?)
-                OR
-                (date = ? AND time < ?)
-                AND (youtube>0 OR twitch>0)
-            GROUP BY channel
-        """, (start_date, start_time_str, end_date, end_time_str))
+    # epoch 是連續的整數，跨日也只是一個範圍
+    cursor.execute("""
+        SELECT channel, MAX(youtube) as youtube, MAX(twitch) as twitch
+        FROM main
+        WHERE ts >= ? AND ts < ? AND (youtube>0 OR twitch>0)
+        GROUP BY channel
+    """, (int(start_time.timestamp()), int(end_time.timestamp())))
     
     rows = cursor.fetchall()
     return rows
@@ -463,12 +866,11 @@ def get_channel_name_by_id(channel_id, db_path):
     輸入 channel_id，回傳對應的 channel_name。
     找不到時回傳 None。
     """
-    conn = sqlite3.connect(db_path)
+    conn = get_connection(db_path)
     cursor = conn.cursor()
 
     cursor.execute("SELECT channel_name FROM streamer WHERE channel_id = ?", (channel_id,))
     result = cursor.fetchone()
-    conn.close()
 
     if result:
         return result[0]  # channel_name
@@ -0,0 +1,65 @@
+import threading
+import time
+
+# 每個抓取週期的計數與耗時統計（多個 worker 共用）
+_lock = threading.Lock()
+_counters = {}
+_timings = {}   # name -> [次數, 總秒數]
+
+
+def incr(name, n=1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+def add_time(name, seconds):
+    with _lock:
+        entry = _timings.setdefault(name, [0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+
+
+class timer:
+    """with stats.timer("名稱"): ... 會把區塊耗時記到 add_time"""
+
+    def __init__(self, name):
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
+        add_time(self.name, self.elapsed)
+        return False
+
+
+def get(name):
+    with _lock:
+        return _counters.get(name, 0)
+
+
+def snapshot():
+    with _lock:
+        return dict(_counters), {k: tuple(v) for k, v in _timings.items()}
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _timings.clear()
+
+
+# 轉成給日誌顯示的文字
+def summary_lines():
+    counters, timings = snapshot()
+    lines = []
+    for name in sorted(counters):
+        lines.append(f"{name}: {counters[name]}")
+    for name in sorted(timings):
+        count, total = timings[name]
+        avg = total / count if count else 0
+        lines.append(f"{name}: {count} 次，共 {total:.2f} 秒，平均 {avg * 1000:.0f} ms")
+    return lines
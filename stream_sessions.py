@@ -0,0 +1,93 @@
+import os
+import threading
+import time
+
+import stats
+from db import get_connection
+
+# 正在進行中的直播（每個頻道 + 平台最多一場），放在記憶體裡
+# 每個週期不必再查 stream 表找「最近 SESSION_GAP 內結束」的紀錄
+# 啟動時從資料庫載入一次，之後由 CycleWriter commit 成功後更新
+
+# 排程間隔（分鐘），ui.py 的排程時間由此產生
+SCHEDULE_MINUTES = 15
+# 超過這麼久沒看到開台就當作已經結束（程式停了一段時間、或頻道連續擷取失敗）
+# 容許錯過一次排程，再加 5 分鐘給週期本身的執行時間（15 分鐘排程時為原本的 35 分鐘）
+SESSION_GAP = (2 * SCHEDULE_MINUTES + 5) * 60
+
+PLATFORMS = ("youtube", "twitch")
+
+
+def platform_name(type):
+    """type 0 為 YouTube，1 為 Twitch"""
+    return PLATFORMS[0] if type == 0 else PLATFORMS[1]
+
+
+class StreamSessions:
+    """
+    (頻道, 平台) -> (stream id, 最後看到開台的 epoch)
+    查詢只是字典取值，不經過 SQL
+    """
+
+    def __init__(self, gap=SESSION_GAP):
+        self.gap = gap
+        self._lock = threading.Lock()
+        self._open = {}
+
+    def __len__(self):
+        return len(self._open)
+
+    def load(self, conn, now=None):
+        """載入 end_ts 在 gap 以內的直播（同一個頻道 + 平台取最後一場），回傳筆數"""
+        now = int(time.time()) if now is None else now
+        # 搭配 MAX() 時 SQLite 的 id 會取自 end_ts 最大的那一列
+        rows = conn.execute('''
+            SELECT channel_name, type, id, MAX(end_ts) FROM stream
+            WHERE end_ts >= ?
+            GROUP BY channel_name, type
+        ''', (now - self.gap,)).fetchall()
+        with self._lock:
+            self._open = {(channel, platform): (stream_id, end_ts) for channel, platform, stream_id, end_ts in rows}
+        return len(rows)
+
+    def lookup(self, channel_id, type, now=None):
+        """回傳延續中的直播 id，沒有時回傳 0"""
+        now = int(time.time()) if now is None else now
+        key = (channel_id, platform_name(type))
+        with self._lock:
+            session = self._open.get(key)
+            if session is not None and now - session[1] > self.gap:
+                del self._open[key]
+                session = None
+        stats.incr("db.session.hit" if session else "db.session.miss")
+        return session[0] if session else 0
+
+    def touch(self, channel_id, type, stream_id, end_ts):
+        """開台中：記下（或新開）這場直播與最後看到的時間"""
+        with self._lock:
+            self._open[(channel_id, platform_name(type))] = (stream_id, end_ts)
+
+    def close(self, channel_id, type):
+        """沒開台：結束這場直播，下次開台會新增一筆"""
+        with self._lock:
+            return self._open.pop((channel_id, platform_name(type)), None) is not None
+
+    def clear(self):
+        with self._lock:
+            self._open.clear()
+
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_sessions(db_path):
+    """每個資料庫一份，第一次取用時從資料庫載入"""
+    key = os.path.abspath(db_path)
+    with _sessions_lock:
+        sessions = _sessions.get(key)
+        if sessions is None:
+            sessions = _sessions[key] = StreamSessions()
+            loaded = sessions.load(get_connection(db_path))
+            print(f"✅ 已載入進行中的直播 {loaded} 場")
+        return sessions
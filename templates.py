@@ -0,0 +1,286 @@
+import os
+import threading
+import cv2
+import numpy as np
+
+import stats
+from frame import Frame, downscale
+
+# 多尺度比對使用的縮放比例：從 0.5 到 1.5，共 20 個
+TEMPLATE_SCALES = np.linspace(0.5, 1.5, 20)
+
+# 啟動時預先載入的模板
+TEMPLATE_FILES = [
+    "find/yt_find.png",
+    "find/tw_find_1.png",
+    "find/tw_find_2.png",
+    "find/tw_find_4.png",
+]
+
+# 比對模式："exhaustive" 全解析度逐一比對；"coarse" 先在縮小圖上找候選，再回原圖精修
+MATCH_MODE = "coarse"
+# 粗略比對的縮小倍率（模板縮小後太小時自動降為 2 倍或直接用原圖）
+COARSE_FACTOR = 4
+# 模板縮小後的最短邊至少要幾個像素，太小的話相關係數不可靠
+COARSE_MIN_SIDE = 8
+# 每個比例保留幾個候選位置回原圖精修
+COARSE_TOP_K = 3
+# 縮小圖上的相似度會偏低，候選門檻放寬多少
+COARSE_SLACK = 0.2
+
+# 提示區域往外擴張的像素（版面小幅移動時仍能在 ROI 內找到）
+HINT_MARGIN = 60
+
+
+class TemplatePyramid:
+    """
+    一張模板的灰階圖與各縮放比例的結果
+    載入時就先縮放好，之後每次比對直接使用
+    """
+
+    def __init__(self, path, gray, scales=TEMPLATE_SCALES):
+        self.path = path
+        self.gray = gray
+        self.levels = []   # [(scale, resized), ...]，順序與 scales 相同
+        for scale in scales:
+            resized = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+            self.levels.append((float(scale), resized))
+
+        self._coarse = {}  # 倍率 -> 各比例縮小後的模板
+
+    def coarse_levels(self, factor):
+        """各比例的模板再縮小 factor 倍，給粗略比對使用"""
+        if factor not in self._coarse:
+            self._coarse[factor] = [downscale(resized, factor) for _, resized in self.levels]
+        return self._coarse[factor]
+
+    @classmethod
+    def load(cls, path, scales=TEMPLATE_SCALES):
+        image = cv2.imread(path)
+        if image is None:
+            return None
+        return cls(path, cv2.cvtColor(image, cv2.COLOR_BGR2GRAY), scales)
+
+
+_lock = threading.Lock()
+_registry = {}   # 正規化後的路徑 -> TemplatePyramid
+
+
+def _key(path):
+    return os.path.normpath(path)
+
+
+def get_template(path):
+    """取得模板（第一次用到時載入並快取），檔案不存在時回傳 None"""
+    key = _key(path)
+    pyramid = _registry.get(key)
+    if pyramid is not None:
+        return pyramid
+
+    pyramid = TemplatePyramid.load(path)
+    if pyramid is None:
+        return None
+    with _lock:
+        return _registry.setdefault(key, pyramid)
+
+
+def preload_templates(paths=TEMPLATE_FILES):
+    """啟動時呼叫，一次載入所有模板"""
+    loaded = 0
+    for path in paths:
+        if get_template(path) is not None:
+            loaded += 1
+        else:
+            print(f"⚠️ 無法載入模板：{path}")
+    return loaded
+
+
+def clear_templates():
+    with _lock:
+        _registry.clear()
+        _hints.clear()
+
+
+def clear_hints():
+    with _lock:
+        _hints.clear()
+
+
+# ---------- 比對提示（上次成功的比例與位置） ----------
+
+# (模板路徑, 頻道) -> (level 索引, top_left)
+# 頻道為 None 的是整個平台共用的提示，頻道位置和平台不同時才另外記錄
+_hints = {}
+
+
+def get_hint(pyramid, channel=None):
+    key = _key(pyramid.path)
+    with _lock:
+        if channel is not None and (key, channel) in _hints:
+            return _hints[(key, channel)]
+        return _hints.get((key, None))
+
+
+def _remember(pyramid, channel, index, top_left):
+    key = _key(pyramid.path)
+    hint = (index, top_left)
+    with _lock:
+        if channel is None:
+            _hints[(key, None)] = hint
+            return
+        platform = _hints.get((key, None))
+        if platform is None:
+            _hints[(key, None)] = hint
+            _hints.pop((key, channel), None)
+        elif _same_place(platform, hint):
+            _hints.pop((key, channel), None)
+        else:
+            _hints[(key, channel)] = hint
+
+
+def _same_place(a, b):
+    return a[0] == b[0] and abs(a[1][0] - b[1][0]) <= HINT_MARGIN and abs(a[1][1] - b[1][1]) <= HINT_MARGIN
+
+
+def _match_level(img_gray, resized, threshold, x0=0, y0=0):
+    h, w = resized.shape[:2]
+    if img_gray.shape[0] < h or img_gray.shape[1] < w:
+        return None
+    result = cv2.matchTemplate(img_gray, resized, cv2.TM_CCOEFF_NORMED)
+    min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
+    if max_val < threshold:
+        return None
+    return max_val, (max_loc[0] + x0, max_loc[1] + y0)
+
+
+def _match_hint(img_gray, pyramid, threshold, hint):
+    """只在上次的比例、上次位置附近的小區域比對"""
+    index, (hx, hy) = hint
+    scale, resized = pyramid.levels[index]
+    h, w = resized.shape[:2]
+    img_h, img_w = img_gray.shape[:2]
+
+    x0 = max(0, hx - HINT_MARGIN)
+    y0 = max(0, hy - HINT_MARGIN)
+    x1 = min(img_w, hx + w + HINT_MARGIN)
+    y1 = min(img_h, hy + h + HINT_MARGIN)
+    found = _match_level(img_gray[y0:y1, x0:x1], resized, threshold, x0, y0)
+    if found is None:
+        return None
+    max_val, top_left = found
+    return scale, max_val, top_left, w, h
+
+
+# 依模板大小決定縮小倍率，縮到太小就回傳 1（不做粗略比對）
+def coarse_factor_for(resized, factor=COARSE_FACTOR):
+    while factor > 1 and min(resized.shape[:2]) / factor < COARSE_MIN_SIDE:
+        factor //= 2
+    return max(factor, 1)
+
+
+def _top_peaks(result, k, min_val, suppress):
+    """從比對結果取出前 k 個高點，每取一個就把附近區域壓掉避免重複"""
+    result = result.copy()
+    peaks = []
+    for _ in range(k):
+        _, max_val, _, max_loc = cv2.minMaxLoc(result)
+        if max_val < min_val:
+            break
+        peaks.append(max_loc)
+        x, y = max_loc
+        result[max(0, y - suppress):y + suppress + 1, max(0, x - suppress):x + suppress + 1] = -1
+    return peaks
+
+
+def _match_coarse(frame, pyramid, index, threshold):
+    """先在縮小圖上找候選位置，再回到原圖在候選附近比對"""
+    resized = pyramid.levels[index][1]
+    factor = coarse_factor_for(resized)
+    img_gray = frame.gray
+    if factor == 1:
+        return _match_level(img_gray, resized, threshold)
+
+    small_gray = frame.small_gray(factor)
+    small_tmpl = pyramid.coarse_levels(factor)[index]
+    sh, sw = small_tmpl.shape[:2]
+    if small_gray.shape[0] < sh or small_gray.shape[1] < sw:
+        return None
+    result = cv2.matchTemplate(small_gray, small_tmpl, cv2.TM_CCOEFF_NORMED)
+    peaks = _top_peaks(result, COARSE_TOP_K, threshold - COARSE_SLACK, max(sw, sh) // 2)
+
+    h, w = resized.shape[:2]
+    img_h, img_w = img_gray.shape[:2]
+    pad = factor * 2
+    for cx, cy in peaks:
+        x0 = max(0, cx * factor - pad)
+        y0 = max(0, cy * factor - pad)
+        x1 = min(img_w, cx * factor + w + pad)
+        y1 = min(img_h, cy * factor + h + pad)
+        found = _match_level(img_gray[y0:y1, x0:x1], resized, threshold, x0, y0)
+        if found is not None:
+            return found
+    return None
+
+
+def match_template(image, pyramid, threshold, channel=None, mode=None):
+    """
+    先用上次成功的比例在小區域內比對，沒找到才依序嘗試各縮放比例
+    image 可以是 Frame（可使用快取的縮小圖）或灰階陣列
+    mode 預設為 MATCH_MODE，"coarse" 時全畫面搜尋改為先粗後精
+    結果會記在 frame.matches，同一張截圖再次比對同一模板不會重算
+    回傳 (scale, max_val, top_left, w, h)，沒找到回傳 None
+    """
+    frame = image if isinstance(image, Frame) else Frame.from_gray(image)
+
+    # 同一張截圖已經比對過這個模板時直接使用結果
+    cache_key = (_key(pyramid.path), threshold)
+    if cache_key in frame.matches:
+        return frame.matches[cache_key]
+    match = _search(frame, pyramid, threshold, channel, mode or MATCH_MODE)
+    frame.matches[cache_key] = match
+    return match
+
+
+def _search(frame, pyramid, threshold, channel, mode):
+    img_gray = frame.gray
+    name = os.path.splitext(os.path.basename(pyramid.path))[0]
+
+    hint = get_hint(pyramid, channel)
+    if hint is not None:
+        match = _match_hint(img_gray, pyramid, threshold, hint)
+        if match is not None:
+            stats.incr(f"match.{name}.hint_hit")
+            _remember(pyramid, channel, hint[0], match[2])
+            return match
+        stats.incr(f"match.{name}.hint_miss")
+
+    for index, (scale, resized) in enumerate(pyramid.levels):
+        if mode == "coarse":
+            found = _match_coarse(frame, pyramid, index, threshold)
+        else:
+            found = _match_level(img_gray, resized, threshold)
+        if found is not None:
+            max_val, top_left = found
+            h, w = resized.shape[:2]
+            _remember(pyramid, channel, index, top_left)
+            return scale, max_val, top_left, w, h
+    return None
+
+
+def match_templates(image, specs, channel=None, mode=None, until_found=False):
+    """
+    一張截圖同時比對多個模板，灰階與縮小圖只計算一次
+    specs：[(模板路徑, 門檻), ...]，依序比對
+    until_found：找到第一個就停止（其餘模板的結果為 None）
+    回傳 {模板路徑: 比對結果或 None}
+    """
+    frame = image if isinstance(image, Frame) else Frame.from_gray(image)
+    results = {path: None for path, _ in specs}
+    for path, threshold in specs:
+        pyramid = get_template(path)
+        if pyramid is None:
+            continue
+        results[path] = match_template(frame, pyramid, threshold, channel, mode)
+        if until_found and results[path] is not None:
+            break
+    return results
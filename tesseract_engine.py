@@ -0,0 +1,179 @@
+import glob
+import os
+import queue
+import shutil
+import sys
+import threading
+
+import stats
+
+# 標題辨識使用的語言（繁體中文 + 日文 + 英文）
+TESSERACT_LANG = "chi_tra+jpn+eng"
+# 手動指定 tesseract 執行檔 / tessdata 資料夾，None 時自動尋找（環境變數 TESSERACT_CMD、TESSDATA_PREFIX 優先）
+TESSERACT_CMD = None
+TESSDATA_DIR = None
+# "api"：常駐的 tesserocr 實例（沒安裝時自動改用 cli）；"cli"：每次呼叫 tesseract 執行檔
+TESSERACT_ENGINE = "api"
+# 同時保留幾個常駐的 Tesseract 實例（每個都載入一份語言模型，一個實例同時只能給一個執行緒用）
+TESSERACT_HANDLES = 1
+
+# tesserocr 直接呼叫 libtesseract，模型只載入一次；沒有安裝時改用 pytesseract（每次啟動一個 tesseract 進程）
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
+    # 啟動時提示一次，之後每次標題辨識都會啟動一個 tesseract 進程
+    if TESSERACT_ENGINE == "api":
+        print("⚠️ 沒有安裝 tesserocr，標題辨識改用 tesseract 執行檔（pytesseract，較慢）；安裝方式見 requirements.txt")
+
+import pytesseract
+
+
+# ---------- 尋找 tesseract ----------
+
+def _candidate_cmds():
+    if sys.platform.startswith("win"):
+        for env in ("ProgramFiles", "ProgramFiles(x86)", "LOCALAPPDATA"):
+            base = os.environ.get(env)
+            if base:
+                yield os.path.join(base, "Tesseract-OCR", "tesseract.exe")
+                yield os.path.join(base, "Programs", "Tesseract-OCR", "tesseract.exe")
+        yield r"C:\Program Files\Tesseract-OCR\tesseract.exe"
+    else:
+        yield "/opt/homebrew/bin/tesseract"
+        yield "/usr/local/bin/tesseract"
+        yield "/usr/bin/tesseract"
+
+
+def find_tesseract():
+    """依序找：TESSERACT_CMD、環境變數、PATH、各平台的預設安裝位置，找不到回傳 None"""
+    for cmd in (TESSERACT_CMD, os.environ.get("TESSERACT_CMD")):
+        if cmd and os.path.isfile(cmd):
+            return cmd
+    found = shutil.which("tesseract")
+    if found:
+        return found
+    for cmd in _candidate_cmds():
+        if os.path.isfile(cmd):
+            return cmd
+    return None
+
+
+def find_tessdata(cmd=None):
+    """找語言模型資料夾：TESSDATA_DIR、TESSDATA_PREFIX、執行檔旁邊、常見的系統位置"""
+    candidates = [TESSDATA_DIR, os.environ.get("TESSDATA_PREFIX")]
+    if cmd:
+        base = os.path.dirname(os.path.realpath(cmd))
+        candidates += [os.path.join(base, "tessdata"), os.path.join(base, "..", "share", "tessdata")]
+    candidates += sorted(glob.glob("/usr/share/tesseract-ocr/*/tessdata"), reverse=True)
+    candidates += ["/usr/share/tessdata", "/usr/local/share/tessdata", "/opt/homebrew/share/tessdata"]
+    for path in candidates:
+        if not path:
+            continue
+        # TESSDATA_PREFIX 可能指向 tessdata 本身或它的上一層
+        for folder in (path, os.path.join(path, "tessdata")):
+            if glob.glob(os.path.join(folder, "*.traineddata")):
+                return os.path.normpath(folder)
+    return None
+
+
+# ---------- 常駐實例 ----------
+
+_lock = threading.Lock()
+_handles = None        # 閒置的 PyTessBaseAPI
+_created = 0
+_cli_ready = False
+_api_failed = False
+
+
+def _new_handle():
+    path = find_tessdata(find_tesseract())
+    kwargs = {"lang": TESSERACT_LANG}
+    if path:
+        kwargs["path"] = path.rstrip("/\\") + os.sep
+    with stats.timer("tesseract.load"):
+        return tesserocr.PyTessBaseAPI(**kwargs)
+
+
+def _acquire():
+    """借一個 Tesseract 實例，還沒建滿 TESSERACT_HANDLES 個時建立新的，否則等別的執行緒還回來"""
+    global _handles, _created
+    with _lock:
+        if _handles is None:
+            _handles = queue.Queue()
+        try:
+            return _handles.get_nowait()
+        except queue.Empty:
+            pass
+        create = _created < TESSERACT_HANDLES
+        if create:
+            _created += 1
+    if not create:
+        return _handles.get()
+    try:
+        return _new_handle()
+    except Exception:
+        with _lock:
+            _created -= 1
+        raise
+
+
+def _release(api):
+    with _lock:
+        handles = _handles
+    if handles is None:
+        api.End()   # shutdown() 之後才還回來的
+    else:
+        handles.put(api)
+
+
+def _setup_cli():
+    global _cli_ready
+    if not _cli_ready:
+        cmd = find_tesseract()
+        if cmd:
+            pytesseract.pytesseract.tesseract_cmd = cmd
+        _cli_ready = True
+
+
+def engine():
+    if TESSERACT_ENGINE == "api" and tesserocr is not None and not _api_failed:
+        return "api"
+    return "cli"
+
+
+def image_to_string(img, lang=TESSERACT_LANG):
+    """
+    辨識 PIL 圖片的文字
+    有 tesserocr 時使用常駐的實例（語言模型只載入一次），否則交給 pytesseract
+    """
+    global _api_failed
+    if engine() == "api" and lang == TESSERACT_LANG:
+        try:
+            api = _acquire()
+        except Exception as e:
+            # 例如找不到語言模型，之後都改用 pytesseract
+            print(f"⚠️ 無法建立 Tesseract 實例，改用 tesseract 執行檔：{e}")
+            _api_failed = True
+            return image_to_string(img, lang)
+        try:
+            with stats.timer("tesseract.api"):
+                api.SetImage(img)
+                return api.GetUTF8Text()
+        finally:
+            api.Clear()
+            _release(api)
+
+    _setup_cli()
+    with stats.timer("tesseract.cli"):
+        return pytesseract.image_to_string(img, lang=lang)
+
+
+def shutdown():
+    """釋放所有常駐實例"""
+    global _handles, _created
+    with _lock:
+        handles, _handles = _handles, None
+        _created = 0
+    while handles is not None and not handles.empty():
+        handles.get_nowait().End()
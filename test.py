@@ -28,7 +28,7 @@ from sql import (
     get_channel_name_by_id
 )
 
-from main import (
+from driver_manager import (
     cleanup_headless_chrome,
     create_driver
 )  # 匯入清理函數
@@ -9,14 +9,10 @@ import plotly.graph_objects as go
 st.title("直播資料抓取日誌")
 db_path = "data.db"  # ← 你的 SQLite 檔案
 
-# 連線抓資料
+# 用整數 epoch 欄位（ts）查詢，只讀選定的 24 小時，不必整張 working 讀進來再轉換文字時間
 with sqlite3.connect(db_path) as conn:
-    df_all = pd.read_sql_query("SELECT * FROM working", conn)
-
-# 檢查欄位
-timestamp_col = 'time'  # 確認你時間欄位叫這個
-df_all[timestamp_col] = pd.to_datetime(df_all[timestamp_col])
-available_dates = sorted(df_all[timestamp_col].dt.date.unique())
+    first_ts, last_ts = conn.execute("SELECT MIN(ts), MAX(ts) FROM working").fetchone()
+available_dates = [datetime.fromtimestamp(first_ts).date(), datetime.fromtimestamp(last_ts).date()]
 
 # 選擇日期
 selected_date = st.date_input("選擇基準日期（從中午開始）", value=available_dates[-1], min_value=available_dates[0], max_value=available_dates[-1])
@@ -27,9 +23,13 @@ time_slots = [selected_datetime + timedelta(minutes=15 * i) for i in range(96)]
 start_range = time_slots[0]
 end_range = time_slots[-1]
 
-# 篩選該區段資料
-df_range = df_all[(df_all[timestamp_col] >= start_range) & (df_all[timestamp_col] <= end_range)]
-df_range['rounded'] = df_range[timestamp_col].dt.floor('15min')
+# 篩選該區段資料（ts 是 UTC 秒數，轉回本地時間再對齊時段）
+with sqlite3.connect(db_path) as conn:
+    df_range = pd.read_sql_query(
+        "SELECT ts FROM working WHERE ts BETWEEN ? AND ?",
+        conn, params=(int(start_range.timestamp()), int(end_range.timestamp())),
+    )
+df_range['rounded'] = pd.to_datetime(df_range['ts'].map(datetime.fromtimestamp)).dt.floor('15min')
 captured_times = set(df_range['rounded'])
 flags = [1 if t in captured_times else 0 for t in time_slots]
 
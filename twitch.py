@@ -1,82 +1,27 @@
-import os
 import time
 import cv2
 import re
-import numpy as np
-import easyocr
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException
-import pytesseract
-from PIL import Image
-import subprocess, time
-import urllib3
-
-def cleanup_chrome():
-    """僅清理 Selenium 啟動的 headless Chrome 進程"""
-    try:
-        # 尋找所有帶 "--headless" 的 Chrome 進程
-        result = subprocess.run(
-            'wmic process where "name=\'chrome.exe\' and commandline like \'%%--headless%%\'" get processid',
-            shell=True, capture_output=True, text=True
-        )
-
-        # 擷取 process ID
-        pids = [pid.strip() for pid in result.stdout.split() if pid.strip().isdigit()]
-        if pids:
-            for pid in pids:
-                subprocess.run(f"taskkill /PID {pid} /F", shell=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-            print(f"🧹 已清理 {len(pids)} 個 headless Chrome 進程。")
-        else:
-            print("✅ 沒有發現殘留的 headless Chrome。")
-
-        # 一併清理殘留的 chromedriver
-        subprocess.run("taskkill /f /im chromedriver.exe", shell=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-    except Exception as e:
-        print(f"⚠️ 清理過程出錯：{e}")
-
-def create_driver():
-    urllib3.PoolManager().clear()
-    cleanup_chrome()
-
-    options = Options()
-    options.add_argument('--headless')
-    options.add_argument('--disable-gpu')
-    options.add_argument('--window-size=2560,1440')
-    options.add_argument('--mute-audio')
-    options.add_argument('--ignore-certificate-errors')
-    options.add_argument('--ignore-ssl-errors')
-    options.add_argument('--no-sandbox')
-    options.add_argument('--disable-dev-shm-usage')
-    options.add_argument('--disable-features=VizDisplayCompositor')
-    options.add_argument('--disable-software-rasterizer')
-    options.add_argument('--disable-extensions')
-    options.add_argument('--disable-infobars')
-    options.add_argument('--disable-blink-features=AutomationControlled')
-    options.add_argument('--dns-prefetch-disable')  # ✅ 避免 TCP DNS hang
-    options.add_argument('--disable-features=NetworkService,NetworkServiceInProcess')
-
-    try:
-        driver = webdriver.Chrome(options=options)
-        driver.set_page_load_timeout(20)   # ✅ 加上載入逾時保護
-        driver.set_script_timeout(20)
-        return driver
-    except Exception as e:
-        print(f"❌ ChromeDriver 初始化失敗：{e}")
-        time.sleep(3)
-        cleanup_chrome()
-        return webdriver.Chrome(options=options)
-
+import json
+from http_session import create_http_session
 
+from driver_manager import create_driver
+from frame import Frame, load_frame, debug_save, to_pil
+from templates import get_template, match_template, match_templates
+from ocr import read_crop
+from ocr_cache import cached
+import tesseract_engine
 
 
 # 使用 Selenium 截取 Twitch 頁面截圖
-def twitch_capture_screenshot(target_url, save_path, driver=None, zoom=140):
+def twitch_capture_screenshot(target_url, save_path, driver=None, zoom=140, manager=None):
     """
     使用 Selenium 截取 Twitch 頁面截圖（具備自動重啟保護）
+    manager：DriverManager，出錯時由它換上備用瀏覽器
+    回傳 (ok, driver, error, frame)，frame 為解碼後的截圖
     """
     print("🚀 開始截取 Twitch 頁面...")
 
@@ -102,14 +47,14 @@ def twitch_capture_screenshot(target_url, save_path, driver=None, zoom=140):
 
         driver.execute_script(f"document.body.style.zoom='{zoom}%'")
         time.sleep(1)
-        os.makedirs(os.path.dirname(save_path), exist_ok=True)
-        driver.save_screenshot(save_path)
-        print(f"✅ 截圖已儲存至：{save_path}")
+        # 截圖直接解碼成陣列，save_path 只在除錯模式下寫檔
+        frame = Frame.from_driver(driver, save_path)
+        print("✅ 截圖完成")
         
         # 第一次成功：返回 driver (舊的)，但這裡的 driver 會在 finally 被清理
         # 為了保留它，我們必須在 finally 中不執行清理，但這裡的設計要求 finally 執行清理。
         # 因此，這裡的 `return True, driver, True` 是讓外部知道它是舊的 driver，並且應該被清理。
-        return True, driver, True
+        return True, driver, True, frame
 
     except Exception as e:
         print(f"❌ 截圖時發生錯誤：{e}")
@@ -130,7 +75,8 @@ def twitch_capture_screenshot(target_url, save_path, driver=None, zoom=140):
         new_driver = None # 確保 new_driver 變數存在於作用域內
         
         try:
-            new_driver = create_driver()
+            # 有 driver 管理器時由它提供（備用瀏覽器接手），否則自行建立
+            new_driver = manager.replace(driver) if manager else create_driver(cleanup=False)
             
             # --- 重試邏輯 ---
             new_driver.get(target_url)
@@ -141,13 +87,12 @@ def twitch_capture_screenshot(target_url, save_path, driver=None, zoom=140):
             )))
             new_driver.execute_script(f"document.body.style.zoom='{zoom}%'")
             time.sleep(1)
-            os.makedirs(os.path.dirname(save_path), exist_ok=True)
-            new_driver.save_screenshot(save_path)
-            print(f"✅ 截圖已儲存至：{save_path}（重試成功）")
+            frame = Frame.from_driver(new_driver, save_path)
+            print("✅ 截圖完成（重試成功）")
             
             # 重試成功：返回 True, new_driver(新的), False。
             # new_driver 將被保留，因為 own_driver_flag 為 False。
-            return True, new_driver, False
+            return True, new_driver, False, frame
             
         except Exception as e2:
             print(f"❌ 重啟後仍失敗：{e2}")
@@ -160,7 +105,7 @@ def twitch_capture_screenshot(target_url, save_path, driver=None, zoom=140):
                     pass
             
             # 返回失敗，返回的 driver 設為 None
-            return False, None, False
+            return False, None, False, None
             
     finally:
         # 這個 finally 區塊只負責處理「第一次建立」且「沒有在 except 中被處理」的 driver。
@@ -176,6 +121,152 @@ def twitch_capture_screenshot(target_url, save_path, driver=None, zoom=140):
                 pass
             time.sleep(0.5)
 
+# 頻道頁面上的觀看人數 / 離線標記（選擇器失效時回傳 null）
+TW_DOM_SCRIPT = """
+const viewers = document.querySelector(
+    '[data-a-target="animated-channel-viewers-count"], ' +
+    '[data-a-target="channel-viewers-count"]'
+);
+if (viewers) return {live: true, text: viewers.innerText};
+const offline = document.querySelector(
+    '[data-a-target="player-overlay-offline"], ' +
+    '.channel-status-info--offline, ' +
+    '.home-offline-hero'
+);
+if (offline) return {live: false, text: ''};
+return null;
+"""
+
+
+# 從 DOM 讀取開台狀態與觀看人數（不需截圖與 OCR）
+# 回傳 (state, count)：state 為 "live" / "offline"，選擇器失效時為 None
+def twitch_dom_viewer_count(driver):
+    try:
+        result = driver.execute_script(TW_DOM_SCRIPT)
+    except Exception as e:
+        print(f"⚠️ DOM 讀取失敗：{e}")
+        return None, None
+
+    if not result:
+        return None, None
+    if not result.get("live"):
+        return "offline", 0
+
+    text = (result.get("text") or "").replace(",", "")
+    match = re.search(r"\d+", text)
+    if not match:
+        print(f"⚠️ DOM 找到直播但讀不到人數：{result.get('text')!r}")
+        return None, None
+    count = int(match.group(0))
+    print(f"✅ DOM 觀看人數：{count}")
+    return "live", count
+
+
+# ---------- 不開瀏覽器的 HTTP 版本 ----------
+
+# Twitch 網頁版本身使用的 GQL 端點與公開 Client-ID
+TW_GQL_URL = "https://gql.twitch.tv/gql"
+TW_CLIENT_ID = "kimne78kx3ncx6brgo4mv6wki5h1ko"
+
+TW_QUERY = """
+query ChannelStatus($login: String!) {
+    user(login: $login) {
+        login
+        broadcastSettings { title }
+        stream { id type viewersCount }
+    }
+}
+"""
+
+
+# 共用的 keep-alive session（多個 worker 共用連線池）
+TW_HEADERS = {
+    "Client-Id": TW_CLIENT_ID,
+    "Content-Type": "application/json",
+    "User-Agent": "Mozilla/5.0",
+}
+
+TW_SESSION = create_http_session(TW_HEADERS)
+
+
+# https://www.twitch.tv/kirali_neon → kirali_neon
+def twitch_login_from_url(target_url):
+    path = target_url.split("?")[0].rstrip("/")
+    return path.rsplit("/", 1)[-1].lower()
+
+
+def twitch_fetch_live(target_url, session=None, gql_url=None, timeout=10):
+    """
+    不開瀏覽器，直接向 Twitch GQL 查詢頻道狀態
+    回傳 {"live", "viewers", "title", "stream_id"}（開台時另有串流的 "type"），
+    查詢失敗（需要改用 Selenium）時回傳 None
+    """
+    session = session or TW_SESSION
+    login = twitch_login_from_url(target_url)
+    payload = {
+        "operationName": "ChannelStatus",
+        "query": TW_QUERY,
+        "variables": {"login": login},
+    }
+
+    try:
+        resp = session.post(gql_url or TW_GQL_URL, data=json.dumps(payload), timeout=timeout)
+        resp.raise_for_status()
+        user = resp.json()["data"]["user"]
+    except Exception as e:
+        print(f"⚠️ Twitch GQL 查詢失敗：{e}")
+        return None
+
+    if not user:
+        print(f"⚠️ 找不到 Twitch 頻道：{login}")
+        return None
+
+    title = (user.get("broadcastSettings") or {}).get("title")
+    stream = user.get("stream")
+    if not stream:
+        return {"live": False, "viewers": 0, "title": title, "stream_id": None}
+
+    # 重播（type 為 "rerun"）等非 "live" 的串流在頁面上一樣會顯示觀看人數，
+    # 截圖 / DOM 模式都當作開台，這裡也一樣算開台，兩種後端的紀錄才會一致
+    return {
+        "live": True,
+        "viewers": int(stream.get("viewersCount") or 0),
+        "title": title,
+        "stream_id": stream.get("id"),
+        "type": stream.get("type"),
+    }
+
+
+# 開台畫面（觀看人數旁的圖示）與沒開台畫面的模板
+TW_LIVE_TEMPLATE = "find/tw_find_2.png"
+TW_OFFLINE_TEMPLATE = "find/tw_find_1.png"
+TW_THRESHOLD = 0.8
+
+
+def twitch_detect(img_path, channel=None):
+    """
+    一次比對開台 / 沒開台兩個模板，共用同一張截圖的灰階與縮小圖
+    回傳 (state, frame)：state 為 "live"、"offline" 或 None（畫面異常）
+    比對結果留在 frame.matches，之後 twitch_find_and_crop 裁切時不會重新比對
+    """
+    frame = load_frame(img_path)
+    if frame is None:
+        print("❌ 無法載入圖片檔案")
+        return None, None
+
+    results = match_templates(
+        frame,
+        [(TW_LIVE_TEMPLATE, TW_THRESHOLD), (TW_OFFLINE_TEMPLATE, TW_THRESHOLD)],
+        channel,
+        until_found=True,
+    )
+    if results[TW_LIVE_TEMPLATE] is not None:
+        return "live", frame
+    if results[TW_OFFLINE_TEMPLATE] is not None:
+        return "offline", frame
+    return None, frame
+
+
 # 使用 OpenCV 尋找目標圖案並裁切指定區域
 def twitch_find_and_crop \
     (img_path, 
@@ -184,54 +275,42 @@ def twitch_find_and_crop \
     offset_x=-220,
     offset_y=0,
     crop_width=150,
-    crop_height=40):
+    crop_height=40,
+    channel=None):
     
     """
     使用 OpenCV 尋找目標圖案並裁切指定區域
+    裁切結果放在 frame.crop（img_path 傳入 Frame 時）
+    channel：頻道 ID，用來記住該頻道上次找到的比例與位置
     """
     print("🔍 開始尋找目標圖案...")
     
     # ---------- 載入圖片 ----------
-    img = cv2.imread(img_path)       # 原始大圖
-    template_orig = cv2.imread(template_path)    # 要找的小圖
+    frame = load_frame(img_path)     # 原始大圖（Frame、陣列或檔案路徑）
+    template = get_template(template_path)      # 要找的小圖（已預先縮放）
     
-    if img is None or template_orig is None:
+    if frame is None or template is None:
         print("❌ 無法載入圖片檔案")
         return 2
     
-    template_gray = cv2.cvtColor(template_orig, cv2.COLOR_BGR2GRAY)
-    img_gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-
-    # 設定門檻與縮放比例範圍
-    threshold = 0.8
-    found = False
-    top_left = None
-    w, h = 0, 0
-
-    for scale in np.linspace(0.5, 1.5, 20):  # 20 個比例：從 0.5 到 1.5
-        # 縮放 template
-        resized = cv2.resize(template_gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
-        h, w = resized.shape[:2]
-
-        # 跳過太大圖的情況
-        if img_gray.shape[0] < h or img_gray.shape[1] < w:
-            continue
-
-        result = cv2.matchTemplate(img_gray, resized, cv2.TM_CCOEFF_NORMED)
-        min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
-
-        if max_val >= threshold:
-            print(f"✅ 找到了！比例 {scale:.2f}，相似度 {max_val:.3f}")
-            top_left = max_loc
-            bottom_right = (top_left[0] + w, top_left[1] + h)
-            cv2.rectangle(img, top_left, bottom_right, (0, 255, 0), 2)
-            found = True
-            break  # 找到就跳出
+    img = frame.image
+    frame.crop = None  # 清掉上一次的裁切，沒找到時不會誤用舊結果
+    # 舊用法（傳入檔案路徑）照舊輸出裁切圖，傳入 Frame 時只在除錯模式寫檔
+    write_crop = not isinstance(img_path, Frame)
+
+    # 設定門檻，縮放比例由模板登錄表預先處理，並優先使用上次成功的比例與位置
+    threshold = TW_THRESHOLD
+    match = match_template(frame, template, threshold, channel)
+    found = match is not None
+    if found:
+        scale, max_val, top_left, w, h = match
+        print(f"✅ 找到了！比例 {scale:.2f}，相似度 {max_val:.3f}")
 
     if found:
-        # 儲存標記結果
-        cv2.imwrite("pictures/result_match.png", img)
-        print("✅ 已儲存標記畫面 result_match.png")
+        # 儲存標記結果（除錯用，畫在複本上避免影響裁切）
+        bottom_right = (top_left[0] + w, top_left[1] + h)
+        if debug_save("pictures/result_match.png", cv2.rectangle(img.copy(), top_left, bottom_right, (0, 255, 0), 2)):
+            print("✅ 已儲存標記畫面 result_match.png")
         
         # ---------- 加上擷取附近區域 ----------
         #offset_x = -150
@@ -249,15 +328,20 @@ def twitch_find_and_crop \
 
         # 擷取區域
         cropped = img[crop_y:end_y, crop_x:end_x]
-        os.makedirs(os.path.dirname(crop_output_path), exist_ok=True)
-        cv2.imwrite(crop_output_path, cropped)
-        print(f"✅ 已儲存截圖區域 {crop_output_path}")
+        frame.crop = cropped
+        if debug_save(crop_output_path, cropped, force=write_crop):
+            print(f"✅ 已儲存截圖區域 {crop_output_path}")
         return 0
     else:
         print("❌ 沒找到符合的圖案")
         return 1
 
+# 觀看人數辨識：只保留數字、逗號與冒號（冒號、逗號之後會移除）
+TW_VIEWER_ALLOWLIST = "0123456789,:"
+
+
 # 使用 EasyOCR 提取觀看人數
+@cached("tw_count")
 def twitch_extract_viewer_count(cropped_image_path, OCR_READER=None):
     """
     使用 EasyOCR 從裁切的圖片中提取觀看人數
@@ -268,54 +352,60 @@ def twitch_extract_viewer_count(cropped_image_path, OCR_READER=None):
         # 建立 OCR 讀取器（指定繁體中文 + 英文）
         #reader = easyocr.Reader(['ch_tra', 'en'])  # ch_tra = 繁體中文
 
-        # 讀取圖片
-        result = OCR_READER.readtext(cropped_image_path, detail=0)
+        # 讀取圖片（裁切陣列或檔案路徑），只跑辨識器，沒有數字才做完整偵測
+        result = read_crop(OCR_READER, cropped_image_path, TW_VIEWER_ALLOWLIST,
+                           accept=lambda t: re.search(r"\d", t))
 
-        # 辨識後的文字
-        text = ' '.join(result)
-        print("OCR 原始結果：", text)
-
-        # 嘗試修正常見錯誤
-        cleaned_text = clean_ocr_text(text)
-        
-
-        #3,598 -> 3598
-        #2:5 -> 25
-        
-        
-        cleaned_text = cleaned_text.replace(',', '')  # 移除逗號
-        cleaned_text = cleaned_text.replace(':', '')  # 移除冒號
-        
-        print("OCR 修正後結果：", cleaned_text)
-        
-        numbers = re.findall(r"\d+", cleaned_text)
-        
-        if numbers[0] == '9' or numbers[0] == '8':
-            match = numbers[1]
-        elif len(numbers[0]) > 1 :
-            if numbers[0][0] == '9':
-                match = numbers[0][1:]  # 取第一個數字，通常是觀看人數
-            else:
-                match = numbers[0]
-        else:
-            match = None
-        
-        
-        #print(f"找到的數字：{match}")
-        
-        
-        if match:
-            
-            print(f"✅ 找到觀看人數：{match}")
-            return match
-        else:
-            print("❌ 沒找到觀看人數")
-            return -1
+        return twitch_parse_viewer_count(result)
             
     except Exception as e:
         print(f"❌ OCR 處理時發生錯誤：{e}")
         return -2
 
+# 從 OCR 結果（字串列表）解析觀看人數，批次辨識時也共用
+# 沒有任何數字時會丟出 IndexError，由呼叫端當作 OCR 錯誤處理
+def twitch_parse_viewer_count(result):
+    # 辨識後的文字
+    text = ' '.join(result)
+    print("OCR 原始結果：", text)
+
+    # 嘗試修正常見錯誤
+    cleaned_text = clean_ocr_text(text)
+    
+
+    #3,598 -> 3598
+    #2:5 -> 25
+    
+    
+    cleaned_text = cleaned_text.replace(',', '')  # 移除逗號
+    cleaned_text = cleaned_text.replace(':', '')  # 移除冒號
+    
+    print("OCR 修正後結果：", cleaned_text)
+    
+    numbers = re.findall(r"\d+", cleaned_text)
+    
+    if numbers[0] == '9' or numbers[0] == '8':
+        match = numbers[1]
+    elif len(numbers[0]) > 1 :
+        if numbers[0][0] == '9':
+            match = numbers[0][1:]  # 取第一個數字，通常是觀看人數
+        else:
+            match = numbers[0]
+    else:
+        match = None
+    
+    
+    #print(f"找到的數字：{match}")
+    
+    
+    if match:
+        
+        print(f"✅ 找到觀看人數：{match}")
+        return match
+    else:
+        print("❌ 沒找到觀看人數")
+        return -1
+
 #OCR 修正函式 用於extract_viewer
 def clean_ocr_text(text):
     # 常見誤判修正表
@@ -340,7 +430,7 @@ def twitch_extract_name(cropped_image_path, OCR_READER=None):
         # 建立 OCR 讀取器（指定繁體中文 + 英文）
         #reader = easyocr.Reader(['ch_tra', 'en'])  # ch_tra = 繁體中文
 
-        # 讀取圖片
+        # 讀取圖片（裁切陣列或檔案路徑）
         result = OCR_READER.readtext(cropped_image_path, detail=0)
 
         # 辨識後的文字
@@ -362,6 +452,7 @@ def twitch_extract_name(cropped_image_path, OCR_READER=None):
         return -2
 
 # 使用 Tesseract OCR 提取頻道名稱
+@cached("tw_title")
 def twitch_extract_name_2(cropped_image_path):
     """
     使用 Tesseract OCR 從裁切的圖片中提取頻道名稱或觀看人數等文字
@@ -369,14 +460,12 @@ def twitch_extract_name_2(cropped_image_path):
     """
     print("📖 開始 Tesseract 文字識別...")
 
-    pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
-    
     try:
-        # 讀取圖片
-        img = Image.open(cropped_image_path)
+        # 讀取圖片（陣列或檔案路徑）
+        img = to_pil(cropped_image_path)
 
         # 使用 tesseract 進行 OCR（支援繁體中文、日文、英文）
-        text = pytesseract.image_to_string(img, lang="chi_tra+jpn+eng")
+        text = tesseract_engine.image_to_string(img)
 
         print("OCR 原始結果：", text)
 
@@ -7,11 +7,9 @@ import datetime
 import threading
 import sqlite3
 
-from main import main
+from stream_sessions import SCHEDULE_MINUTES
 
-from sql import \
-    (latest_live_channels
-    ,get_channel_name_by_id)
+# main / sql 會載入 selenium、cv2 等較重的模組，視窗出現後才在背景匯入
 
 task_lock = threading.Lock()
 
@@ -34,13 +32,25 @@ def main_task(log_callback, clear_callback,kind):
         else:
             log_callback(f"🕒 啟動時自動執行\n執行時間:{now}\n\n")
         log_callback("開始執行抓取工作...\n")
-        # 你的抓取主程式
+        # 你的抓取主程式（OCR 模型沒載入完也可以先開始，真的需要 OCR 時才等待）
+        from main import main
         main(log_callback,kind)
         log_callback("抓取完成！\n")
     finally:
         task_lock.release()
 
 
+# 背景預熱：匯入主程式（selenium、cv2 等）並開始載入 OCR 模型
+def warm_up():
+    start = time.perf_counter()
+    import main
+    ready = main.warm_up()
+    where = "OCR 進程池" if main.OCR_MODE == "pool" else "主程式"
+    print(f"✅ 主程式匯入完成（{time.perf_counter() - start:.1f} 秒），OCR 模型在{where}背景載入中")
+    ready.add_done_callback(
+        lambda f: print(f"✅ OCR 模型載入完成（{time.perf_counter() - start:.1f} 秒）") if not f.exception() else None)
+
+
 class App:
     def __init__(self, root):
         
@@ -137,11 +147,14 @@ class App:
 
         # APScheduler 背景排程
         self.scheduler = BackgroundScheduler()
-        self.scheduler.add_job(self.scheduled_job, 'cron', minute='0,15,30,45')
+        # 每小時 0、15、30、45 分執行（SCHEDULE_MINUTES），stream_sessions 依同一個間隔判斷直播是否結束
+        self.scheduler.add_job(self.scheduled_job, 'cron', minute=','.join(str(m) for m in range(0, 60, SCHEDULE_MINUTES)))
         self.scheduler.start()
         #self.label_status.config(text="排程狀態：已啟動     每小時0,15,30,45分執行")
 
 
+        # 視窗先出現，再於背景匯入主程式並預先載入模型
+        Thread(target=warm_up, daemon=True).start()
         Thread(target=main_task, args=(self.log, self.clear_log, 2)).start()
 
 
@@ -176,6 +189,7 @@ class App:
         
         self.clear_log()  # 清空日誌
         
+        from sql import latest_live_channels, get_channel_name_by_id
         rows = latest_live_channels(self.log)
         
         if not rows:
@@ -1,82 +1,26 @@
-import os
 import time
 import cv2
 import re
-import numpy as np
-import easyocr
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.action_chains import ActionChains
-import pytesseract
-from PIL import Image
-import subprocess
-import urllib3
-
-def cleanup_chrome():
-    """僅清理 Selenium 啟動的 headless Chrome 進程"""
-    try:
-        # 尋找所有帶 "--headless" 的 Chrome 進程
-        result = subprocess.run(
-            'wmic process where "name=\'chrome.exe\' and commandline like \'%%--headless%%\'" get processid',
-            shell=True, capture_output=True, text=True
-        )
-
-        # 擷取 process ID
-        pids = [pid.strip() for pid in result.stdout.split() if pid.strip().isdigit()]
-        if pids:
-            for pid in pids:
-                subprocess.run(f"taskkill /PID {pid} /F", shell=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-            print(f"🧹 已清理 {len(pids)} 個 headless Chrome 進程。")
-        else:
-            print("✅ 沒有發現殘留的 headless Chrome。")
-
-        # 一併清理殘留的 chromedriver
-        subprocess.run("taskkill /f /im chromedriver.exe", shell=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-    except Exception as e:
-        print(f"⚠️ 清理過程出錯：{e}")
-        
+import json
+from http_session import create_http_session
 
+from driver_manager import create_driver
+from frame import Frame, load_frame, debug_save, to_pil
+from templates import get_template, match_template
+from ocr import read_crop
+from ocr_cache import cached
+import tesseract_engine
 
-def create_driver():
-    urllib3.PoolManager().clear()
-    cleanup_chrome()
-
-    options = Options()
-    options.add_argument('--headless')
-    options.add_argument('--disable-gpu')
-    options.add_argument('--window-size=2560,1440')
-    options.add_argument('--mute-audio')
-    options.add_argument('--ignore-certificate-errors')
-    options.add_argument('--ignore-ssl-errors')
-    options.add_argument('--no-sandbox')
-    options.add_argument('--disable-dev-shm-usage')
-    options.add_argument('--disable-features=VizDisplayCompositor')
-    options.add_argument('--disable-software-rasterizer')
-    options.add_argument('--disable-extensions')
-    options.add_argument('--disable-infobars')
-    options.add_argument('--disable-blink-features=AutomationControlled')
-    options.add_argument('--dns-prefetch-disable')  # ✅ 避免 TCP DNS hang
-    options.add_argument('--disable-features=NetworkService,NetworkServiceInProcess')
 
-    try:
-        driver = webdriver.Chrome(options=options)
-        driver.set_page_load_timeout(20)   # ✅ 加上載入逾時保護
-        driver.set_script_timeout(20)
-        return driver
-    except Exception as e:
-        print(f"❌ ChromeDriver 初始化失敗：{e}")
-        time.sleep(3)
-        cleanup_chrome()
-        return webdriver.Chrome(options=options)
-
-
-
-def youtube_capture_screenshot(target_url, save_path, driver=None):
+def youtube_capture_screenshot(target_url, save_path, driver=None, manager=None):
     """
     使用 Selenium 截取 YouTube 頁面截圖（具備自動重啟保護）
+    manager：DriverManager，出錯時由它換上備用瀏覽器
+    回傳 (ok, driver, error, frame)，frame 為解碼後的截圖
     """
     print("🚀 開始截取網頁...")
 
@@ -102,13 +46,13 @@ def youtube_capture_screenshot(target_url, save_path, driver=None):
         
         time.sleep(1)
 
-        os.makedirs(os.path.dirname(save_path), exist_ok=True)
-        driver.save_screenshot(save_path)
-        print(f"✅ 截圖已儲存至：{save_path}")
+        # 截圖直接解碼成陣列，save_path 只在除錯模式下寫檔
+        frame = Frame.from_driver(driver, save_path)
+        print("✅ 截圖完成")
         
         # 第一次成功：返回 True, driver(舊的), True
         # 在 finally 中，如果 own_driver=True，這個 driver 會被關閉。
-        return True, driver, True
+        return True, driver, True, frame
 
     except Exception as e:
         print(f"❌ 截圖時發生錯誤：{e}")
@@ -125,7 +69,8 @@ def youtube_capture_screenshot(target_url, save_path, driver=None):
         new_driver = None # 確保 new_driver 在作用域內被初始化
         
         try:
-            new_driver = create_driver()
+            # 有 driver 管理器時由它提供（備用瀏覽器接手），否則自行建立
+            new_driver = manager.replace(driver) if manager else create_driver(cleanup=False)
             # 關鍵：重啟成功，own_driver 必須設為 False，
             # 這樣 finally 就不會關閉這個新的 driver。
             own_driver = False 
@@ -138,15 +83,14 @@ def youtube_capture_screenshot(target_url, save_path, driver=None):
             # 放大
             new_driver.execute_script("document.body.style.zoom='130%'")
             
-            driver.execute_script("window.scrollBy(0, 350);")
+            new_driver.execute_script("window.scrollBy(0, 350);")
             time.sleep(1)
             
-            os.makedirs(os.path.dirname(save_path), exist_ok=True)
-            new_driver.save_screenshot(save_path)
-            print(f"✅ 截圖已儲存至：{save_path}（重試成功）")
+            frame = Frame.from_driver(new_driver, save_path)
+            print("✅ 截圖完成（重試成功）")
             
             # 重試成功：返回 True, new_driver(新的), False
-            return True, new_driver, False
+            return True, new_driver, False, frame
         
         except Exception as e2:
             print(f"❌ 重啟後仍失敗：{e2}")
@@ -159,7 +103,7 @@ def youtube_capture_screenshot(target_url, save_path, driver=None):
                     pass
             
             # 返回失敗，返回的 driver 設為 None，因為舊的已崩潰/關閉，新的也已關閉。
-            return False, None, False
+            return False, None, False, None
         
     finally:
         # 這個 finally 區塊只處理第一次建立的 driver。
@@ -175,6 +119,196 @@ def youtube_capture_screenshot(target_url, save_path, driver=None):
             time.sleep(0.5)
 
 
+# /streams 頁面上第一個直播中影片的人數文字（選擇器失效時回傳 null）
+YT_DOM_SCRIPT = """
+const items = document.querySelectorAll('ytd-rich-item-renderer, ytd-grid-video-renderer');
+if (!items.length) return null;
+for (const item of items) {
+    const badge = item.querySelector(
+        'ytd-thumbnail-overlay-time-status-renderer[overlay-style="LIVE"], ' +
+        '.badge-style-type-live-now-alternate, ' +
+        '.yt-badge-shape--thumbnail-live'
+    );
+    if (!badge) continue;
+    const meta = item.querySelector('#metadata-line, .inline-metadata-item');
+    return {live: true, text: meta ? meta.innerText : ''};
+}
+return {live: false, text: ''};
+"""
+
+
+# 從 DOM 讀取開台狀態與觀看人數（不需截圖與 OCR）
+# 回傳 (state, count)：state 為 "live" / "offline"，選擇器失效時為 None
+def youtube_dom_viewer_count(driver):
+    try:
+        result = driver.execute_script(YT_DOM_SCRIPT)
+    except Exception as e:
+        print(f"⚠️ DOM 讀取失敗：{e}")
+        return None, None
+
+    if not result:
+        return None, None
+    if not result.get("live"):
+        return "offline", 0
+
+    count = parse_viewer_text(result.get("text") or "")
+    if count is None:
+        print(f"⚠️ DOM 找到直播但讀不到人數：{result.get('text')!r}")
+        return None, None
+    print(f"✅ DOM 觀看人數：{count}")
+    return "live", count
+
+
+# /streams 頁面上第一個直播中影片的網址與標題（找不到時回傳 null）
+YT_LINK_SCRIPT = """
+const items = document.querySelectorAll('ytd-rich-item-renderer, ytd-grid-video-renderer');
+for (const item of items) {
+    const badge = item.querySelector(
+        'ytd-thumbnail-overlay-time-status-renderer[overlay-style="LIVE"], ' +
+        '.badge-style-type-live-now-alternate, ' +
+        '.yt-badge-shape--thumbnail-live'
+    );
+    if (!badge) continue;
+    const link = item.querySelector('a#video-title-link, a#video-title, a#thumbnail, a[href*="/watch?"]');
+    if (!link || !link.href) return null;
+    const title = item.querySelector('#video-title');
+    return {url: link.href, title: title ? (title.getAttribute('title') || title.innerText) : ''};
+}
+return null;
+"""
+
+
+# 從已經載入的頁面取得直播網址與標題，新增直播紀錄時不必重新載入頁面再點擊
+# 回傳 {"video_url", "title"}，找不到時回傳 {}
+def youtube_live_link(driver):
+    try:
+        result = driver.execute_script(YT_LINK_SCRIPT)
+    except Exception as e:
+        print(f"⚠️ 讀取直播連結失敗：{e}")
+        return {}
+
+    if not result or "/watch?" not in (result.get("url") or ""):
+        return {}
+    info = {"video_url": result["url"]}
+    title = (result.get("title") or "").strip()
+    if title:
+        info["title"] = title
+    print(f"✅ 直播連結：{info['video_url']}")
+    return info
+
+
+# 「1,234 人正在觀看」/「1,234 watching」→ 1234
+def parse_viewer_text(text):
+    match = re.search(r"(\d[\d,]*)\s*(?:人|watching)", text)
+    if not match:
+        return None
+    return int(match.group(1).replace(",", ""))
+
+
+# ---------- 不開瀏覽器的 HTTP 版本 ----------
+
+YT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+                  "(KHTML, like Gecko) Chrome/124.0 Safari/537.36",
+    # 指定繁中，人數文字才會是「N 人正在觀看」
+    "Accept-Language": "zh-TW,zh;q=0.9,en;q=0.8",
+}
+
+
+YT_SESSION = create_http_session(YT_HEADERS)
+
+
+# 從頁面 HTML 取出 ytInitialData JSON
+def extract_initial_data(html):
+    match = re.search(r"ytInitialData\s*=\s*", html)
+    if not match:
+        return None
+    try:
+        data, _ = json.JSONDecoder().raw_decode(html, match.end())
+        return data
+    except ValueError:
+        return None
+
+
+# 遞迴找出所有 videoRenderer
+def iter_video_renderers(node):
+    if isinstance(node, dict):
+        for key, value in node.items():
+            if key == "videoRenderer" and isinstance(value, dict):
+                yield value
+            else:
+                yield from iter_video_renderers(value)
+    elif isinstance(node, list):
+        for item in node:
+            yield from iter_video_renderers(item)
+
+
+# runs / simpleText 格式的文字轉成字串
+def yt_text(node):
+    if not isinstance(node, dict):
+        return ""
+    if "simpleText" in node:
+        return node["simpleText"]
+    return "".join(run.get("text", "") for run in node.get("runs", []))
+
+
+def is_live_renderer(video):
+    for overlay in video.get("thumbnailOverlays", []):
+        status = overlay.get("thumbnailOverlayTimeStatusRenderer")
+        if status and status.get("style") == "LIVE":
+            return True
+    for badge in video.get("badges", []):
+        renderer = badge.get("metadataBadgeRenderer", {})
+        if renderer.get("style") == "BADGE_STYLE_TYPE_LIVE_NOW":
+            return True
+    return False
+
+
+def youtube_fetch_live(target_url, session=None, timeout=10):
+    """
+    不開瀏覽器，直接抓 /streams 頁面並解析 ytInitialData
+    回傳 {"live", "video_id", "title", "viewers", "video_url"}，
+    抓取或解析失敗（需要改用 Selenium）時回傳 None
+    """
+    session = session or YT_SESSION
+    try:
+        resp = session.get(target_url, timeout=timeout)
+        resp.raise_for_status()
+    except Exception as e:
+        print(f"⚠️ HTTP 抓取失敗：{e}")
+        return None
+
+    # YouTube 頁面一律是 UTF-8，沒帶 charset 時 requests 會誤判成 latin-1
+    resp.encoding = "utf-8"
+    data = extract_initial_data(resp.text)
+    if data is None:
+        print("⚠️ 找不到 ytInitialData")
+        return None
+
+    videos = list(iter_video_renderers(data))
+    if not videos:
+        print("⚠️ ytInitialData 中沒有影片資料")
+        return None
+
+    for video in videos:
+        if not is_live_renderer(video):
+            continue
+        viewers = parse_viewer_text(yt_text(video.get("viewCountText")))
+        if viewers is None:
+            print("⚠️ 找到直播但讀不到人數")
+            return None
+        video_id = video.get("videoId")
+        return {
+            "live": True,
+            "video_id": video_id,
+            "title": yt_text(video.get("title")) or None,
+            "viewers": viewers,
+            "video_url": f"https://www.youtube.com/watch?v={video_id}" if video_id else None,
+        }
+
+    return {"live": False, "video_id": None, "title": None, "viewers": 0, "video_url": None}
+
+
 # 使用 OpenCV 尋找目標圖案並裁切指定區域
 def youtube_find_and_crop \
     (img_path, 
@@ -183,54 +317,42 @@ def youtube_find_and_crop \
     offset_y=110, 
     offset_x=-500,
     crop_width=350, 
-    crop_height=30):
+    crop_height=30,
+    channel=None):
     
     """
     使用 OpenCV 尋找目標圖案並裁切指定區域
+    裁切結果放在 frame.crop（img_path 傳入 Frame 時）
+    channel：頻道 ID，用來記住該頻道上次找到的比例與位置
     """
     print("🔍 開始尋找目標圖案...")
     
     # ---------- 載入圖片 ----------
-    img = cv2.imread(img_path)       # 原始大圖
-    template_orig = cv2.imread(template_path)    # 要找的小圖
+    frame = load_frame(img_path)     # 原始大圖（Frame、陣列或檔案路徑）
+    template = get_template(template_path)      # 要找的小圖（已預先縮放）
     
-    if img is None or template_orig is None:
+    if frame is None or template is None:
         print("❌ 無法載入圖片檔案")
         return 2,0,0
     
-    template_gray = cv2.cvtColor(template_orig, cv2.COLOR_BGR2GRAY)
-    img_gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    img = frame.image
+    frame.crop = None  # 清掉上一次的裁切，沒找到時不會誤用舊結果
+    # 舊用法（傳入檔案路徑）照舊輸出裁切圖，傳入 Frame 時只在除錯模式寫檔
+    write_crop = not isinstance(img_path, Frame)
 
-    # 設定門檻與縮放比例範圍
+    # 設定門檻，縮放比例由模板登錄表預先處理，並優先使用上次成功的比例與位置
     threshold = 0.85
-    found = False
-    top_left = None
-    w, h = 0, 0
-
-    for scale in np.linspace(0.5, 1.5, 20):  # 20 個比例：從 0.5 到 1.5
-        # 縮放 template
-        resized = cv2.resize(template_gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
-        h, w = resized.shape[:2]
-
-        # 跳過太大圖的情況
-        if img_gray.shape[0] < h or img_gray.shape[1] < w:
-            continue
-
-        result = cv2.matchTemplate(img_gray, resized, cv2.TM_CCOEFF_NORMED)
-        min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
-
-        if max_val >= threshold:
-            print(f"✅ 找到了！比例 {scale:.2f}，相似度 {max_val:.3f}")
-            top_left = max_loc
-            bottom_right = (top_left[0] + w, top_left[1] + h)
-            cv2.rectangle(img, top_left, bottom_right, (0, 255, 0), 2)
-            found = True
-            break  # 找到就跳出
+    match = match_template(frame, template, threshold, channel)
+    found = match is not None
+    if found:
+        scale, max_val, top_left, w, h = match
+        print(f"✅ 找到了！比例 {scale:.2f}，相似度 {max_val:.3f}")
 
     if found:
-        # 儲存標記結果
-        cv2.imwrite("pictures/result_match.png", img)
-        print("✅ 已儲存標記畫面 result_match.png")
+        # 儲存標記結果（除錯用，畫在複本上避免影響裁切）
+        bottom_right = (top_left[0] + w, top_left[1] + h)
+        if debug_save("pictures/result_match.png", cv2.rectangle(img.copy(), top_left, bottom_right, (0, 255, 0), 2)):
+            print("✅ 已儲存標記畫面 result_match.png")
         
         
         # ---------- 加上擷取附近區域 ----------
@@ -261,15 +383,21 @@ def youtube_find_and_crop \
 
         # 擷取區域
         cropped = img[crop_y:end_y, crop_x:end_x]
-        os.makedirs(os.path.dirname(crop_output_path), exist_ok=True)
-        cv2.imwrite(crop_output_path, cropped)
-        print(f"✅ 已儲存截圖區域 {crop_output_path}")
+        frame.crop = cropped
+        if debug_save(crop_output_path, cropped, force=write_crop):
+            print(f"✅ 已儲存截圖區域 {crop_output_path}")
         return 0,top_left[0], top_left[1]
     else:
         print("❌ 沒找到符合的圖案")
         return 1,0,0
 
+# 觀看人數辨識：只保留數字、逗號與「人」
+YT_VIEWER_ALLOWLIST = "0123456789,人"
+YT_VIEWER_PATTERN = r"(\d[\d,]*)\s*人"
+
+
 # 使用 EasyOCR 提取觀看人數
+@cached("yt_count")
 def youtube_extract_viewer_count(cropped_image_path,OCR_READER=None):
     """
     使用 EasyOCR 從裁切的圖片中提取觀看人數
@@ -278,31 +406,36 @@ def youtube_extract_viewer_count(cropped_image_path,OCR_READER=None):
     
     try:
 
-        # 讀取圖片
-        result = OCR_READER.readtext(cropped_image_path, detail=0)
-
-        # 辨識後的文字
-        text = ' '.join(result)
-        print("OCR 原始結果：", text)
-
-        # 嘗試修正常見錯誤
-        cleaned_text = clean_ocr_text(text)
-        print("OCR 修正後結果：", cleaned_text)
+        # 讀取圖片（裁切陣列或檔案路徑），只跑辨識器，找不到人數才做完整偵測
+        result = read_crop(OCR_READER, cropped_image_path, YT_VIEWER_ALLOWLIST,
+                           accept=lambda t: re.search(YT_VIEWER_PATTERN, clean_ocr_text(t)))
 
-        # 擷取「x 人正在觀看」
-        match = re.search(r"(\d[\d,]*)\s*人", cleaned_text)
-        if match:
-            count = match.group(1).replace(",", "")
-            print(f"✅ 找到觀看人數：{count}")
-            return count
-        else:
-            print("❌ 沒找到觀看人數")
-            return -1
+        return youtube_parse_viewer_count(result)
             
     except Exception as e:
         print(f"❌ OCR 處理時發生錯誤：{e}")
         return -2
 
+# 從 OCR 結果（字串列表）解析觀看人數，批次辨識時也共用
+def youtube_parse_viewer_count(result):
+    # 辨識後的文字
+    text = ' '.join(result)
+    print("OCR 原始結果：", text)
+
+    # 嘗試修正常見錯誤
+    cleaned_text = clean_ocr_text(text)
+    print("OCR 修正後結果：", cleaned_text)
+
+    # 擷取「x 人正在觀看」
+    match = re.search(YT_VIEWER_PATTERN, cleaned_text)
+    if match:
+        count = match.group(1).replace(",", "")
+        print(f"✅ 找到觀看人數：{count}")
+        return count
+    else:
+        print("❌ 沒找到觀看人數")
+        return -1
+
 # easyocr 修正函式 用於 extract_viewer
 def clean_ocr_text(text):
     # 常見誤判修正表
@@ -326,7 +459,7 @@ def youtube_extract_name(cropped_image_path,OCR_READER=None):
     
     try:
 
-        # 讀取圖片
+        # 讀取圖片（裁切陣列或檔案路徑）
         result = OCR_READER.readtext(cropped_image_path, detail=0)
 
         # 辨識後的文字
@@ -344,6 +477,7 @@ def youtube_extract_name(cropped_image_path,OCR_READER=None):
         return -1
 
 # 使用 Tesseract OCR 提取頻道名稱或觀看人數等文字
+@cached("yt_title")
 def youtube_extract_name_2(cropped_image_path):
     """
     使用 Tesseract OCR 從裁切的圖片中提取頻道名稱或觀看人數等文字
@@ -351,14 +485,12 @@ def youtube_extract_name_2(cropped_image_path):
     """
     print("📖 開始 Tesseract 文字識別...")
 
-    pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
-    
     try:
-        # 讀取圖片
-        img = Image.open(cropped_image_path)
+        # 讀取圖片（陣列或檔案路徑）
+        img = to_pil(cropped_image_path)
 
         # 使用 tesseract 進行 OCR（支援繁體中文、日文、英文）
-        text = pytesseract.image_to_string(img, lang="chi_tra+jpn+eng")
+        text = tesseract_engine.image_to_string(img)
 
         print("OCR 原始結果：", text)
 